@@ -13,7 +13,7 @@ from aiohttp import ClientSession
 from discord.ext import commands, tasks
 from lavalink.exceptions import NodeException
 
-from utils import context, globalcommands
+from utils import CommandCounter, GuildConfigCache, LevelEngine, ProfileRenderer, Scheduler, context, globalcommands
 
 try:
     import uvloop
@@ -30,25 +30,18 @@ DISABLED_COGS = ["Blackjack", 'Coinflip', 'Connectfour', 'Oldmaid', 'Slots', 'Un
 DISABLED_COMMANDS = []
 version = f"Running UconnSmashBot {gcmds.version}"
 
-if os.path.exists('discord.log'):
-    os.remove('discord.log')
-
 logger = logging.getLogger('discord')
 logger.setLevel(logging.INFO)
-handler = RotatingFileHandler("discord.log", mode="a", maxBytes=25000000,
-                              backupCount=2, encoding="utf-8", delay=0)
-handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
-logger.addHandler(handler)
 
 
 async def get_prefix(self: commands.AutoShardedBot, message):
     if not message.guild:
         extras = ('usb ', 'USB ', 'Usb ', 'u!', 'U! ')
     else:
-        async with self.db.acquire() as con:
-            prefix = await con.fetchval(f"SELECT custom_prefix from guild WHERE guild_id = {message.guild.id}")
+        await self.guild_cache.wait_until_loaded()
+        prefix = self.guild_cache.get_prefix(message.guild.id)
         extras = (
-            f'{prefix}', 'usb ', 'USB ', 'Usb ', 'u!', 'U! ')
+            prefix, 'usb ', 'USB ', 'Usb ', 'u!', 'U! ')
     return commands.when_mentioned_or(*extras)(self, message)
 
 
@@ -69,9 +62,35 @@ async def run(uptime):
 
     db = await asyncpg.create_pool(**credentials)
     await db.execute("CREATE TABLE IF NOT EXISTS guild(guild_id bigint PRIMARY KEY, custom_prefix text, automod boolean "
-                     "DEFAULT FALSE, token BOOLEAN DEFAULT FALSE, log_channel bigint, log_level smallint DEFAULT 0)")
+                     "DEFAULT FALSE, token BOOLEAN DEFAULT FALSE, log_channel bigint, log_level smallint DEFAULT 0, "
+                     "log_journal boolean DEFAULT FALSE)")
+    await db.execute("ALTER TABLE guild ADD COLUMN IF NOT EXISTS log_journal boolean DEFAULT FALSE")
     await db.execute("CREATE TABLE IF NOT EXISTS global_counters(command text PRIMARY KEY, amount NUMERIC)")
-    await db.execute("CREATE TABLE IF NOT EXISTS guild_counters(guild_id bigint, command text, amount NUMERIC)")
+    await db.execute("CREATE TABLE IF NOT EXISTS guild_counters(guild_id bigint, command text, amount NUMERIC, "
+                     "PRIMARY KEY (guild_id, command))")
+    if not await db.fetchval("SELECT 1 FROM pg_constraint WHERE conrelid='guild_counters'::regclass AND contype='p'"):
+        async with db.acquire() as con:
+            async with con.transaction():
+                await con.execute("WITH deleted AS (DELETE FROM guild_counters RETURNING *) "
+                                  "INSERT INTO guild_counters(guild_id, command, amount) "
+                                  "SELECT guild_id, command, SUM(amount) FROM deleted "
+                                  "WHERE guild_id IS NOT NULL AND command IS NOT NULL GROUP BY guild_id, command")
+                await con.execute("ALTER TABLE guild_counters ADD PRIMARY KEY (guild_id, command)")
+    await db.execute("CREATE TABLE IF NOT EXISTS scheduled_jobs(id SERIAL PRIMARY KEY, type text NOT NULL, key text, "
+                     "fire_at double precision NOT NULL, payload text, UNIQUE (type, key))")
+    await db.execute("CREATE INDEX IF NOT EXISTS scheduled_jobs_fire_at_idx ON scheduled_jobs(fire_at)")
+    await db.execute("CREATE TABLE IF NOT EXISTS level_config(guild_id bigint PRIMARY KEY, enabled boolean DEFAULT FALSE, "
+                     "route_channel_id bigint, freq smallint DEFAULT 1, per_min smallint DEFAULT 20, "
+                     "server_notif boolean DEFAULT FALSE, global_notif boolean DEFAULT FALSE)")
+    await db.execute("CREATE TABLE IF NOT EXISTS level_disabled(guild_id bigint, channel_id bigint PRIMARY KEY)")
+    await db.execute("CREATE TABLE IF NOT EXISTS level_roles(guild_id bigint, role_id bigint PRIMARY KEY, "
+                     "obtain_at smallint, type text)")
+    await db.execute("CREATE TABLE IF NOT EXISTS level_users(guild_id bigint, user_id bigint, last_msg bigint DEFAULT 0, "
+                     "xp bigint DEFAULT 0, level integer DEFAULT 0, PRIMARY KEY (guild_id, user_id))")
+    await db.execute("CREATE TABLE IF NOT EXISTS level_global(user_id bigint PRIMARY KEY, last_msg bigint DEFAULT 0, "
+                     "xp bigint DEFAULT 0, level integer DEFAULT 0)")
+    await db.execute("CREATE INDEX IF NOT EXISTS level_users_rank_idx ON level_users(guild_id, level DESC, xp DESC)")
+    await db.execute("CREATE INDEX IF NOT EXISTS level_global_rank_idx ON level_global(level DESC, xp DESC)")
     mbdb = await asyncpg.create_pool(**mb_credentials)
 
     description = "A MarwynnBot port for the University of Connecticut's Super Smash Bros. club."
@@ -84,8 +103,8 @@ async def run(uptime):
     try:
         await bot.start(gcmds.env_check("TOKEN"))
     except KeyboardInterrupt:
-        await db.close()
         await bot.close()
+        await db.close()
 
 
 class Bot(commands.AutoShardedBot):
@@ -105,6 +124,14 @@ class Bot(commands.AutoShardedBot):
         self.uptime = kwargs['uptime']
         self.db = kwargs.pop("db")
         self.mbdb = kwargs.pop("mbdb")
+        self.guild_cache = GuildConfigCache(self)
+        self.counters = CommandCounter(self)
+        self.scheduler = Scheduler(self)
+        self.levels = LevelEngine(self)
+        self.profiles = ProfileRenderer(self)
+        self.guild_cache.start()
+        self.scheduler.start()
+        self.levels.flush_loop.start()
         gcmds = globalcommands.GlobalCMDS(bot=self)
         func_checks = (self.check_blacklist, self.disable_dm_exec, context.redirect)
         for func in func_checks:
@@ -131,24 +158,23 @@ class Bot(commands.AutoShardedBot):
             await con.execute(f"INSERT INTO global_counters(command, amount) VALUES {values} ON CONFLICT DO NOTHING")
             await con.execute(f"DELETE FROM global_counters WHERE command != ALL({names}::text[])")
             await con.execute(f"DELETE FROM guild_counters WHERE command != ALL({names}::text[])")
+        self.counters.flush_loop.start()
         return
 
     async def on_command_completion(self, ctx):
-        async with self.db.acquire() as con:
-            command = ctx.command.root_parent.name.lower() if ctx.command.parent else ctx.command.name.lower()
-            await con.execute(f"INSERT INTO global_counters(command, amount) VALUES ($tag${command}$tag$, 1) "
-                              f"ON CONFLICT (command) DO UPDATE SET amount=global_counters.amount+1 "
-                              f"WHERE global_counters.command=$tag${command}$tag$")
-            if ctx.guild:
-                entry = await con.fetchval(f"SELECT amount FROM guild_counters "
-                                           f"WHERE guild_id={ctx.guild.id} AND command=$tag${command}$tag$")
-                if not entry:
-                    await con.execute(f"INSERT INTO guild_counters(guild_id, command, amount) "
-                                      f"VALUES ({ctx.guild.id}, $tag${command}$tag$, 1)")
-                else:
-                    await con.execute(f"UPDATE guild_counters SET amount=amount+1 "
-                                      f"WHERE guild_id={ctx.guild.id} AND command=$tag${command}$tag$")
-        return
+        command = ctx.command.root_parent.name.lower() if ctx.command.parent else ctx.command.name.lower()
+        self.counters.increment(command, ctx.guild.id if ctx.guild else None)
+
+    async def close(self):
+        self.counters.flush_loop.cancel()
+        self.levels.flush_loop.cancel()
+        await self.scheduler.close()
+        self.profiles.close()
+        try:
+            await self.counters.flush()
+            await self.levels.flush()
+        finally:
+            await super().close()
 
     @tasks.loop(seconds=120)
     async def status(self):
@@ -164,41 +190,27 @@ class Bot(commands.AutoShardedBot):
         await self.change_presence(status=discord.Status.online, activity=next(activity))
 
     async def on_message(self, message):
+        if message.author.bot:
+            return
         await self.wait_until_ready()
-        if await self.check_locks(message) and await self.check_gatherers(message):
-            await self.process_commands(message)
+        await self.guild_cache.wait_until_loaded()
+        ctx = await self.get_context(message)
+        self.dispatch("parsed_message", ctx)
+        if self.check_locks(message) and self.check_gatherers(message):
+            await self.invoke(ctx)
 
-    async def check_locks(self, message):
-        await self.wait_until_ready()
+    async def on_parsed_message(self, ctx):
+        await self.levels.process(ctx.message)
+
+    def check_locks(self, message: discord.Message) -> bool:
         if not message.guild:
             return True
-        async with self.db.acquire() as con:
-            try_ae = await con.fetchval(f"SELECT channel_id FROM locks WHERE guild_id={message.guild.id} AND type='all_except'")
-            if not try_ae:
-                lock_type = await con.fetchval(f"SELECT type FROM locks WHERE channel_id={message.channel.id}")
-                if lock_type and lock_type != "unlocked":
-                    return False
-                else:
-                    return True
-            else:
-                if int(try_ae) == message.channel.id:
-                    return True
-                else:
-                    lock_type = await con.fetchval(f"SELECT type FROM locks WHERE channel_id={message.channel.id}")
-                    if not lock_type or lock_type != "unlocked":
-                        return False
-                    else:
-                        return True
-
-    async def check_gatherers(self, message: discord.Message) -> bool:
-        await self.wait_until_ready()
+        return not self.guild_cache.is_locked(message.guild.id, message.channel.id)
+
+    def check_gatherers(self, message: discord.Message) -> bool:
         if not message.guild:
             return True
-        async with self.db.acquire() as con:
-            res = await con.fetchval(
-                f"SELECT channel_id FROM gather WHERE channel_id={message.channel.id}",
-            )
-        return not bool(res)
+        return not self.guild_cache.is_gatherer(message.channel.id)
 
     async def disable_dm_exec(self, ctx):
         if not ctx.guild and (ctx.cog.qualified_name in DISABLED_COGS or ctx.command.name in DISABLED_COMMANDS):
@@ -299,8 +311,11 @@ class Bot(commands.AutoShardedBot):
 
     async def on_guild_join(self, guild):
         async with self.db.acquire() as con:
-            await con.execute(f"INSERT INTO guild (guild_id, custom_prefix) VALUES ({guild.id}, 'm!')"
-                              " ON CONFLICT DO NOTHING")
+            prefix = await con.fetchval("INSERT INTO guild (guild_id, custom_prefix) VALUES ($1, $2)"
+                                        " ON CONFLICT DO NOTHING RETURNING custom_prefix",
+                                        guild.id, self.guild_cache.DEFAULT_PREFIX)
+            if prefix:
+                self.guild_cache.set_prefix(guild.id, prefix)
             await con.execute(f"INSERT INTO logging(guild_id) VALUES ({guild.id}) ON CONFLICT DO NOTHING")
 
     async def on_member_join(self, member: discord.Member):
@@ -336,5 +351,12 @@ class Bot(commands.AutoShardedBot):
         return len([alias for command in self.commands for alias in command.aliases if command.aliases])
 
 
-uptime = int(datetime.now().timestamp())
-loop.run_until_complete(run(uptime))
+if __name__ == "__main__":
+    if os.path.exists('discord.log'):
+        os.remove('discord.log')
+    handler = RotatingFileHandler("discord.log", mode="a", maxBytes=25000000,
+                                  backupCount=2, encoding="utf-8", delay=0)
+    handler.setFormatter(logging.Formatter('%(asctime)s:%(levelname)s:%(name)s: %(message)s'))
+    logger.addHandler(handler)
+    uptime = int(datetime.now().timestamp())
+    loop.run_until_complete(run(uptime))
@@ -1,10 +1,9 @@
-import json
 import random
 
 import aiohttp
 import discord
 from discord.ext import commands
-from utils import customerrors, GlobalCMDS, objects
+from utils import customerrors, GlobalCMDS, LRUCache, objects
 
 converter = commands.MemberConverter()
 
@@ -13,15 +12,43 @@ class Actions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.gcmds = GlobalCMDS(self.bot)
+        self.blocks = LRUCache(maxsize=1024)
         self.bot.loop.create_task(self.init_actions())
 
     async def init_actions(self):
         await self.bot.wait_until_ready()
         async with self.bot.db.acquire() as con:
-            await con.execute("CREATE TABLE IF NOT EXISTS actions(action text PRIMARY KEY, give jsonb, receive jsonb)")
+            legacy = await con.fetchval("SELECT 1 FROM information_schema.tables WHERE table_name='actions'")
+            async with con.transaction():
+                await con.execute("CREATE TABLE IF NOT EXISTS action_counts(action text, user_id bigint, "
+                                  "given integer NOT NULL DEFAULT 0, received integer NOT NULL DEFAULT 0, "
+                                  "PRIMARY KEY (action, user_id))")
+                if legacy:
+                    await con.execute(
+                        "INSERT INTO action_counts(action, user_id, given, received) "
+                        "SELECT action, user_id::bigint, SUM(given), SUM(received) FROM ("
+                        "SELECT action, key AS user_id, value::integer AS given, 0 AS received "
+                        "FROM actions, jsonb_each_text(give) UNION ALL "
+                        "SELECT action, key, 0, value::integer FROM actions, jsonb_each_text(receive)"
+                        ") counts GROUP BY action, user_id ON CONFLICT DO NOTHING"
+                    )
+                    await con.execute("DROP TABLE actions")
             await con.execute("CREATE TABLE IF NOT EXISTS action_blocks(blocked_id bigint, author_id bigint)")
-            values = "('" + "'), ('".join(command.name for command in self.get_commands() if command.name != "actions") + "')"
-            await con.execute(f"INSERT INTO actions(action) VALUES {values} ON CONFLICT DO NOTHING")
+            if not await con.fetchval("SELECT 1 FROM pg_indexes WHERE indexname='action_blocks_author_blocked_idx'"):
+                async with con.transaction():
+                    await con.execute("DELETE FROM action_blocks a USING action_blocks b WHERE a.ctid < b.ctid "
+                                      "AND a.author_id=b.author_id AND a.blocked_id=b.blocked_id")
+                    await con.execute("CREATE UNIQUE INDEX action_blocks_author_blocked_idx "
+                                      "ON action_blocks(author_id, blocked_id)")
+
+    async def get_blocks(self, author_id: int) -> set:
+        blocks = self.blocks.get(author_id)
+        if blocks is None:
+            async with self.bot.db.acquire() as con:
+                records = await con.fetch("SELECT blocked_id FROM action_blocks WHERE author_id=$1", author_id)
+            blocks = {record['blocked_id'] for record in records}
+            self.blocks.put(author_id, blocks)
+        return blocks
 
     async def get_count_user(self, ctx, user):
         try:
@@ -31,83 +58,19 @@ class Actions(commands.Cog):
             user = ctx.author
             user_specified = False
 
+        if user_specified and ctx.author.id in await self.get_blocks(user.id):
+            raise customerrors.SilentActionError(ctx.command.name, user)
+        giver = ctx.author if user_specified else self.bot.user
         async with self.bot.db.acquire() as con:
-            result = (await con.fetch(f"SELECT give->>'{user.id}' AS give, receive->>'{user.id}' AS receive FROM actions WHERE action = '{ctx.command.name}'"))[0]
-        give_exec_count = int(result['give']) + 1 if result['give'] else 0
-        receive_exec_count = int(result['receive']) + 1 if result['receive'] else 1
-        if user_specified:
-            async with self.bot.db.acquire() as con:
-                blocked = await con.fetchval(f"SELECT * FROM action_blocks WHERE blocked_id={ctx.author.id} AND author_id={user.id}")
-                if blocked:
-                    raise customerrors.SilentActionError(ctx.command.name, user)
-                old_author = (await con.fetch(f"SELECT give FROM actions WHERE action = '{ctx.command.name}'"))[0]['give']
-                old_recip = (await con.fetch(f"SELECT receive FROM actions WHERE action = '{ctx.command.name}'"))[0]['receive']
-            if not old_author:
-                new_author_val = "'{" + f'"{ctx.author.id}": 1' + "}'"
-                new_author_op = f"UPDATE actions SET give = {new_author_val} WHERE action = '{ctx.command.name}'"
-            else:
-                old_author_dict = json.loads(old_author)
-                try:
-                    old_author_val = int(old_author_dict[str(ctx.author.id)])
-                    author_cond = f"WHERE give->>'{ctx.author.id}' = '{old_author_val}' AND action = '{ctx.command.name}'"
-                except KeyError:
-                    old_author_val = 0
-                    author_cond = f"WHERE action = '{ctx.command.name}'"
-                new_author_dict = "'{" + f'"{ctx.author.id}" : {old_author_val + 1}' + "}'"
-                new_author_op = (
-                    f"UPDATE actions SET give = give::jsonb - '{ctx.author.id}' || {new_author_dict} {author_cond}")
-            if not old_recip:
-                new_recip_val = "'{" + f'"{user.id}": 1' + "}'"
-                new_recip_op = f"UPDATE actions SET receive = {new_recip_val} WHERE action = '{ctx.command.name}'"
-            else:
-                old_recip_dict = json.loads(old_recip)
-                try:
-                    old_recip_val = int(old_recip_dict[str(user.id)])
-                    recip_cond = f"WHERE receive->>'{user.id}' = '{old_recip_val}' AND action = '{ctx.command.name}'"
-                except KeyError:
-                    old_recip_val = 0
-                    recip_cond = f"WHERE action = '{ctx.command.name}'"
-                new_recip_dict = "'{" + f'"{user.id}" : {old_recip_val + 1}' + "}'"
-                new_recip_op = (
-                    f"UPDATE actions SET receive = receive::jsonb - '{user.id}' || {new_recip_dict} {recip_cond}")
-            ops = [new_author_op, new_recip_op]
-        else:
-            async with self.bot.db.acquire() as con:
-                old_author = (await con.fetch(f"SELECT give FROM actions WHERE action = '{ctx.command.name}'"))[0]['give']
-                old_recip = (await con.fetch(f"SELECT receive FROM actions WHERE action = '{ctx.command.name}'"))[0]['receive']
-            if not old_author:
-                new_author_val = "'{" + f'"{self.bot.user.id}": 1' + "}'"
-                new_author_op = f"UPDATE actions SET give = {new_author_val} WHERE action = '{ctx.command.name}'"
-            else:
-                old_author_dict = json.loads(old_author)
-                try:
-                    old_author_val = int(old_author_dict[str(self.bot.user.id)])
-                    author_cond = f"WHERE give->>'{self.bot.user.id}' = '{old_author_val}' AND action = '{ctx.command.name}'"
-                except KeyError:
-                    old_author_val = 0
-                    author_cond = f"WHERE action = '{ctx.command.name}'"
-                new_author_dict = "'{" + f'"{self.bot.user.id}" : {old_author_val + 1}' + "}'"
-                new_author_op = (
-                    f"UPDATE actions SET give = give::jsonb - '{self.bot.user.id}' || {new_author_dict} {author_cond}")
-            if not old_recip:
-                new_recip_val = "'{" + f'"{ctx.author.id}": 1' + "}'"
-                new_recip_op = f"UPDATE actions SET receive = {new_recip_val} WHERE action = '{ctx.command.name}'"
-            else:
-                old_recip_dict = json.loads(old_recip)
-                try:
-                    old_recip_val = int(old_recip_dict[str(ctx.author.id)])
-                    recip_cond = f"WHERE receive->>'{ctx.author.id}' = '{old_recip_val}' AND action = '{ctx.command.name}'"
-                except KeyError:
-                    old_recip_val = 0
-                    recip_cond = f"WHERE action = '{ctx.command.name}'"
-                new_recip_dict = "'{" + f'"{ctx.author.id}" : {old_recip_val + 1}' + "}'"
-                new_recip_op = (
-                    f"UPDATE actions SET receive = receive::jsonb - '{ctx.author.id}' || {new_recip_dict} {recip_cond}")
-            ops = [new_author_op, new_recip_op]
-        async with self.bot.db.acquire() as con:
-            for op in ops:
-                await con.execute(op)
-        return give_exec_count, receive_exec_count, user, user_specified
+            result = await con.fetchrow(
+                "WITH giver AS (INSERT INTO action_counts(action, user_id, given) VALUES ($1, $2, 1) "
+                "ON CONFLICT (action, user_id) DO UPDATE SET given=action_counts.given + 1) "
+                "INSERT INTO action_counts(action, user_id, received) VALUES ($1, $3, 1) "
+                "ON CONFLICT (action, user_id) DO UPDATE SET received=action_counts.received + 1 "
+                "RETURNING given, received",
+                ctx.command.name, giver.id, user.id,
+            )
+        return result['given'], result['received'], user, user_specified
 
     async def embed_template(self, ctx, title: str, footer: str):
         api_key = self.gcmds.env_check("TENOR_API")
@@ -202,11 +165,10 @@ class Actions(commands.Cog):
             description = f"{ctx.author.mention}, you blocked {','.join(member.mention for member in members)}"
 
         async with self.bot.db.acquire() as con:
-            for member in members:
-                check = await con.fetch(f"SELECT blocked_id FROM action_blocks WHERE blocked_id={member.id} "
-                                        f"AND author_id={ctx.author.id}")
-                if not check:
-                    await con.execute(f"INSERT INTO action_blocks(blocked_id, author_id) VALUES ({member.id}, {ctx.author.id})")
+            await con.execute("INSERT INTO action_blocks(blocked_id, author_id) SELECT unnest($1::bigint[]), $2 "
+                              "ON CONFLICT (author_id, blocked_id) DO NOTHING",
+                              [member.id for member in members], ctx.author.id)
+        self.blocks.pop(ctx.author.id, None)
 
         embed = discord.Embed(title="Members Blocked", description=description, color=discord.Color.blue())
         return await ctx.channel.send(embed=embed)
@@ -225,12 +187,10 @@ class Actions(commands.Cog):
         else:
             description = f"{ctx.author.mention}, you unblocked {','.join(member.mention for member in members)}"
 
-        for member in members:
-            async with self.bot.db.acquire() as con:
-                check = await con.fetch(f"SELECT blocked_id FROM action_blocks WHERE blocked_id={member.id} "
-                                        f"AND author_id={ctx.author.id}")
-                if check:
-                    await con.execute(f"DELETE FROM action_blocks WHERE blocked_id={member.id} AND author_id={ctx.author.id}")
+        async with self.bot.db.acquire() as con:
+            await con.execute("DELETE FROM action_blocks WHERE author_id=$1 AND blocked_id=ANY($2::bigint[])",
+                              ctx.author.id, [member.id for member in members])
+        self.blocks.pop(ctx.author.id, None)
 
         embed = discord.Embed(title="Members Blocked", description=description, color=discord.Color.blue())
         return await ctx.channel.send(embed=embed)
@@ -6,9 +6,9 @@ from datetime import datetime
 
 import aiohttp
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ext.commands import AutoShardedBot, Context
-from utils import GlobalCMDS
+from utils import GlobalCMDS, ScheduledJob
 
 gcmds = GlobalCMDS()
 SLEEP_TIME = 1.2
@@ -24,10 +24,8 @@ class Fun(commands.Cog):
     def __init__(self, bot: AutoShardedBot):
         global gcmds
         self.bot = bot
+        self.bot.scheduler.register("delayed_send", self._delayed_send_job)
         self.bot.loop.create_task(self._init_delay_tables())
-        self.bot.loop.create_task(self._schedule_send())
-        self._tasks: typing.List[asyncio.Task] = []
-        self._delay_fut = self.bot.loop.create_future()
         gcmds = GlobalCMDS(self.bot)
 
     async def _init_delay_tables(self) -> None:
@@ -36,7 +34,16 @@ class Fun(commands.Cog):
             await con.execute(
                 "CREATE TABLE IF NOT EXISTS delays(channel_id bigint, content TEXT, tts BOOLEAN DEFAULT FALSE, send_at NUMERIC)"
             )
-        self._delay_fut.set_result(True)
+            async with con.transaction():
+                entries = await con.fetch("SELECT * FROM delays FOR UPDATE")
+                if not entries:
+                    return
+                await self.bot.scheduler.schedule_many("delayed_send", (
+                    (None, entry["send_at"], {"channel_id": entry["channel_id"], "content": entry["content"], "tts": entry["tts"]})
+                    for entry in entries
+                ))
+                # only drop the legacy rows once the scheduler has persisted them
+                await con.execute("DELETE FROM delays")
 
     async def _get_delay(self, ctx: Context) -> int:
         await ctx.channel.send(
@@ -63,50 +70,19 @@ class Fun(commands.Cog):
         return delay
 
     async def _send_in(self, channel: discord.TextChannel, content: str, delay: int, tts: bool = False) -> None:
-        delay = int(datetime.now().timestamp()) + delay
-        async with self.bot.db.acquire() as con:
-            await con.execute(
-                "INSERT INTO delays(channel_id, content, tts, send_at) VALUES "
-                f"({channel.id}, $text${content}$text$, {tts}, {delay})"
+        await self.bot.scheduler.schedule("delayed_send", int(datetime.now().timestamp()) + delay, {
+            "channel_id": channel.id,
+            "content": content,
+            "tts": tts,
+        })
+
+    async def _delayed_send_job(self, job: ScheduledJob) -> discord.Message:
+        channel: discord.TextChannel = self.bot.get_channel(int(job.payload["channel_id"]))
+        if channel:
+            return await channel.send(
+                embed=discord.Embed(description=job.payload["content"], color=discord.Color.blue()),
+                tts=job.payload["tts"],
             )
-        task = self.bot.loop.create_task(
-            self._wrapper(
-                channel, content, tts, delay
-            )
-        )
-        task.add_done_callback(self._handle_task)
-        self._tasks.append(task)
-
-    async def _schedule_send(self) -> None:
-        await self._delay_fut
-        async with self.bot.db.acquire() as con:
-            entries = await con.fetch(f"SELECT * FROM delays")
-            await con.execute(f"DELETE FROM delays WHERE send_at<{int(datetime.now().timestamp())}")
-        for entry in entries:
-            channel: discord.TextChannel = self.bot.get_channel(int(entry["channel_id"]))
-            if channel:
-                task = self.bot.loop.create_task(self._wrapper(
-                    channel, entry["content"], entry["tts"], int(entry["send_at"])))
-                task.add_done_callback(self._handle_task)
-                self._tasks.append(task)
-
-    async def _wrapper(self, channel: discord.TextChannel, content: str, tts: bool, delay: int) -> discord.Message:
-        await asyncio.sleep(delay - int(datetime.now().timestamp()))
-        async with self.bot.db.acquire() as con:
-            await con.execute(
-                f"DELETE FROM delays WHERE channel_id={channel.id} AND content=$text${content}$text$ AND tts={tts} AND send_at={delay}"
-            )
-        return await channel.send(
-            embed=discord.Embed(description=content, color=discord.Color.blue()),
-            tts=tts,
-        )
-
-    @staticmethod
-    def _handle_task(task: asyncio.Task) -> None:
-        try:
-            task.result()
-        except (asyncio.CancelledError, Exception):
-            pass
 
     @staticmethod
     def _get_delta(delay: int) -> str:
@@ -124,8 +100,7 @@ class Fun(commands.Cog):
         return " ".join(delta)
 
     def cog_unload(self):
-        for task in self._tasks:
-            task.cancel()
+        self.bot.scheduler.unregister("delayed_send")
 
     async def send_image(self, ctx: Context, path, url=None, to_send: str = ""):
         if not url:
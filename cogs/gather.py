@@ -1,16 +1,27 @@
 import asyncio
 import datetime
 import functools
+import hashlib
 import json
-from typing import Callable, List, Tuple
+from typing import Callable, Dict, List, Set, Tuple
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord.ext.commands import AutoShardedBot, Context
 from setuppanel import SetupPanel
-from utils import EmbedPaginator, GlobalCMDS, SubcommandHelp
+from utils import EmbedPaginator, GlobalCMDS, ScheduledJob, SubcommandHelp
 
 _CONF = ["✅", "❌"]
+_FOOTER = ("This gatherer is accepting responses. To enter a response, simply type into this channel. "
+           "Note that duplicate responses will not be counted\n\nReceived {} response{} so far...")
+
+
+def _hash(content: str) -> str:
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+def _format_entry(user_id: int, content: str, anonymous: bool) -> str:
+    return content + (f" - <@{user_id}>" if user_id and not anonymous else "")
 
 
 def validate_channel():
@@ -61,27 +72,31 @@ def cleanup_task():
     def wrapper(func: Callable):
         @functools.wraps(func)
         async def deco(self: commands.Cog, channel_id: int, *args, **kwargs):
-            tasks = [task for task in self._tasks if task.get_name() == str(channel_id)]
-            if tasks:
-                tasks[0].cancel()
+            await self.bot.scheduler.cancel_key("gather_expire", str(channel_id))
             return await func(self, channel_id, *args, **kwargs)
         return deco
     return wrapper
 
 
+class ActiveGatherer():
+    __slots__ = ("message_id", "hashes", "panel")
+
+    def __init__(self, message_id: int, hashes: Set[str] = None):
+        self.message_id = message_id
+        self.hashes = hashes or set()
+        self.panel: discord.Message = None
+
+
 class Gather(commands.Cog):
     def __init__(self, bot: AutoShardedBot) -> None:
         self.bot = bot
         self.gcmds = GlobalCMDS(self.bot)
-        self._tasks: List[asyncio.Task] = []
+        self._active: Dict[int, ActiveGatherer] = {}
+        self._pending: List[Tuple[int, int, str, str]] = []
+        self._dirty: Set[int] = set()
+        self.bot.scheduler.register("gather_expire", self._expire_job)
         self.bot.loop.create_task(self._init_table())
-
-    @staticmethod
-    def _handle_task_result(task: asyncio.Task) -> None:
-        try:
-            task.result()
-        except asyncio.CancelledError:
-            pass
+        self.panel_loop.start()
 
     @staticmethod
     def _validate_timestamp(timestamp: str, convert: bool = False) -> bool:
@@ -95,73 +110,134 @@ class Gather(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
-        context = await self.bot.get_context(message)
-        if not context.valid and message.guild:
-            async with self.bot.db.acquire() as con:
-                data = await con.fetch(
-                    f"SELECT channel_id, message_id, entries FROM gather WHERE channel_id={message.channel.id}",
-                )
-                if data:
-                    channel_id, message_id, entries = data[0]["channel_id"], data[0]["message_id"], data[0]["entries"]
-                    if entries is not None and not message.content in entries and len(message.content) <= 144 and not message.author.bot:
-                        entries.append(message.content)
-                        payload = json.dumps({
-                            "user_id": message.author.id,
-                            "content": message.content,
-                        })
-                        await con.execute(
-                            f"UPDATE gather SET entries=array_append(entries, $text${payload}$text$) WHERE channel_id={channel_id}"
-                        )
-                        channel: discord.TextChannel = self.bot.get_channel(channel_id)
-                        gather_message = await channel.fetch_message(message_id)
-                        embed: discord.Embed = gather_message.embeds[0]
-                        await gather_message.edit(
-                            embed=embed.set_footer(
-                                text="This gatherer is accepting responses. To enter a response, "
-                                "simply type into this channel. Note that duplicate responses will "
-                                f"not be counted\n\nReceived {len(entries)} response{'s' if len(entries) != 1 else ''} so far..."
-                            )
-                        )
-                    await self.gcmds.smart_delete(message)
-        return
+        # Bot messages never reach on_parsed_message, but still don't belong in a gather channel
+        if not message.author.bot or not message.guild or not self.bot.guild_cache.is_gatherer(message.channel.id):
+            return
+        if await self._get_gatherer(message.channel.id):
+            await self.gcmds.smart_delete(message)
+
+    @commands.Cog.listener()
+    async def on_parsed_message(self, ctx: Context) -> None:
+        message: discord.Message = ctx.message
+        if not message.guild or not self.bot.guild_cache.is_gatherer(message.channel.id) or ctx.valid:
+            return
+        gatherer = await self._get_gatherer(message.channel.id)
+        if not gatherer:
+            return
+        if len(message.content) <= 144:
+            content_hash = _hash(message.content)
+            if content_hash not in gatherer.hashes:
+                gatherer.hashes.add(content_hash)
+                self._pending.append((message.channel.id, message.author.id, message.content, content_hash))
+                self._dirty.add(message.channel.id)
+        await self.gcmds.smart_delete(message)
 
     def cog_unload(self):
-        for task in self._tasks:
-            task.cancel()
+        self.bot.scheduler.unregister("gather_expire")
+        self.panel_loop.cancel()
+        self.bot.loop.create_task(self._flush_entries())
+
+    async def _get_gatherer(self, channel_id: int) -> ActiveGatherer:
+        gatherer = self._active.get(channel_id)
+        if gatherer is None:
+            async with self.bot.db.acquire() as con:
+                message_id = await con.fetchval("SELECT message_id FROM gather WHERE channel_id=$1", channel_id)
+                if message_id is None:
+                    return None
+                records = await con.fetch("SELECT content_hash FROM gather_entries WHERE channel_id=$1", channel_id)
+            gatherer = self._active.setdefault(
+                channel_id, ActiveGatherer(message_id, {record["content_hash"] for record in records})
+            )
+        return gatherer
+
+    def _discard_gatherer(self, channel_id: int) -> None:
+        self._active.pop(channel_id, None)
+        self._dirty.discard(channel_id)
+        self._pending = [entry for entry in self._pending if entry[0] != channel_id]
+
+    @staticmethod
+    async def _insert_entries(con, rows: List[Tuple[int, int, str, str]]) -> None:
+        if rows:
+            await con.execute(
+                "INSERT INTO gather_entries(channel_id, user_id, content, content_hash) "
+                "SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::text[], $4::text[]) "
+                "ON CONFLICT (channel_id, content_hash) DO NOTHING",
+                *(list(column) for column in zip(*rows)),
+            )
+
+    async def _flush_entries(self) -> None:
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        try:
+            async with self.bot.db.acquire() as con:
+                await self._insert_entries(con, pending)
+        except Exception:
+            self._pending[:0] = [entry for entry in pending if entry[0] in self._active]
+            raise
+
+    async def _update_panel(self, channel_id: int, gatherer: ActiveGatherer) -> None:
+        if gatherer.panel is None:
+            channel: discord.TextChannel = self.bot.get_channel(channel_id)
+            if not channel:
+                return
+            gatherer.panel = await channel.fetch_message(gatherer.message_id)
+        count = len(gatherer.hashes)
+        embed: discord.Embed = gatherer.panel.embeds[0]
+        await gatherer.panel.edit(embed=embed.set_footer(text=_FOOTER.format(count, "s" if count != 1 else "")))
+
+    @tasks.loop(seconds=5)
+    async def panel_loop(self) -> None:
+        try:
+            await self._flush_entries()
+        except Exception:
+            pass
+        dirty, self._dirty = self._dirty, set()
+        for channel_id in dirty:
+            gatherer = self._active.get(channel_id)
+            if gatherer:
+                try:
+                    await self._update_panel(channel_id, gatherer)
+                except discord.HTTPException:
+                    pass
 
     async def _init_table(self) -> None:
         await self.bot.wait_until_ready()
         async with self.bot.db.acquire() as con:
             await con.execute(
                 "CREATE TABLE IF NOT EXISTS gather(guild_id BIGINT, channel_id BIGINT PRIMARY KEY, "
-                "message_id BIGINT, expire_at NUMERIC, entries TEXT[] DEFAULT NULL, anonymous BOOLEAN DEFAULT FALSE)"
+                "message_id BIGINT, expire_at NUMERIC, anonymous BOOLEAN DEFAULT FALSE)"
             )
-        task = self.bot.loop.create_task(self._check_expiry())
-        task.add_done_callback(self._handle_task_result)
-        self._tasks.append(task)
-
-    async def _check_expiry(self) -> None:
-        while True:
-            async with self.bot.db.acquire() as con:
-                entries = await con.fetch(
-                    f"SELECT channel_id, expire_at FROM gather"
-                )
-            now = int(datetime.datetime.now().timestamp())
-            for entry in entries:
-                channel_id, expire_at = entry["channel_id"], entry["expire_at"]
-                if now + 60 >= expire_at:
-                    task = self.bot.loop.create_task(
-                        self._wrapper(
-                            channel_id, delay=expire_at - now
-                        )
-                    )
-                    task.add_done_callback(self._handle_task_result)
-                    self._tasks.append(task)
-            await asyncio.sleep(60)
+            await con.execute(
+                "CREATE TABLE IF NOT EXISTS gather_entries(channel_id BIGINT, seq BIGSERIAL, user_id BIGINT, "
+                "content TEXT, content_hash TEXT, PRIMARY KEY (channel_id, seq))"
+            )
+            await con.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS gather_entries_hash_idx ON gather_entries(channel_id, content_hash)"
+            )
+            if await con.fetchval("SELECT 1 FROM information_schema.columns "
+                                  "WHERE table_name='gather' AND column_name='entries'"):
+                rows = []
+                for record in await con.fetch("SELECT channel_id, entries FROM gather"):
+                    for entry in record["entries"] or []:
+                        try:
+                            payload = json.loads(entry)
+                            user_id, content = payload["user_id"], payload["content"]
+                        except (json.JSONDecodeError, TypeError, KeyError):
+                            user_id, content = None, entry
+                        rows.append((record["channel_id"], user_id, content, _hash(content)))
+                async with con.transaction():
+                    await self._insert_entries(con, rows)
+                    await con.execute("ALTER TABLE gather DROP COLUMN entries")
+            entries = await con.fetch(
+                f"SELECT channel_id, expire_at FROM gather"
+            )
+        await self.bot.scheduler.schedule_many("gather_expire", (
+            (str(entry["channel_id"]), entry["expire_at"], {"channel_id": entry["channel_id"]}) for entry in entries
+        ))
 
-    async def _wrapper(self, channel_id: int, delay: int = 0) -> None:
-        await asyncio.sleep(delay)
-        return await self._expire(channel_id, send_embed=True)
+    async def _expire_job(self, job: ScheduledJob) -> None:
+        return await self._expire(int(job.payload["channel_id"]), send_embed=True)
 
     async def _show_all_gatherers(self, ctx: Context) -> discord.Message:
         async with self.bot.db.acquire() as con:
@@ -203,16 +279,16 @@ class Gather(commands.Cog):
                 description=description,
                 color=color,
             ).set_footer(
-                text="This gatherer is accepting responses. To enter a response, "
-                "simply type into this channel. Note that duplicate responses will "
-                "not be counted\n\nReceived 0 responses so far..."
+                text=_FOOTER.format(0, "s"),
             )
         )
         async with self.bot.db.acquire() as con:
             await con.execute(
-                "INSERT INTO gather(guild_id, channel_id, message_id, expire_at, entries, anonymous) VALUES "
-                f"({ctx.guild.id}, {channel.id}, {message.id}, {expire_at}, '{'{}'}', {anonymous})"
+                "INSERT INTO gather(guild_id, channel_id, message_id, expire_at, anonymous) VALUES "
+                f"({ctx.guild.id}, {channel.id}, {message.id}, {expire_at}, {anonymous})"
             )
+        self.bot.guild_cache.add_gatherer(channel.id)
+        await self.bot.scheduler.schedule("gather_expire", expire_at, {"channel_id": channel.id}, key=str(channel.id))
         return await ctx.channel.send(
             embed=discord.Embed(
                 title="Gatherer Successfully Created",
@@ -268,26 +344,33 @@ class Gather(commands.Cog):
             )
         )
 
+    @staticmethod
+    async def _pop_entries(con, channel_id: int):
+        return await con.fetch(
+            "WITH deleted AS (DELETE FROM gather_entries WHERE channel_id=$1 RETURNING seq, user_id, content) "
+            "SELECT user_id, content FROM deleted ORDER BY seq",
+            channel_id,
+        )
+
     async def _expire(self, channel_id: int, send_embed: bool = False) -> None:
+        await self._flush_entries()
         async with self.bot.db.acquire() as con:
-            data = await con.fetch(
-                f"DELETE FROM gather WHERE channel_id={channel_id} RETURNING entries, anonymous"
-            )
-        if send_embed:
+            async with con.transaction():
+                anonymous = await con.fetchval(
+                    f"DELETE FROM gather WHERE channel_id={channel_id} RETURNING anonymous"
+                )
+                entries = await self._pop_entries(con, channel_id)
+        self.bot.guild_cache.remove_gatherer(channel_id)
+        self._discard_gatherer(channel_id)
+        if send_embed and anonymous is not None:
             channel: discord.TextChannel = self.bot.get_channel(channel_id)
             embed = discord.Embed(
                 title="Gatherer Results",
                 description="These are the results of the gatherer:\n",
                 color=discord.Color.blue(),
             )
-            anonymous, entries = data[0]["anonymous"], data[0]["entries"]
             for index, entry in enumerate(entries, 1):
-                try:
-                    payload = json.loads(entry)
-                    val = f"{payload['content']}" + str(f" - <@{payload['user_id']}>" if not anonymous else "")
-                except json.JSONDecodeError:
-                    val = entry
-                _desc = f"\n**{index}:** {val}"
+                _desc = f"\n**{index}:** {_format_entry(entry['user_id'], entry['content'], anonymous)}"
                 if len(embed.description) + len(_desc) > 2000:
                     await channel.send(embed=embed)
                     embed = discord.Embed(description="", color=discord.Color.blue())
@@ -305,6 +388,9 @@ class Gather(commands.Cog):
             message_id = await con.fetchval(
                 f"DELETE FROM gather WHERE channel_id={channel_id} RETURNING message_id"
             )
+            await con.execute("DELETE FROM gather_entries WHERE channel_id=$1", channel_id)
+            self.bot.guild_cache.remove_gatherer(channel_id)
+            self._discard_gatherer(channel_id)
             channel: discord.TextChannel = self.bot.get_channel(channel_id)
             message = await channel.fetch_message(message_id)
             await self.gcmds.smart_delete(message)
@@ -446,21 +532,16 @@ class Gather(commands.Cog):
     @commands.has_permissions(manage_guild=True)
     @validate_channel()
     async def gather_peek(self, ctx: Context, channel: discord.TextChannel):
+        await self._flush_entries()
         async with self.bot.db.acquire() as con:
+            anonymous = await con.fetchval(
+                f"SELECT anonymous FROM gather WHERE guild_id={ctx.guild.id} AND channel_id={channel.id}"
+            )
             data = await con.fetch(
-                f"SELECT entries, anonymous FROM gather WHERE guild_id={ctx.guild.id} AND channel_id={channel.id}"
+                "SELECT user_id, content FROM gather_entries WHERE channel_id=$1 ORDER BY seq", channel.id
             )
-        if data:
-            anonymous = data[0]["anonymous"]
-            entries = []
-            for entry in data[0]["entries"]:
-                try:
-                    _data = json.loads(entry)
-                    entries.append(
-                        f"{_data['content']}" + str(f" - <@{_data['user_id']}>" if not anonymous else '')
-                    )
-                except json.JSONDecodeError:
-                    entries.append(entry)
+        if anonymous is not None and data:
+            entries = [_format_entry(entry["user_id"], entry["content"], anonymous) for entry in data]
             return await EmbedPaginator(
                 ctx,
                 entries=entries,
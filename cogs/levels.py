@@ -0,0 +1,217 @@
+from typing import Optional
+
+import discord
+from discord.ext import commands
+from discord.ext.commands import AutoShardedBot, Context
+from utils import FieldPaginator, GlobalCMDS, SubcommandHelp, customerrors
+from utils.levels import _calc_req_xp, gen_profile
+
+_LEADERBOARD_SIZE = 100
+_GLOBAL = ["global", "g"]
+_ROLE_TYPES = {"add": "add", "a": "add", "replace": "replace", "r": "replace"}
+
+
+class Levels(commands.Cog):
+    def __init__(self, bot: AutoShardedBot) -> None:
+        self.bot = bot
+        self.gcmds = GlobalCMDS(self.bot)
+
+    async def _check_enabled(self, ctx: Context) -> None:
+        config = await self.bot.levels.get_config(ctx.guild.id)
+        if not config.enabled:
+            raise customerrors.LevelNotEnabled()
+
+    async def _send_confirm(self, ctx: Context, title: str, description: str) -> discord.Message:
+        return await ctx.channel.send(
+            embed=discord.Embed(
+                title=title,
+                description=f"{ctx.author.mention}, {description}",
+                color=discord.Color.blue(),
+            )
+        )
+
+    def _display_name(self, ctx: Context, user_id: int) -> str:
+        user = (ctx.guild and ctx.guild.get_member(user_id)) or self.bot.get_user(user_id)
+        return user.display_name if user else str(user_id)
+
+    @commands.group(invoke_without_command=True,
+                    aliases=["lvl", "levels"],
+                    desc="Shows the help for level commands",
+                    usage="level (subcommand)")
+    async def level(self, ctx: Context):
+        pfx = f"{await self.gcmds.prefix(ctx)}level"
+        return await SubcommandHelp(
+            pfx=pfx,
+            title="Level Help",
+            description="UconnSmashBot's leveling feature rewards active members with XP. "
+            f"The base command is `{pfx}`. Here are all valid subcommands",
+            per_page=3,
+        ).from_config("level").show_help(ctx)
+
+    @level.command(name="enable",
+                   aliases=["on"])
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def level_enable(self, ctx: Context, channels: commands.Greedy[discord.TextChannel] = None):
+        async with self.bot.db.acquire() as con:
+            async with con.transaction():
+                await con.execute("INSERT INTO level_config(guild_id, enabled) VALUES ($1, TRUE) "
+                                  "ON CONFLICT (guild_id) DO UPDATE SET enabled=TRUE", ctx.guild.id)
+                if channels:
+                    await con.execute("DELETE FROM level_disabled WHERE guild_id=$1 AND channel_id=ANY($2::bigint[])",
+                                      ctx.guild.id, [channel.id for channel in channels])
+                else:
+                    await con.execute("DELETE FROM level_disabled WHERE guild_id=$1", ctx.guild.id)
+        self.bot.levels.invalidate_config(ctx.guild.id)
+        where = ", ".join(channel.mention for channel in channels) if channels else "all channels"
+        return await self._send_confirm(ctx, "Leveling Enabled", f"leveling has been enabled in {where}")
+
+    @level.command(name="disable",
+                   aliases=["off"])
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def level_disable(self, ctx: Context, channels: commands.Greedy[discord.TextChannel] = None):
+        await self._check_enabled(ctx)
+        async with self.bot.db.acquire() as con:
+            if channels:
+                await con.execute("INSERT INTO level_disabled(guild_id, channel_id) "
+                                  "SELECT $1, unnest($2::bigint[]) ON CONFLICT (channel_id) DO NOTHING",
+                                  ctx.guild.id, [channel.id for channel in channels])
+            else:
+                await con.execute("UPDATE level_config SET enabled=FALSE WHERE guild_id=$1", ctx.guild.id)
+        self.bot.levels.invalidate_config(ctx.guild.id)
+        where = ", ".join(channel.mention for channel in channels) if channels else "all channels"
+        return await self._send_confirm(ctx, "Leveling Disabled", f"leveling has been disabled in {where}")
+
+    @level.command(name="profile",
+                   aliases=["card"])
+    @commands.guild_only()
+    async def level_profile(self, ctx: Context, member: Optional[discord.Member] = None, mode: str = None):
+        member = member or ctx.author
+        glob = mode in _GLOBAL
+        if not glob:
+            await self._check_enabled(ctx)
+        async with ctx.channel.typing():
+            export, embed = await gen_profile(self.bot, member, mode="global" if glob else "guild")
+        return await ctx.channel.send(file=export, embed=embed)
+
+    @level.command(name="rank")
+    @commands.guild_only()
+    async def level_rank(self, ctx: Context, member: Optional[discord.Member] = None, mode: str = None):
+        member = member or ctx.author
+        glob = mode in _GLOBAL
+        if not glob:
+            await self._check_enabled(ctx)
+        state = await (self.bot.levels.get_global(member.id) if glob else
+                       self.bot.levels.get_member(ctx.guild.id, member.id))
+        rank, total = await self.bot.levels.get_rank(member.id, None if glob else ctx.guild.id)
+        return await ctx.channel.send(
+            embed=discord.Embed(
+                title=f"{member.display_name}'s {'Global' if glob else 'Server'} Rank",
+                description=f"**Rank:** {f'#{rank} of {total}' if rank else 'Unranked'}\n"
+                f"**Level:** {state.level}\n"
+                f"**XP:** {state.xp}/{_calc_req_xp(state.level)}",
+                color=discord.Color.blue(),
+            ).set_thumbnail(
+                url=member.avatar_url,
+            )
+        )
+
+    @level.command(name="leaderboard",
+                   aliases=["lb", "top"])
+    @commands.guild_only()
+    async def level_leaderboard(self, ctx: Context, mode: str = None):
+        glob = mode in _GLOBAL
+        if not glob:
+            await self._check_enabled(ctx)
+        leaderboard = await self.bot.levels.get_leaderboard(None if glob else ctx.guild.id, limit=_LEADERBOARD_SIZE)
+        if not leaderboard:
+            return await ctx.channel.send(
+                embed=discord.Embed(
+                    title="No Leaderboard",
+                    description=f"{ctx.author.mention}, nobody has earned any XP yet",
+                    color=discord.Color.dark_red(),
+                )
+            )
+        rank, total = await self.bot.levels.get_rank(ctx.author.id, None if glob else ctx.guild.id)
+        entries = [
+            (f"#{index} {self._display_name(ctx, user_id)}", f"Level {level} • {xp}/{_calc_req_xp(level)} XP", False)
+            for index, (user_id, level, xp) in enumerate(leaderboard, 1)
+        ]
+        return await FieldPaginator(
+            ctx,
+            entries=entries,
+            per_page=10,
+            show_entry_count=False,
+            footer=f"Your rank: {f'#{rank} of {total}' if rank else 'Unranked'}",
+            embed=discord.Embed(
+                title=f"{'Global' if glob else ctx.guild.name} Level Leaderboard",
+                color=discord.Color.blue(),
+            ),
+        ).paginate()
+
+    @commands.group(invoke_without_command=True,
+                    aliases=["lr"],
+                    desc="Shows the help for levelroles commands",
+                    usage="levelroles (subcommand)")
+    async def levelroles(self, ctx: Context):
+        pfx = f"{await self.gcmds.prefix(ctx)}levelroles"
+        return await SubcommandHelp(
+            pfx=pfx,
+            title="Level Roles Help",
+            description="Level roles are given to members once they reach a certain level. "
+            f"The base command is `{pfx}`. Here are all valid subcommands",
+            per_page=3,
+        ).from_config("levelroles").show_help(ctx)
+
+    @levelroles.command(name="give",
+                        aliases=["set"])
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def levelroles_give(self, ctx: Context, level: int, role_type: str, roles: commands.Greedy[discord.Role]):
+        if not 1 <= level <= 100:
+            raise customerrors.LevelInvalidRange(level)
+        if role_type.lower() not in _ROLE_TYPES:
+            raise customerrors.LevelInvalidType(role_type)
+        if not roles:
+            raise commands.MissingRequiredArgument(ctx.command.clean_params["roles"])
+        await self._check_enabled(ctx)
+        role_ids = [role.id for role in roles]
+        async with self.bot.db.acquire() as con:
+            if await con.fetchval("SELECT 1 FROM level_roles WHERE role_id=ANY($1::bigint[]) AND obtain_at<>$2",
+                                  role_ids, level):
+                raise customerrors.LevelRolesExists()
+            await con.execute("INSERT INTO level_roles(guild_id, role_id, obtain_at, type) "
+                              "SELECT $1, unnest($2::bigint[]), $3, $4 ON CONFLICT (role_id) DO NOTHING",
+                              ctx.guild.id, role_ids, level, _ROLE_TYPES[role_type.lower()])
+            # Every role at a level shares the level's reward type
+            await con.execute("UPDATE level_roles SET type=$3 WHERE guild_id=$1 AND obtain_at=$2",
+                              ctx.guild.id, level, _ROLE_TYPES[role_type.lower()])
+        self.bot.levels.invalidate_config(ctx.guild.id)
+        return await self._send_confirm(
+            ctx, "Level Roles Set",
+            f"{', '.join(role.mention for role in roles)} will be given at level {level} "
+            f"({_ROLE_TYPES[role_type.lower()]})"
+        )
+
+    @levelroles.command(name="remove",
+                        aliases=["unset"])
+    @commands.guild_only()
+    @commands.has_permissions(manage_guild=True)
+    async def levelroles_remove(self, ctx: Context, level: int, roles: commands.Greedy[discord.Role] = None):
+        if not 1 <= level <= 100:
+            raise customerrors.LevelInvalidRange(level)
+        async with self.bot.db.acquire() as con:
+            if roles:
+                await con.execute("DELETE FROM level_roles WHERE guild_id=$1 AND obtain_at=$2 "
+                                  "AND role_id=ANY($3::bigint[])", ctx.guild.id, level, [role.id for role in roles])
+            else:
+                await con.execute("DELETE FROM level_roles WHERE guild_id=$1 AND obtain_at=$2", ctx.guild.id, level)
+        self.bot.levels.invalidate_config(ctx.guild.id)
+        removed = ", ".join(role.mention for role in roles) if roles else "all roles"
+        return await self._send_confirm(ctx, "Level Roles Removed",
+                                        f"{removed} will no longer be given at level {level}")
+
+
+def setup(bot: AutoShardedBot) -> None:
+    bot.add_cog(Levels(bot))
@@ -5,7 +5,7 @@ from typing import Optional, Sequence, Union
 
 import discord
 from discord.ext import commands
-from utils import GlobalCMDS, SubcommandHelp, customerrors, logdispatcher
+from utils import GlobalCMDS, MessageJournal, SubcommandHelp, customerrors, logdispatcher
 from utils.enums import ConfirmReactions, LogLevel
 from utils.logdispatcher import (ChannelDiff, ChannelOverwriteDiff,
                                  EmojiAttrDiff, GuildDiff, GuildRoleDiff,
@@ -67,8 +67,26 @@ class Logging(commands.Cog):
         self.bot = bot
         self.gcmds = GlobalCMDS(self.bot)
         self.bot.loop.create_task(self.init_logging())
-        self.guild_dispatch = logdispatcher.GuildDispatcher(self.bot)
-        self.member_dispatch = logdispatcher.MemberDispatcher(self.bot)
+        self.log_cache = logdispatcher.LogProfileCache(self.bot)
+        self.log_batcher = logdispatcher.LogBatcher(self.bot, self.log_cache)
+        self.guild_dispatch = logdispatcher.GuildDispatcher(self.bot, cache=self.log_cache, batcher=self.log_batcher)
+        self.member_dispatch = logdispatcher.MemberDispatcher(self.bot, cache=self.log_cache, batcher=self.log_batcher)
+        self.journal = MessageJournal(self.bot)
+
+    def cog_unload(self):
+        self.log_batcher.close()
+        self.bot.loop.create_task(self.journal.close())
+
+    async def _journaling(self, guild_id: int) -> bool:
+        if not guild_id:
+            return False
+        profile = await self.log_cache.get(guild_id)
+        return profile.journaling
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message):
+        if message.guild and not message.author.bot and await self._journaling(message.guild.id):
+            self.journal.record(message)
 
     @commands.Cog.listener()
     async def on_command_completion(self, ctx):
@@ -202,6 +220,7 @@ class Logging(commands.Cog):
 
     @commands.Cog.listener()
     async def on_webhooks_update(self, channel: discord.abc.GuildChannel):
+        self.log_cache.invalidate_webhook(channel)
         await self.guild_dispatch.channel_webhooks_update(channel)
 
     @commands.Cog.listener()
@@ -261,18 +280,29 @@ class Logging(commands.Cog):
 
     @commands.Cog.listener()
     async def on_raw_message_edit(self, payload: discord.RawMessageUpdateEvent):
+        before = None
+        guild_id = payload.data.get("guild_id")
+        if "content" in payload.data and await self._journaling(int(guild_id) if guild_id else None):
+            entry = await self.journal.update(payload.message_id, payload.data["content"])
+            before = entry.content if entry else None
         await self.guild_dispatch.message_raw_edit(
             payload.message_id,
             payload.channel_id,
-            payload.data
+            payload.data,
+            payload.cached_message,
+            before=before
         )
 
     @commands.Cog.listener()
     async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        journaled = None
+        if await self._journaling(payload.guild_id):
+            journaled = await self.journal.pop(payload.message_id)
         await self.guild_dispatch.message_raw_delete(
             payload.message_id,
             payload.channel_id,
-            payload.cached_message
+            payload.cached_message,
+            journaled=journaled
         )
 
     @commands.Cog.listener()
@@ -289,7 +319,8 @@ class Logging(commands.Cog):
             payload.emoji,
             payload.user_id,
             payload.channel_id,
-            "reaction added"
+            "reaction added",
+            member=payload.member
         )
 
     @commands.Cog.listener()
@@ -329,6 +360,7 @@ class Logging(commands.Cog):
                 await con.execute(f"ALTER TABLE logging ADD COLUMN IF NOT EXISTS \"{command.name.lower()}\" boolean DEFAULT FALSE ")
             for guild in self.bot.guilds:
                 await con.execute(f"INSERT INTO logging(guild_id) VALUES ({guild.id}) ON CONFLICT DO NOTHING")
+        self.journal.start()
         return
 
     async def send_logging_help(self, ctx):
@@ -377,6 +409,7 @@ class Logging(commands.Cog):
             async with self.bot.db.acquire() as con:
                 await con.execute(f"UPDATE guild SET log_channel={channel.id} WHERE guild_id={ctx.guild.id}")
                 await con.execute(f"UPDATE guild SET log_level={LogLevel.BASIC.value} WHERE guild_id={ctx.guild.id} AND log_level=0")
+            self.log_cache.invalidate(ctx.guild.id)
             embed.title = "Logging Channel Set!"
             embed.description = f"{ctx.author.mention}, this server's logging channel was set to {channel.mention}"
             embed.color = discord.Color.blue()
@@ -391,6 +424,7 @@ class Logging(commands.Cog):
         try:
             async with self.bot.db.acquire() as con:
                 await con.execute(f"UPDATE guild SET log_channel=NULL WHERE guild_id={ctx.guild.id}")
+            self.log_cache.invalidate(ctx.guild.id)
             embed.title = "Logging Disabled"
             embed.description = f"{ctx.author.mention}, logging is now disabled on this server"
             embed.color = discord.Color.blue()
@@ -405,6 +439,7 @@ class Logging(commands.Cog):
         try:
             async with self.bot.db.acquire() as con:
                 await con.execute(f"UPDATE guild SET log_level={LogLevel(level_int).value} WHERE guild_id={ctx.guild.id}")
+            self.log_cache.invalidate(ctx.guild.id)
             embed.title = "Logging Level Successfully Updated"
             embed.description = f"{ctx.author.mention}, the server's logging level is now `{LogLevel(level_int).name.lower()}`"
             embed.color = discord.Color.blue()
@@ -422,6 +457,7 @@ class Logging(commands.Cog):
             if not name == "all":
                 async with self.bot.db.acquire() as con:
                     update_bool = await con.fetchval(f"UPDATE logging SET \"{name}\"=NOT \"{name}\" WHERE guild_id={ctx.guild.id} RETURNING \"{name}\"")
+                self.log_cache.invalidate(ctx.guild.id)
                 embed = discord.Embed(title=f"{name.title()} Toggle Set",
                                       description=f"{ctx.author.mention}, logging for the command `{name}` is now "
                                       f"{'enabled' if update_bool else 'disabled'}",
@@ -431,6 +467,7 @@ class Logging(commands.Cog):
                     update_bool = await con.fetchval(f"SELECT help FROM logging WHERE guild_id={ctx.guild.id}")
                     for command in self.bot.commands:
                         await con.execute(f"UPDATE logging SET \"{command.name.lower()}\"={not update_bool} WHERE guild_id={ctx.guild.id}")
+                self.log_cache.invalidate(ctx.guild.id)
                 embed = discord.Embed(title="Command Toggles Set",
                                       description=f"{ctx.author.mention}, logging for all commands were ""{}"
                                       .format("enabled" if not update_bool else "disabled"),
@@ -536,6 +573,38 @@ class Logging(commands.Cog):
     async def hidef(self, ctx):
         return await self.set_logging_level(ctx, 3)
 
+    @logging.command(aliases=['journal', 'history'])
+    @commands.has_permissions(manage_guild=True)
+    async def logging_journal(self, ctx):
+        async with self.bot.db.acquire() as con:
+            enabled = await con.fetchval(f"UPDATE guild SET log_journal=NOT COALESCE(log_journal, FALSE) "
+                                         f"WHERE guild_id={ctx.guild.id} RETURNING log_journal")
+        self.log_cache.invalidate(ctx.guild.id)
+        embed = discord.Embed(title="Message Journal Toggled",
+                              description=f"{ctx.author.mention}, message journaling is now "
+                              f"{'enabled' if enabled else 'disabled'}. While enabled, message content is kept "
+                              f"for up to {self.journal.ttl // 86400} days so that edit and delete logs can show it",
+                              color=discord.Color.blue())
+        return await ctx.channel.send(embed=embed)
+
+    @logging.command(aliases=['stats', 'queue'])
+    @commands.is_owner()
+    async def logging_stats(self, ctx):
+        batcher = self.log_batcher
+        embed = discord.Embed(title="Logging Queue Stats",
+                              description="```{}```".format(
+                                  "\n".join([
+                                      f"Queued: {batcher.queued}",
+                                      f"Sent: {batcher.sent}",
+                                      f"Dropped: {batcher.dropped}",
+                                      f"Backlog: {batcher.backlog}",
+                                      f"Webhook Executes: {batcher.batches}",
+                                      f"Active Queues: {batcher.active_queues}",
+                                  ])
+                              ),
+                              color=discord.Color.blue())
+        return await ctx.channel.send(embed=embed)
+
     @logging.command(aliases=['bl', 'blacklist'])
     @commands.is_owner()
     async def logging_blacklist(self, ctx, guild: discord.Guild = None):
@@ -543,6 +612,7 @@ class Logging(commands.Cog):
             guild = ctx.guild
         async with self.bot.db.acquire() as con:
             await con.execute(f"UPDATE guild SET log_channel=-1, log_level=-1 WHERE guild_id={guild.id}")
+        self.log_cache.invalidate(guild.id)
         embed = discord.Embed(title="Server Logging Blacklisted",
                               description=f"{ctx.author.mention}, the server {guild.name} can no longer utilise any "
                               "logging functionality",
@@ -3,13 +3,13 @@ import os
 import random
 import typing
 from datetime import datetime, timedelta
-from typing import List, Optional, Union
+from typing import Optional, Union
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord.ext.commands import AutoShardedBot, Context
 from setuppanel import SetupPanel
-from utils import GlobalCMDS
+from utils import GlobalCMDS, ScheduledJob
 
 
 class Moderation(commands.Cog):
@@ -17,13 +17,11 @@ class Moderation(commands.Cog):
     def __init__(self, bot: AutoShardedBot):
         self.bot = bot
         self.gcmds = GlobalCMDS(self.bot)
-        self.tasks: List[asyncio.Task] = []
+        self.bot.scheduler.register("unmute", self._unmute_job)
         self.bot.loop.create_task(self.setup_tables())
 
     def cog_unload(self):
-        for task in self.tasks:
-            task.cancel()
-        self.check_mute_expire.cancel()
+        self.bot.scheduler.unregister("unmute")
 
     async def setup_tables(self):
         await self.bot.wait_until_ready()
@@ -32,28 +30,14 @@ class Moderation(commands.Cog):
                               "time NUMERIC DEFAULT NULL)")
             await con.execute("CREATE TABLE IF NOT EXISTS warns(id SERIAL PRIMARY KEY, guild_id bigint, user_id bigint,"
                               " moderator bigint, reason text, timestamp NUMERIC)")
-        self.check_mute_expire.start()
-
-    @tasks.loop(seconds=60)
-    async def check_mute_expire(self):
-        await self.bot.wait_until_ready()
-        async with self.bot.db.acquire() as con:
             result = await con.fetch("SELECT guild_id, user_id, time FROM mutes WHERE time IS NOT NULL")
-        if not result:
-            return
+        await self.bot.scheduler.schedule_many("unmute", (
+            (f"{info['guild_id']}:{info['user_id']}", info['time'],
+             {"guild_id": info['guild_id'], "user_id": info['user_id']}) for info in result
+        ))
 
-        for info in result:
-            user_id = info['user_id']
-            guild_id = info['guild_id']
-            current_time = int(datetime.now().timestamp())
-            time = int(info['time'])
-            sleep_time = int(time - current_time)
-            if sleep_time <= 60 and not any(task.get_name() == f"{guild_id}{user_id}" for task in self.tasks):
-                task = self.bot.loop.create_task(
-                    self.unmute_user(int(guild_id), int(user_id), sleep_time)
-                )
-                task.add_done_callback(self._handle_task_result)
-                self.tasks.append(task)
+    async def _unmute_job(self, job: ScheduledJob) -> None:
+        return await self.unmute_user(int(job.payload["guild_id"]), int(job.payload["user_id"]))
 
     @staticmethod
     def _handle_task_result(task: asyncio.Task) -> None:
@@ -98,24 +82,22 @@ class Moderation(commands.Cog):
                 task.add_done_callback(self._handle_task_result)
         return role
 
-    async def unmute_user(self, guild_id: int, user_id: int, sleep_time: int):
-        await asyncio.sleep(sleep_time)
+    async def unmute_user(self, guild_id: int, user_id: int):
         guild = self.bot.get_guild(guild_id)
-        role = discord.utils.get(guild.roles, name="Muted")
-        if role:
-            member = guild.get_member(user_id)
-            if role in member.roles:
-                await member.remove_roles(role)
-                embed = discord.Embed(title="Your Mute Expired",
-                                      description=f"{member.mention}, your mute has expired in {guild.name}. Please avoid "
-                                      "doing what you were doing to get muted",
-                                      color=discord.Color.blue())
-                try:
-                    await member.send(embed=embed)
-                except (discord.HTTPError, discord.Forbidden):
-                    pass
-            async with self.bot.db.acquire() as con:
-                await con.execute(f"DELETE FROM mutes WHERE user_id={user_id} AND guild_id={guild_id}")
+        role = discord.utils.get(guild.roles, name="Muted") if guild else None
+        member = guild.get_member(user_id) if guild else None
+        if role and member and role in member.roles:
+            await member.remove_roles(role)
+            embed = discord.Embed(title="Your Mute Expired",
+                                  description=f"{member.mention}, your mute has expired in {guild.name}. Please avoid "
+                                  "doing what you were doing to get muted",
+                                  color=discord.Color.blue())
+            try:
+                await member.send(embed=embed)
+            except (discord.HTTPException, discord.Forbidden):
+                pass
+        async with self.bot.db.acquire() as con:
+            await con.execute(f"DELETE FROM mutes WHERE user_id={user_id} AND guild_id={guild_id}")
         return
 
     async def set_mute(self, ctx, member: discord.Member, time: int = None):
@@ -123,17 +105,14 @@ class Moderation(commands.Cog):
             op = f"INSERT INTO mutes(guild_id, user_id) VALUES({ctx.guild.id}, {member.id})"
         else:
             op = f"INSERT INTO mutes(guild_id, user_id, time) VALUES({ctx.guild.id}, {member.id}, {time})"
-            sleep_time = time - int(datetime.now().timestamp())
-            if sleep_time <= 60 and not any(task.get_name() == f"{ctx.guild.id}{member.id}" for task in self.tasks):
-                task = self.bot.loop.create_task(
-                    self.unmute_user(ctx.guild.id, member.id, sleep_time)
-                )
-                task.set_name(f"{ctx.guild.id}{member.id}")
-                task.add_done_callback(self._handle_task_result)
-                self.tasks.append(task)
         async with self.bot.db.acquire() as con:
             await con.execute(f"DELETE FROM mutes WHERE guild_id={ctx.guild.id} AND user_id={member.id}")
             await con.execute(op)
+        if time:
+            await self.bot.scheduler.schedule("unmute", time, {"guild_id": ctx.guild.id, "user_id": member.id},
+                                              key=f"{ctx.guild.id}:{member.id}")
+        else:
+            await self.bot.scheduler.cancel_key("unmute", f"{ctx.guild.id}:{member.id}")
 
     @commands.command(aliases=['clear', 'clean', 'chatclear', 'cleanchat', 'clearchat', 'purge'],
                       desc="Mass clear chat",
@@ -259,6 +238,7 @@ class Moderation(commands.Cog):
                     success.append(member)
                     async with self.bot.db.acquire() as con:
                         await con.execute(f"DELETE FROM mutes WHERE user_id={member.id} AND guild_id={ctx.guild.id}")
+                    await self.bot.scheduler.cancel_key("unmute", f"{ctx.guild.id}:{member.id}")
                     await member.remove_roles(role)
             if success:
                 embed.add_field(
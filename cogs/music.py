@@ -1,3 +1,4 @@
+import asyncio
 import itertools
 import os
 import random
@@ -45,7 +46,6 @@ class Music(commands.Cog):
         async with self.bot.mbdb.acquire() as con:
             await con.execute("CREATE TABLE IF NOT EXISTS music(guild_id bigint PRIMARY KEY, channel_id bigint, dj_id bigint)")
             await con.execute("CREATE TABLE IF NOT EXISTS playlists(id SERIAL, user_id bigint, playlist_name text PRIMARY KEY, urls text[])")
-            await con.execute("CREATE TABLE IF NOT EXISTS music_cache(query text PRIMARY KEY, data JSONB)")
         if not hasattr(bot, 'lavalink'):
             bot.lavalink = MBClient(self.bot, self.bot.user.id)
             data = [self.gcmds.env_check(key) for key in [f"LAVALINK_{info}" for info in "IP PORT PASSWORD".split()]]
@@ -57,6 +57,8 @@ class Music(commands.Cog):
                                       name=f"lavalink-{port}", reconnect_attempts=-1)
             self.bot.add_listener(bot.lavalink.voice_update_handler, 'on_socket_response')
         self.bot.lavalink = bot.lavalink
+        await self.bot.lavalink.track_cache.init_table()
+        await self.bot.lavalink.resume_cache_rebuild()
         self.bot.lavalink.add_event_hook(self.track_hook)
         self.lavalink = self.bot.lavalink
         SCARED_IDS = [int(id) for id in os.getenv("SCARED_IDS").split(",")]
@@ -65,6 +67,7 @@ class Music(commands.Cog):
         for task in self.tasks:
             task.cancel()
         self.bot.lavalink._event_hooks.clear()
+        self.bot.loop.create_task(self.bot.lavalink.track_cache.flush())
 
     async def cog_check(self, ctx):
         return True if ctx.command.name in _PASS_CHECK else True if "musiccache" in ctx.command.name else await context.music_bind(ctx)
@@ -217,12 +220,12 @@ class Music(commands.Cog):
                       desc="Exports UconnSmashBot's lavalink cache",
                       usage="musiccacheexport [format] (query)",
                       uperms=["Bot Owner Only"],
-                      note="Supported formats are JSON and PICKLE")
+                      note="Supported formats are MBC (compressed binary) and JSON")
     @commands.is_owner()
     async def musiccacheexport(self, ctx, format: str = None, *, query: str = None):
-        if not format or not format.lower() in ["json", "pickle"]:
+        if not format or not format.lower() in ["mbc", "json"]:
             embed = discord.Embed(title="Invalid Format",
-                                  description=f"{ctx.author.mention}, please pick a either JSON or PICKLE as the export format",
+                                  description=f"{ctx.author.mention}, please pick a either MBC or JSON as the export format",
                                   color=discord.Color.dark_red())
         else:
             embed = await MBPlayer.export_cache(self.bot, query=query, format=format.lower())
@@ -240,10 +243,10 @@ class Music(commands.Cog):
                       desc="Clears the music cache",
                       usage="musiccacheclear",
                       uperms=["Bot Owner Only"],
-                      note="A backup of the current cache will be made in JSON format")
+                      note="A backup of the current cache will be made in MBC format")
     @commands.is_owner()
     async def musiccacheclear(self, ctx):
-        await MBPlayer.export_cache(self.bot, format="pickle")
+        await MBPlayer.export_cache(self.bot, format="mbc")
         return await ctx.channel.send(embed=await MBPlayer.evict_cache(self.bot, "", clear_all=True))
 
     @commands.command(aliases=["mcr"],
@@ -279,45 +282,46 @@ class Music(commands.Cog):
                               description=f"{ctx.author.mention}, the cache has been reloaded ",
                               color=discord.Color.blue())
         embed.description += f"for query ```{query}```" if query else "for all entries without data"
+        if query is None:
+            running = self.lavalink.rebuild is not None
+            rebuild = await self.lavalink.efficient_cache_rebuild(ctx.guild.id, missing_only=True)
+            embed.title = "Cache Rebuild Already Running" if running else "Cache Reload Started"
+            embed.description = f"{ctx.author.mention}, entries are being reloaded in the background. " \
+                "Use `musiccacheinfo` to check on its progress\n\n" + rebuild.status()
+            return await ctx.channel.send(embed=embed)
         player = get_player(self.bot, ctx)
         async with self.bot.mbdb.acquire() as con:
-            if query is None:
-                entries = await con.fetch("SELECT query FROM music_cache WHERE data=NULL")
-                for entry in entries:
-                    task = self.bot.loop.create_task(player.get_tracks(entry["query"], force_recache=True))
-                    task.add_done_callback(self._handle_task_result)
-            else:
-                _query = await con.fetchval(
-                    f"SELECT query FROM music_cache WHERE query=$query${query}$query$ OR query=$query$ytsearch:{query}$query$ OR query=$query$scsearch:{query}$query$ LIMIT 1"
-                )
-                if _query:
-                    await player.get_tracks(f"ytsearch:{query}", force_recache=True)
-                else:
-                    embed.description = f"{ctx.author.mention}, I could not find an entry for ```{query}```"
+            _query = await con.fetchval(
+                f"SELECT query FROM music_cache WHERE query=$query${query}$query$ OR query=$query$ytsearch:{query}$query$ OR query=$query$scsearch:{query}$query$ LIMIT 1"
+            )
+        if _query:
+            await player.get_tracks(_query, force_recache=True)
+        else:
+            embed.description = f"{ctx.author.mention}, I could not find an entry for ```{query}```"
         return await ctx.channel.send(embed=embed)
 
     @commands.command(aliases=["mcrb"],
                       desc="Rebuilds the cache",
                       usage="musiccacherebuild",
-                      uperms=["Bot Owner Only"])
+                      uperms=["Bot Owner Only"],
+                      note="The rebuild runs in the background, oldest entries first, and resumes after a restart. "
+                      "Use `musiccacheinfo` to check on its progress")
     @commands.is_owner()
     async def musiccacherebuild(self, ctx):
+        running = self.lavalink.rebuild is not None
+        rebuild = await self.lavalink.efficient_cache_rebuild(ctx.guild.id)
         embed = discord.Embed(
-            title="Queuing Recache...",
-            description=f"{ctx.author.mention}, I am submitting all queries in cache for recache. Depending on the size of the cache, this may take a while. Please be patient...",
+            title="Cache Rebuild Already Running" if running else "Rebuilding Cache...",
+            description=f"{ctx.author.mention}, all queries in cache are being recached in the background. Depending "
+            "on the size of the cache, this may take a long while. Please be extremely patient...\n\n" + rebuild.status(),
             color=discord.Color.blue()
         )
-        start_time = int(datetime.now().timestamp())
-        loading = await ctx.channel.send(embed=embed)
-        fut = self.bot.loop.create_future()
-        embed.title = "Rebuilding Cache..."
-        embed.description = f"{ctx.author.mention}, I've queued all queries in cache for recache. Depending on the size of the cache, this may take a long while. Please be extremely patient..."
-        now = int(datetime.now().timestamp())
-        await loading.edit(embed=embed) if now - start_time <= 30 else await ctx.channel.send(embed=embed)
-        await self.lavalink.efficient_cache_rebuild(ctx.guild.id, fut)
-        await fut
+        await ctx.channel.send(embed=embed)
+        if running:
+            return
+        await asyncio.shield(rebuild.task)
         embed.title = "Cache Rebuild Completed"
-        embed.description = f"{ctx.author.mention}, the cache has been successfully rebuilt"
+        embed.description = f"{ctx.author.mention}, the cache has been successfully rebuilt\n\n" + rebuild.status()
         return await ctx.channel.send(embed=embed)
 
     @commands.command(desc="Binds the music commands to a channel",
@@ -218,6 +218,20 @@ class Owner(commands.Cog):
             await self.bot.close()
         self.bot.loop.create_task(close())
 
+    @commands.command(aliases=['pbench'],
+                      desc="Benchmarks the profile card renderer",
+                      usage="profilebench (count)",
+                      uperms=OWNER_PERM)
+    @commands.is_owner()
+    async def profilebench(self, ctx, count: int = 50):
+        async with ctx.channel.typing():
+            rate = await self.bot.profiles.benchmark(count)
+        embed = discord.Embed(title="Profile Card Benchmark",
+                              description=f"Rendered {count} cards at **{rate:.2f} cards/s**\n\n"
+                              f"{self.bot.profiles.stats()}",
+                              color=discord.Color.blue())
+        return await ctx.channel.send(embed=embed)
+
     @commands.command(desc="Runs a command as a different user",
                       usage="sudo [@member] (#channel) [invocation]",
                       uperms=OWNER_PERM,
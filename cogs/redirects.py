@@ -108,6 +108,8 @@ class Redirects(commands.Cog):
                                                   f"author_id={ctx.author.id} WHERE command='{command.name.lower()}' AND guild_id={ctx.guild.id}")
             except Exception:
                 raise customerrors.RedirectSetError()
+            finally:
+                await self.bot.guild_cache.reload_redirects(ctx.guild.id)
             embed = discord.Embed(title="Redirects Set Successfully",
                                   description=f"{ctx.author.mention}, the redirects were set successfully",
                                   color=discord.Color.blue())
@@ -175,6 +177,8 @@ class Redirects(commands.Cog):
                             await con.execute(f"DELETE FROM redirects WHERE command='{command.name.lower()}' AND guild_id={ctx.guild.id}")
             except Exception:
                 raise customerrors.RedirectRemoveError()
+            finally:
+                await self.bot.guild_cache.reload_redirects(ctx.guild.id)
             embed = discord.Embed(title="Redirects Removed Successfully",
                                   description=f"{ctx.author.mention}, the redirects were removed successfully",
                                   color=discord.Color.blue())
@@ -1,7 +1,7 @@
 import asyncio
 import re
 from contextlib import suppress
-from typing import List, Tuple
+from typing import Dict, List, Tuple
 
 import discord
 from asyncpg.exceptions import UniqueViolationError
@@ -25,10 +25,20 @@ TYPE_NAME = {
 }
 
 
+class ReactionRolePanel():
+    __slots__ = ("type", "limit", "roles")
+
+    def __init__(self, type: str, limit: int = 0, roles: Dict[str, int] = None):
+        self.type = type
+        self.limit = limit or 0
+        self.roles = roles or {}
+
+
 class Roles(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.gcmds = GlobalCMDS(self.bot)
+        self._panels: Dict[int, ReactionRolePanel] = {}
         self.bot.loop.create_task(self.init_roles())
 
     async def init_roles(self):
@@ -38,29 +48,36 @@ class Roles(commands.Cog):
                               "type text, author_id bigint, guild_id bigint, jump_url text, _limit smallint DEFAULT 0)")
             await con.execute("CREATE TABLE IF NOT EXISTS emoji_rr(message_id bigint, role_id bigint PRIMARY KEY, emoji text)")
             await con.execute("CREATE TABLE IF NOT EXISTS autoroles(role_id bigint, type text, guild_id bigint, author_id bigint)")
+            panels = await con.fetch("SELECT message_id, type, _limit FROM base_rr")
+            emojis = await con.fetch("SELECT message_id, role_id, emoji FROM emoji_rr")
+        self._panels = {
+            panel["message_id"]: ReactionRolePanel(panel["type"], panel["_limit"]) for panel in panels
+        }
+        for entry in emojis:
+            panel = self._panels.get(entry["message_id"])
+            if panel:
+                panel.roles[entry["emoji"]] = entry["role_id"]
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
-        await self.bot.wait_until_ready()
-        async with self.bot.db.acquire() as con:
-            type = await con.fetchval(f"SELECT type FROM base_rr WHERE message_id={int(payload.message_id)}")
-            role_id = await con.fetchval(f"SELECT role_id FROM emoji_rr WHERE message_id={payload.message_id} "
-                                         f"AND emoji=$tag${str(payload.emoji)}$tag$")
+        panel = self._panels.get(payload.message_id)
+        if not panel:
+            return
+        type = panel.type
+        role_id = panel.roles.get(str(payload.emoji))
         if type and role_id:
             member: discord.Member = payload.member
             if member and not member.bot:
                 with suppress(discord.Forbidden, discord.NotFound):
-                    async with self.bot.db.acquire() as con:
-                        role_emoji = await con.fetch(f"SELECT role_id, emoji FROM emoji_rr WHERE message_id={payload.message_id} "
-                                                     f"AND role_id!={role_id}")
-                        limit = await con.fetchval(f"SELECT _limit FROM base_rr WHERE message_id={payload.message_id}")
+                    role_emoji = [(_role_id, emoji) for emoji, _role_id in panel.roles.items() if _role_id != role_id]
+                    limit = panel.limit
                     role = discord.utils.get(member.roles, id=int(role_id))
                     if "normal" in type and not role:
                         await member.add_roles(member.guild.get_role(int(role_id)))
                     elif type == "reverse" and role:
                         await member.remove_roles(role)
                     elif type == 'single_normal':
-                        channel = await self.bot.fetch_channel(payload.channel_id)
+                        channel = self.bot.get_channel(payload.channel_id)
                         message: discord.Message = await channel.fetch_message(payload.message_id)
                         roles = []
                         for role_id, emoji in role_emoji:
@@ -72,7 +89,7 @@ class Roles(commands.Cog):
                             await message.remove_reaction(emoji, member)
                         await member.remove_roles(*roles)
                     elif type == 'limit':
-                        channel = await self.bot.fetch_channel(payload.channel_id)
+                        channel = self.bot.get_channel(payload.channel_id)
                         message = await channel.fetch_message(payload.message_id)
                         reacted = len(
                             [user for reaction in message.reactions for user in await reaction.users().flatten() if user.id == member.id]
@@ -85,21 +102,20 @@ class Roles(commands.Cog):
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        await self.bot.wait_until_ready()
-        async with self.bot.db.acquire() as con:
-            type = await con.fetchval(f"SELECT type FROM base_rr WHERE message_id={payload.message_id}")
-        if not type:
+        panel = self._panels.get(payload.message_id)
+        if not panel or not panel.type:
+            return
+        type = panel.type
+        role_id = panel.roles.get(str(payload.emoji))
+        if not role_id:
             return
 
-        guild = await self.bot.fetch_guild(payload.guild_id)
-        member = await guild.fetch_member(payload.user_id)
+        guild = self.bot.get_guild(payload.guild_id)
+        member = guild.get_member(payload.user_id) or await guild.fetch_member(payload.user_id)
         if member.bot:
             return
 
         with suppress(discord.Forbidden, discord.NotFound):
-            async with self.bot.db.acquire() as con:
-                role_id = await con.fetchval(f"SELECT role_id FROM emoji_rr WHERE message_id={payload.message_id} "
-                                             f"AND emoji=$tag${str(payload.emoji)}$tag$")
             if role_id:
                 role = discord.utils.get(member.roles, id=int(role_id))
                 if "normal" in type and role:
@@ -187,15 +203,18 @@ class Roles(commands.Cog):
             await con.execute(f"INSERT INTO base_rr(message_id, channel_id, type, author_id, guild_id, jump_url{', _limit' if limit else ''}) VALUES "
                               f"({rr_message.id}, {channel.id}, $tag${type_name}$tag$, {ctx.author.id}, {ctx.guild.id},"
                               f" '{rr_message.jump_url}'{f', {limit}' if limit else ''})")
+            panel = self._panels[rr_message.id] = ReactionRolePanel(type_name, limit)
             succeeded = []
             try:
                 for role, emoji in roles_emojis:
                     await rr_message.add_reaction(emoji)
                     await con.execute(f"INSERT INTO emoji_rr(message_id, role_id, emoji) VALUES ({rr_message.id}, {role.id}, '{emoji}')")
+                    panel.roles[str(emoji)] = role.id
                     succeeded.append((role, emoji))
             except UniqueViolationError:
                 for role, emoji in succeeded:
                     await con.execute(f"DELETE FROM emoji_rr WHERE message_id={rr_message.id} AND role_id={role.id} AND emoji='{emoji}'")
+                self._panels.pop(rr_message.id, None)
                 await self.gcmds.smart_delete(rr_message)
                 return await ctx.channel.send(
                     embed=discord.Embed(
@@ -214,17 +233,22 @@ class Roles(commands.Cog):
 
     async def edit_rr_message(self, ctx: Context, message: discord.Message, new_embed: discord.Embed,
                               roles_emojis: List[Tuple[discord.Role, str]], type_name: str, limit: int) -> discord.Message:
+        panel = self._panels.setdefault(message.id, ReactionRolePanel(type_name, limit))
         async with self.bot.db.acquire() as con:
             if roles_emojis:
                 await self.gcmds.smart_clear(message)
                 await con.execute(f"DELETE FROM emoji_rr WHERE message_id={message.id}")
+                panel.roles = {}
                 for role, emoji in roles_emojis:
                     await message.add_reaction(emoji)
                     await con.execute(f"INSERT INTO emoji_rr(message_id, role_id, emoji) VALUES ({message.id}, {role.id}, $tag${emoji}$tag$)")
+                    panel.roles[str(emoji)] = role.id
             if type_name:
                 await con.execute(f"UPDATE base_rr SET type=$tag${type_name}$tag$ WHERE message_id={message.id}")
+                panel.type = type_name
             if limit:
-                await con.execute(f"UPDATE base_rr SET limit={limit} WHERE message_id={message.id}")
+                await con.execute(f"UPDATE base_rr SET _limit={limit} WHERE message_id={message.id}")
+                panel.limit = limit
         await message.edit(embed=new_embed)
         return await ctx.channel.send(embed=discord.Embed(
             title="Reactionroles Successfully Edited",
@@ -270,9 +294,10 @@ class Roles(commands.Cog):
         async with self.bot.db.acquire() as con:
             channel_id = await con.fetchval(f"DELETE FROM base_rr WHERE message_id={message_id} RETURNING channel_id")
             await con.execute(f"DELETE FROM emoji_rr WHERE message_id={message_id}")
+        self._panels.pop(message_id, None)
 
         with suppress(Exception):
-            channel = await self.bot.get_channel(int(channel_id))
+            channel = self.bot.get_channel(int(channel_id))
             message = await channel.fetch_message(message_id)
             await self.gcmds.smart_delete(message)
 
@@ -931,6 +956,8 @@ class Roles(commands.Cog):
                 if messages:
                     for msg in messages:
                         await con.execute(f"DELETE FROM emoji_rr WHERE message_id={msg['message_id']}")
+                        if msg['message_id'] in self._panels:
+                            self._panels[msg['message_id']].roles.clear()
         return await ctx.channel.send(embed=embed)
 
     @commands.cooldown(1, 300, type=commands.BucketType.guild)
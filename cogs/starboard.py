@@ -1,12 +1,14 @@
 import asyncio
+import os
 from math import ceil, floor, log
+from typing import Dict, Optional, Set, Tuple
 
 import discord
 from discord.embeds import EmptyEmbed
 from discord.ext import commands
 from discord.ext.commands import Context
 from setuppanel import SetupPanel
-from utils import FieldPaginator, GlobalCMDS, SubcommandHelp
+from utils import FieldPaginator, GlobalCMDS, LRUCache, SubcommandHelp
 
 levels = ['⭐', '✨', '🌟', '💫']
 _CONF = ['✅', '❌']
@@ -20,8 +22,24 @@ class Starboard(commands.Cog):
     def __init__(self, bot: commands.AutoShardedBot):
         self.bot = bot
         self.gcmds = GlobalCMDS(self.bot)
+        self._config: Dict[int, Dict[str, Tuple[int, Optional[int]]]] = {}
+        self._posts: Dict[Tuple[int, str], int] = {}
+        self._reactors = LRUCache(maxsize=512)
+        self._sb_messages = LRUCache(maxsize=128)
+        self._seeding: Dict[Tuple[int, str], asyncio.Task] = {}
+        self._edit_window = float(os.getenv("STARBOARD_EDIT_WINDOW", 5))
+        self._edit_tasks: Dict[int, asyncio.Task] = {}
+        self._edit_counts: Dict[int, int] = {}
+        self.edits_requested = 0
+        self.edits_sent = 0
+        self.edits_coalesced = 0
+        self.edits_failed = 0
         self.bot.loop.create_task(self.init_starboard())
 
+    def cog_unload(self):
+        for message_id in list(self._edit_tasks):
+            self._cancel_edit(message_id)
+
     async def init_starboard(self):
         await self.bot.wait_until_ready()
         async with self.bot.db.acquire() as con:
@@ -31,65 +49,102 @@ class Starboard(commands.Cog):
             await con.execute(
                 "CREATE TABLE IF NOT EXISTS starboard_config(guild_id bigint, channel_id bigint PRIMARY KEY, emoji TEXT, threshold NUMERIC DEFAULT NULL)"
             )
+            configs = await con.fetch("SELECT guild_id, channel_id, emoji, threshold FROM starboard_config")
+            posts = await con.fetch("SELECT orig_message_id, message_id, emoji FROM starboard")
+        for config in configs:
+            self._set_config(config["guild_id"], config["channel_id"], config["emoji"], config["threshold"])
+        self._posts = {(post["orig_message_id"], post["emoji"]): post["message_id"] for post in posts}
+
+    def _set_config(self, guild_id: int, channel_id: int, emoji: str, threshold: Optional[int]) -> None:
+        self._config.setdefault(guild_id, {})[emoji] = (channel_id, int(threshold) if threshold else None)
+
+    def _get_config(self, guild_id: int, emoji: str) -> Optional[Tuple[int, Optional[int]]]:
+        return self._config.get(guild_id, {}).get(emoji)
+
+    async def _seed(self, channel_id: int, message_id: int, emoji: str) -> Tuple[Set[int], discord.Message]:
+        channel: discord.TextChannel = self.bot.get_channel(channel_id)
+        message: discord.Message = await channel.fetch_message(message_id)
+        reactors = set()
+        for reaction in message.reactions:
+            if str(reaction.emoji) == emoji:
+                reactors = {user.id async for user in reaction.users() if not user.bot}
+                break
+        self._reactors.put((message_id, emoji), reactors)
+        return reactors, message
+
+    async def _get_reactors(self, channel_id: int, message_id: int, emoji: str) -> Tuple[Set[int], Optional[discord.Message]]:
+        key = (message_id, emoji)
+        reactors = self._reactors.get(key)
+        if reactors is not None:
+            return reactors, None
+        task = self._seeding.get(key)
+        if not task:
+            task = self._seeding[key] = self.bot.loop.create_task(self._seed(channel_id, message_id, emoji))
+            task.add_done_callback(lambda _: self._seeding.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _get_sb_message(self, channel_id: int, message_id: int) -> discord.Message:
+        message = self._sb_messages.get(message_id)
+        if not message:
+            channel: discord.TextChannel = self.bot.get_channel(channel_id)
+            message = await channel.fetch_message(message_id)
+            self._sb_messages.put(message_id, message)
+        return message
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
         member: discord.Member = payload.member
         if member and not member.bot:
-            emoji: discord.Emoji = payload.emoji
-            async with self.bot.db.acquire() as con:
-                dispatch_channel_id: int = await con.fetchval(
-                    f"SELECT channel_id FROM starboard_config WHERE guild_id={member.guild.id} AND emoji=$emj${emoji}$emj$"
-                )
-                sb_message_id = await con.fetchval(
-                    f"SELECT message_id FROM starboard WHERE orig_message_id={payload.message_id}"
-                )
-                threshold = await con.fetchval(
-                    f"SELECT threshold FROM starboard_config WHERE guild_id={member.guild.id} AND emoji=$emj${emoji}$emj$"
-                )
-            if dispatch_channel_id:
-                dispatch_channel: discord.TextChannel = self.bot.get_channel(int(dispatch_channel_id))
-                channel: discord.TextChannel = self.bot.get_channel(payload.channel_id)
-                message: discord.Message = await channel.fetch_message(payload.message_id)
-                reaction: discord.Reaction = [r for r in message.reactions if str(r.emoji) == str(emoji)][0]
-                count = len([user for user in await reaction.users().flatten() if not user.bot])
-                if not sb_message_id and _THRESHOLD(message.guild, count, threshold):
-                    await self._dispatch(dispatch_channel, message, emoji, count)
-                elif sb_message_id:
-                    sb_message = await dispatch_channel.fetch_message(int(sb_message_id))
-                    await self._update(sb_message, count, threshold)
+            emoji = str(payload.emoji)
+            config = self._get_config(member.guild.id, emoji)
+            if not config:
+                return
+            dispatch_channel_id, threshold = config
+            reactors, message = await self._get_reactors(payload.channel_id, payload.message_id, emoji)
+            reactors.add(member.id)
+            count = len(reactors)
+            sb_message_id = self._posts.get((payload.message_id, emoji))
+            if not sb_message_id and _THRESHOLD(member.guild, count, threshold):
+                if not message:
+                    channel: discord.TextChannel = self.bot.get_channel(payload.channel_id)
+                    message = await channel.fetch_message(payload.message_id)
+                dispatch_channel: discord.TextChannel = self.bot.get_channel(dispatch_channel_id)
+                await self._dispatch(dispatch_channel, message, emoji, count)
+            elif sb_message_id:
+                sb_message = await self._get_sb_message(dispatch_channel_id, sb_message_id)
+                await self._update(sb_message, count, threshold)
         return
 
     @commands.Cog.listener()
     async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
-        guild: discord.Guild = self.bot.get_guild(int(payload.guild_id))
-        member: discord.Member = guild.get_member(int(payload.user_id))
-        if member and not member.bot:
-            emoji: discord.Emoji = payload.emoji
-            async with self.bot.db.acquire() as con:
-                dispatch_channel_id: int = await con.fetchval(
-                    f"SELECT channel_id FROM starboard_config WHERE guild_id={member.guild.id} AND emoji=$emj${emoji}$emj$"
-                )
-                sb_message_id = await con.fetchval(
-                    f"SELECT message_id FROM starboard WHERE orig_message_id={payload.message_id} and emoji=$emj${emoji}$emj$"
-                )
-                threshold = await con.fetchval(
-                    f"SELECT threshold FROM starboard_config WHERE guild_id={member.guild.id} AND emoji=$emj${emoji}$emj$"
-                )
-            if sb_message_id:
-                channel: discord.TextChannel = self.bot.get_channel(payload.channel_id)
-                message: discord.Message = await channel.fetch_message(payload.message_id)
-                try:
-                    reaction: discord.Reaction = [r for r in message.reactions if str(r.emoji) == str(emoji)][0]
-                except IndexError:
-                    count = 0
-                else:
-                    count = len([user for user in await reaction.users().flatten() if not user.bot])
-                sb_channel: discord.TextChannel = self.bot.get_channel(int(dispatch_channel_id))
-                sb_message = await sb_channel.fetch_message(int(sb_message_id))
-                await self._update(sb_message, count, threshold)
+        guild: discord.Guild = self.bot.get_guild(payload.guild_id) if payload.guild_id else None
+        member: discord.Member = guild.get_member(payload.user_id) if guild else None
+        if not guild or (member and member.bot):
+            return
+        emoji = str(payload.emoji)
+        config = self._get_config(payload.guild_id, emoji)
+        sb_message_id = self._posts.get((payload.message_id, emoji))
+        if config and sb_message_id:
+            dispatch_channel_id, threshold = config
+            reactors, _ = await self._get_reactors(payload.channel_id, payload.message_id, emoji)
+            reactors.discard(payload.user_id)
+            sb_message = await self._get_sb_message(dispatch_channel_id, sb_message_id)
+            await self._update(sb_message, len(reactors), threshold)
+        elif config:
+            reactors = self._reactors.get((payload.message_id, emoji))
+            if reactors is not None:
+                reactors.discard(payload.user_id)
         return
 
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear(self, payload: discord.RawReactionClearEvent):
+        for key in [key for key in self._reactors if key[0] == payload.message_id]:
+            del self._reactors[key]
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_clear_emoji(self, payload: discord.RawReactionClearEmojiEvent):
+        self._reactors.pop((payload.message_id, str(payload.emoji)), None)
+
     async def _dispatch(self, channel: discord.TextChannel, orig_message: discord.Message, emoji: str, count: int) -> discord.Message:
         embed = discord.Embed(
             description=orig_message.content if orig_message.content else
@@ -111,6 +166,8 @@ class Starboard(commands.Cog):
             if not attachment.is_spoiler() and attachment.url.lower().endswith(('png', 'jpeg', 'jpg', 'gif', 'webp')):
                 embed.set_image(url=attachment.url)
         message = await channel.send(embed=embed)
+        self._posts[(orig_message.id, emoji)] = message.id
+        self._sb_messages.put(message.id, message)
         async with self.bot.db.acquire() as con:
             await con.execute(
                 f"INSERT INTO starboard(orig_message_id, message_id, guild_id, channel_id, emoji) "
@@ -120,17 +177,47 @@ class Starboard(commands.Cog):
 
     async def _update(self, message: discord.Message, count: int, threshold: int):
         if not _THRESHOLD(message.guild, count, threshold):
+            self._cancel_edit(message.id)
             async with self.bot.db.acquire() as con:
                 await con.execute(
                     f"DELETE FROM starboard WHERE message_id={message.id} AND guild_id={message.guild.id}"
                 )
+            self._forget_posts(message_ids=[message.id])
             await self.gcmds.smart_delete(message)
         elif message.embeds:
-            embed: discord.Embed = message.embeds[0].copy()
-            embed.set_footer(
-                text=f"{_GET_EMOJI(count)} Upvoted {count} time{'s' if count != 1 else ''}!"
-            )
+            self.edits_requested += 1
+            self._edit_counts[message.id] = count
+            if message.id in self._edit_tasks:
+                self.edits_coalesced += 1
+            else:
+                self._edit_tasks[message.id] = self.bot.loop.create_task(self._flush_edit(message))
+
+    async def _flush_edit(self, message: discord.Message):
+        await asyncio.sleep(self._edit_window)
+        del self._edit_tasks[message.id]
+        count = self._edit_counts.pop(message.id)
+        embed: discord.Embed = message.embeds[0].copy()
+        embed.set_footer(
+            text=f"{_GET_EMOJI(count)} Upvoted {count} time{'s' if count != 1 else ''}!"
+        )
+        try:
             await message.edit(embed=embed)
+        except discord.HTTPException:
+            self.edits_failed += 1
+        else:
+            self.edits_sent += 1
+
+    def _cancel_edit(self, message_id: int):
+        task = self._edit_tasks.pop(message_id, None)
+        if task:
+            task.cancel()
+        self._edit_counts.pop(message_id, None)
+
+    def _forget_posts(self, message_ids) -> None:
+        for key in [key for key, message_id in self._posts.items() if message_id in message_ids]:
+            del self._posts[key]
+        for message_id in message_ids:
+            self._sb_messages.pop(message_id, None)
 
     async def starboard_help(self, ctx) -> discord.Message:
         pfx = f"{await self.gcmds.prefix(ctx)}starboard"
@@ -172,6 +259,7 @@ class Starboard(commands.Cog):
                         f"INSERT INTO starboard_config(guild_id, channel_id, emoji, threshold) VALUES ({ctx.guild.id}, "
                         f"{channel.id}, $emj${str(emoji)}$emj$, {threshold if threshold else 'NULL'})"
                     )
+                self._set_config(ctx.guild.id, channel.id, str(emoji), threshold)
                 embed.color = discord.Color.blue()
             else:
                 embed.title = "Insufficient Bot Permissions"
@@ -192,7 +280,12 @@ class Starboard(commands.Cog):
         else:
             async with self.bot.db.acquire() as con:
                 await con.execute(f"DELETE FROM starboard_config WHERE guild_id={ctx.guild.id} AND channel_id={channel.id}")
-                await con.execute(f"DELETE FROM starboard WHERE channel_id={channel.id} AND guild_id={channel.guild.id}")
+                deleted = await con.fetch(f"DELETE FROM starboard WHERE channel_id={channel.id} AND guild_id={channel.guild.id} "
+                                          "RETURNING message_id")
+            guild_config = self._config.get(ctx.guild.id, {})
+            for emoji in [emoji for emoji, (channel_id, _) in guild_config.items() if channel_id == channel.id]:
+                del guild_config[emoji]
+            self._forget_posts(message_ids=set(record["message_id"] for record in deleted))
         return await ctx.channel.send(embed=embed)
 
     async def list_starboard_details(self, ctx: Context) -> discord.Message:
@@ -241,6 +334,27 @@ class Starboard(commands.Cog):
     async def starboard_list(self, ctx: Context):
         return await self.list_starboard_details(ctx)
 
+    @starboard.command(name="stats",)
+    @commands.is_owner()
+    async def starboard_stats(self, ctx: Context):
+        return await ctx.channel.send(
+            embed=discord.Embed(
+                title="Starboard Stats",
+                description="```{}```".format(
+                    "\n".join([
+                        f"Edit Window: {self._edit_window}s",
+                        f"Updates Requested: {self.edits_requested}",
+                        f"Edits Sent: {self.edits_sent}",
+                        f"Edits Saved: {self.edits_coalesced}",
+                        f"Edits Failed: {self.edits_failed}",
+                        f"Pending Edits: {len(self._edit_tasks)}",
+                        f"Tracked Messages: {len(self._reactors)}",
+                    ])
+                ),
+                color=discord.Color.blue(),
+            )
+        )
+
     @starboard.command(name="register",
                        aliases=["reg", "create"],)
     @commands.has_permissions(manage_guild=True)
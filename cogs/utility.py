@@ -40,23 +40,24 @@ class Utility(commands.Cog):
         if name == "server" or name == "global":
             mode = name
             name = None
+        counters = self.bot.counters
         if not name:
             async with self.bot.db.acquire() as con:
                 if mode == 'server':
-                    result = await con.fetch(f"SELECT * FROM guild_counters WHERE guild_id={ctx.guild.id} "
-                                             "ORDER BY command ASC")
+                    result = await con.fetch(f"SELECT * FROM guild_counters WHERE guild_id={ctx.guild.id}")
+                    pending = counters.pending_for_guild(ctx.guild.id)
                     title = f"Counters for {ctx.guild.name}"
-                    entries = [
-                        f"***{item['command']}:*** *used {item['amount']} "
-                        f"{'times' if item['amount'] != 1 else 'time'}*"
-                        for item in result]
                 else:
-                    result = await con.fetch(f"SELECT * from global_counters ORDER BY command ASC")
+                    result = await con.fetch(f"SELECT * from global_counters")
+                    pending = counters.pending_all_global()
                     title = "Global Counters"
-                    entries = [
-                        f"***{record['command'].lower()}:*** *used {record['amount'] if record['amount'] else '0'} "
-                        f"{'times' if record['amount'] != 1 else 'time'}*"
-                        for record in result]
+            amounts = {record['command'].lower(): record['amount'] or 0 for record in result}
+            for command, delta in pending.items():
+                amounts[command] = amounts.get(command, 0) + delta
+            entries = [
+                f"***{command}:*** *used {amount} "
+                f"{'times' if amount != 1 else 'time'}*"
+                for command, amount in sorted(amounts.items())]
             pag = EmbedPaginator(ctx, entries=entries, per_page=20, show_entry_count=True)
             pag.embed.title = title
             return await pag.paginate()
@@ -66,12 +67,14 @@ class Utility(commands.Cog):
                 if mode == "global":
                     amount = await con.fetchval(f"SELECT amount from global_counters WHERE "
                                                 f"command=$tag${command.name.lower()}$tag$")
+                    amount = (amount or 0) + counters.pending_global(command.name.lower())
                     title = f"Global Counter for {command.name.title()}"
                 else:
-                    amount = await con.fetchval(f"SELECT amount FROM guild_counters WHERE "
+                    amount = await con.fetchval(f"SELECT amount FROM guild_counters WHERE guild_id={ctx.guild.id} AND "
                                                 f"command=$tag${command.name.lower()}$tag$")
+                    amount = (amount or 0) + counters.pending_guild(ctx.guild.id, command.name.lower())
                     title = f"Server Counter for {command.name.title()}"
-            description = (f"***{command.name}:*** *used {amount if amount else '0'} "
+            description = (f"***{command.name}:*** *used {amount} "
                            f"{'times' if amount != 1 else 'time'}*")
             embed = discord.Embed(title=title, description=description, color=discord.Color.blue())
             return await ctx.channel.send(embed=embed)
@@ -115,15 +118,18 @@ class Utility(commands.Cog):
         async with self.bot.db.acquire() as con:
             if prefix != 'reset':
                 await con.execute(f"UPDATE guild SET custom_prefix=$tag${prefix}$tag$ WHERE guild_id={ctx.guild.id}")
+                self.bot.guild_cache.set_prefix(ctx.guild.id, prefix)
                 prefixEmbed = discord.Embed(title='Server Prefix Set',
                                             description=f"Server prefix is now set to `{prefix}` \n\n"
                                                         f"You will still be able to use {self.bot.user.mention} "
                                                         f"and `mb ` as prefixes",
                                             color=discord.Color.blue())
             else:
-                await con.execute(f"UPDATE guild SET custom_prefix='m!' WHERE guild_id={ctx.guild.id}")
+                default = self.bot.guild_cache.DEFAULT_PREFIX
+                await con.execute("UPDATE guild SET custom_prefix=$1 WHERE guild_id=$2", default, ctx.guild.id)
+                self.bot.guild_cache.set_prefix(ctx.guild.id, default)
                 prefixEmbed = discord.Embed(title='Server Prefix Set',
-                                            description=f"Server prefix has been reset to `m!`",
+                                            description=f"Server prefix has been reset to `{default}`",
                                             color=discord.Color.blue())
         return await ctx.channel.send(embed=prefixEmbed)
 
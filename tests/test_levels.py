@@ -0,0 +1,85 @@
+import random
+
+import pytest
+
+pytest.importorskip("utils", reason="requires the bot's runtime dependencies")
+
+from utils.levels import GuildLevelConfig, LevelRole, LevelState, RankIndex, _calc_req_xp
+
+
+def test_credit_below_requirement_keeps_level():
+    state = LevelState()
+    assert not state.credit(_calc_req_xp(0) - 1)
+    assert (state.level, state.xp) == (0, _calc_req_xp(0) - 1)
+
+
+def test_credit_at_requirement_levels_up_with_no_remainder():
+    state = LevelState()
+    assert state.credit(_calc_req_xp(0))
+    assert (state.level, state.xp) == (1, 0)
+
+
+def test_credit_carries_overflow_into_the_next_level():
+    state = LevelState(level=3, xp=_calc_req_xp(3) - 5)
+    assert state.credit(12)
+    assert (state.level, state.xp) == (4, 7)
+    assert not state.credit(1)
+    assert (state.level, state.xp) == (4, 8)
+
+
+def test_roles_at_splits_current_and_previous_rewards():
+    roles = (LevelRole(5, 1, "add"), LevelRole(10, 2, "replace"), LevelRole(20, 3, "add"))
+    config = GuildLevelConfig(roles=roles, thresholds=tuple(role.obtain_at for role in roles))
+    assert config.roles_at(10) == (roles[1], roles[:1])
+    assert config.roles_at(15) == (None, roles[:2])
+    assert config.roles_at(1) == (None, ())
+
+
+def _expected_rank(entries, key):
+    level, xp = entries[key]
+    return 1 + sum(1 for other in entries.values() if other > (level, xp))
+
+
+def test_rank_orders_by_level_then_xp_and_shares_ties():
+    index = RankIndex()
+    for key, level, xp in (("a", 2, 10), ("b", 3, 0), ("c", 2, 50), ("d", 2, 10)):
+        index.update(key, level, xp)
+    assert [index.rank(key) for key in "abcd"] == [3, 1, 2, 3]
+    assert index.rank("missing") is None
+
+
+def test_update_and_remove_keep_counts_consistent():
+    index = RankIndex()
+    index.update("a", 1, 0)
+    index.update("a", 1, 0)
+    index.update("b", 2, 0)
+    assert len(index) == 2
+    index.update("a", 5, 0)
+    assert (index.rank("a"), index.rank("b")) == (1, 2)
+    index.remove("a")
+    index.remove("a")
+    assert "a" not in index
+    assert len(index) == 1
+    assert index.rank("b") == 1
+
+
+def test_levels_past_max_level_still_rank_correctly():
+    index = RankIndex(max_level=4)
+    for key, level, xp in (("a", 4, 0), ("b", 9, 0), ("c", 6, 5), ("d", 6, 1), ("e", 3, 99)):
+        index.update(key, level, xp)
+    assert [index.rank(key) for key in "abcde"] == [4, 1, 2, 3, 5]
+
+
+def test_rank_matches_a_full_sort():
+    rng = random.Random(0)
+    index, entries = RankIndex(max_level=16), {}
+    for _ in range(2000):
+        key = rng.randrange(200)
+        if rng.random() < 0.1:
+            index.remove(key)
+            entries.pop(key, None)
+        else:
+            entries[key] = (rng.randrange(20), rng.randrange(5))
+            index.update(key, *entries[key])
+    assert len(index) == len(entries)
+    assert all(index.rank(key) == _expected_rank(entries, key) for key in entries)
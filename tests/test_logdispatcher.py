@@ -0,0 +1,79 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("utils", reason="requires the bot's runtime dependencies")
+
+import discord
+from utils.logdispatcher import LogBatcher
+
+
+class _Webhook:
+    def __init__(self, channel, sends) -> None:
+        self.channel = channel
+        self.sends = sends
+
+    async def send(self, embeds) -> None:
+        self.sends.append((self.channel.id, len(embeds)))
+
+
+class _Cache:
+    def __init__(self) -> None:
+        self.sends = []
+
+    async def get_webhook(self, channel) -> _Webhook:
+        return _Webhook(channel, self.sends)
+
+
+def _channel(channel_id: int):
+    return SimpleNamespace(id=channel_id, guild=SimpleNamespace(id=1))
+
+
+def _embed(size: int = 1) -> discord.Embed:
+    return discord.Embed(description="x" * size)
+
+
+def _send_all(items, **kwargs):
+    async def run():
+        cache = _Cache()
+        batcher = LogBatcher(SimpleNamespace(loop=asyncio.get_running_loop()), cache, window=0, **kwargs)
+        for channel, embed in items:
+            await batcher.put(channel, [embed])
+
+        async def drained():
+            while batcher.sent + batcher.dropped < len(items):
+                await asyncio.sleep(0)
+
+        await asyncio.wait_for(drained(), timeout=1)
+        batcher.close()
+        return batcher, cache.sends
+
+    return asyncio.run(run())
+
+
+def test_batches_are_capped_at_ten_embeds():
+    channel = _channel(1)
+    batcher, sends = _send_all([(channel, _embed()) for _ in range(23)])
+    assert sends == [(1, 10), (1, 10), (1, 3)]
+    assert batcher.sent == 23
+    assert batcher.batches == 3
+
+
+def test_batches_respect_the_embed_character_limit():
+    channel = _channel(1)
+    _, sends = _send_all([(channel, _embed(2500)) for _ in range(5)])
+    assert sends == [(1, 2), (1, 2), (1, 1)]
+
+
+def test_channel_change_starts_a_new_batch():
+    first, second = _channel(1), _channel(2)
+    _, sends = _send_all([(first, _embed()), (first, _embed()), (second, _embed()), (first, _embed())])
+    assert sends == [(1, 2), (2, 1), (1, 1)]
+
+
+def test_put_drops_embeds_when_the_queue_stays_full():
+    channel = _channel(1)
+    batcher, sends = _send_all([(channel, _embed()) for _ in range(3)], max_queued=2, put_timeout=0)
+    assert batcher.dropped == 1
+    assert sends == [(1, 2)]
@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("utils", reason="requires the bot's runtime dependencies")
+
+from utils import mbplayer
+from utils.mbplayer import MBCFormatError, _JSONWriter, _MBCWriter, _read_json, _read_mbc
+from utils.trackcache import CacheRow
+
+
+class _File:
+    def __init__(self, data: bytes = b"") -> None:
+        self.data = data
+        self.pos = 0
+
+    async def write(self, data: bytes) -> None:
+        self.data += data
+
+    async def read(self, size: int) -> bytes:
+        data = self.data[self.pos:self.pos + size]
+        self.pos += len(data)
+        return data
+
+
+def _rows(count: int):
+    return [
+        CacheRow(f"ytsearch:song {i} \"é\"", "SEARCH_RESULT", None, json.dumps([[f"track{i}", "a,b", i]]),
+                 i or None, 1000 + i, -1 if i % 2 else 2000 + i)
+        for i in range(count)
+    ]
+
+
+def _export(writer_type, rows) -> bytes:
+    async def run():
+        file = _File()
+        writer = writer_type(file)
+        await writer.start()
+        for row in rows:
+            await writer.write(row)
+        await writer.finish()
+        return file.data
+
+    return asyncio.run(run())
+
+
+def _import(reader, data: bytes):
+    async def run():
+        return [chunk async for chunk in reader(_File(data))]
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("count", [0, 1, mbplayer._CHUNK_SIZE, mbplayer._CHUNK_SIZE * 2 + 1])
+def test_mbc_round_trip(count):
+    rows = _rows(count)
+    chunks = _import(_read_mbc, _export(_MBCWriter, rows))
+    assert all(len(chunk) <= mbplayer._CHUNK_SIZE for chunk in chunks)
+    assert [row for chunk in chunks for row in chunk] == rows
+
+
+def test_mbc_rejects_bad_header():
+    data = _export(_MBCWriter, _rows(1))
+    with pytest.raises(MBCFormatError, match="not a music cache export"):
+        _import(_read_mbc, b"X" + data[1:])
+    with pytest.raises(MBCFormatError, match="unsupported format version"):
+        _import(_read_mbc, data[:len(mbplayer._MBC_MAGIC)] + bytes([99]) + data[len(mbplayer._MBC_MAGIC) + 1:])
+
+
+@pytest.mark.parametrize("cut", [1, 4, 10])
+def test_mbc_rejects_truncated_export(cut):
+    with pytest.raises(MBCFormatError, match="truncated"):
+        _import(_read_mbc, _export(_MBCWriter, _rows(3))[:-cut])
+
+
+@pytest.mark.parametrize("count", [0, 1, mbplayer._CHUNK_SIZE + 1])
+def test_json_round_trip_across_read_boundaries(monkeypatch, count):
+    monkeypatch.setattr(mbplayer, "_READ_SIZE", 7)
+    rows = _rows(count)
+    data = _export(_JSONWriter, rows).replace(b"},\"ytsearch", b"} ,\n \"ytsearch")
+    chunks = _import(_read_json, b" " + data + b"\n")
+    assert all(len(chunk) <= mbplayer._CHUNK_SIZE for chunk in chunks)
+    assert [row for chunk in chunks for row in chunk] == rows
+
+
+@pytest.mark.parametrize("data", [b'{"q": {"load_type": "X"', b'{"q": {"load_type": "X"} x', b'{"q" 1}', b"[]"])
+def test_json_rejects_malformed_export(data):
+    with pytest.raises(MBCFormatError):
+        _import(_read_json, data)
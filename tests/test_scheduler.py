@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("utils", reason="requires the bot's runtime dependencies")
+
+from utils.scheduler import ScheduledJob, Scheduler
+
+
+class _Connection:
+    def __init__(self) -> None:
+        self.deleted = []
+
+    async def execute(self, query: str, *args) -> None:
+        self.deleted.append(args)
+
+
+class _Pool:
+    def __init__(self) -> None:
+        self.con = _Connection()
+
+    def acquire(self):
+        pool = self
+
+        class _Acquire:
+            async def __aenter__(self):
+                return pool.con
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Acquire()
+
+
+def _scheduler(now: float, loop=None) -> Scheduler:
+    scheduler = Scheduler(SimpleNamespace(loop=loop, db=_Pool()))
+    scheduler._now = lambda: now
+    return scheduler
+
+
+def _job(job_id: int, fire_at: float, type: str = "test", key: str = None) -> ScheduledJob:
+    return ScheduledJob(job_id, type, key, fire_at, {})
+
+
+def test_due_jobs_fire_in_order_and_park_without_a_handler():
+    scheduler = _scheduler(now=25)
+    for job in (_job(1, 30), _job(2, 10), _job(3, 20)):
+        scheduler._track(job)
+    scheduler._fire_due()
+    assert [job.id for job in scheduler._parked["test"]] == [2, 3]
+    assert scheduler.pending == 1
+    assert scheduler._next_delay() == 5
+
+
+def test_rescheduled_job_skips_its_stale_heap_entry():
+    scheduler = _scheduler(now=20)
+    scheduler._track(_job(1, 10, key="a"))
+    scheduler._track(_job(1, 50, key="a"))
+    scheduler._fire_due()
+    assert not scheduler._parked
+    assert scheduler.get("test", "a").fire_at == 50
+    assert scheduler._next_delay() == 30
+
+
+def test_untracked_job_is_dropped_from_the_heap():
+    scheduler = _scheduler(now=0)
+    job = _job(1, 10, key="a")
+    scheduler._track(job)
+    scheduler._untrack(job)
+    assert scheduler.get("test", "a") is None
+    assert scheduler._next_delay() is None
+    assert not scheduler._heap
+
+
+def test_next_delay_is_capped():
+    scheduler = _scheduler(now=0)
+    scheduler._track(_job(1, Scheduler._MAX_SLEEP * 2))
+    assert scheduler._next_delay() == Scheduler._MAX_SLEEP
+
+
+def test_register_runs_parked_jobs():
+    async def run():
+        scheduler = _scheduler(now=100, loop=asyncio.get_running_loop())
+        scheduler._track(_job(1, 10))
+        scheduler._track(_job(2, 20))
+        scheduler._fire_due()
+        fired = []
+
+        async def handler(job: ScheduledJob) -> None:
+            fired.append(job.id)
+
+        scheduler.register("test", handler)
+        await asyncio.gather(*scheduler._running)
+        return scheduler, fired
+
+    scheduler, fired = asyncio.run(run())
+    assert fired == [1, 2]
+    assert not scheduler._parked
+    assert scheduler.fired == 2
+    assert scheduler.bot.db.con.deleted == [(1, 10), (2, 20)]
@@ -0,0 +1,87 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("utils", reason="requires the bot's runtime dependencies")
+
+from utils.trackcache import TrackCache
+
+
+def _cache(max_bytes: int = 100, loop=None) -> TrackCache:
+    return TrackCache(SimpleNamespace(loop=loop), max_bytes=max_bytes, node_concurrency=1)
+
+
+def test_put_and_discard_track_bytes():
+    cache = _cache()
+    cache._put("a", {}, -1, 30)
+    cache._put("b", {}, -1, 20)
+    assert cache.bytes == 50
+    cache._put("a", {}, -1, 10)
+    assert cache.bytes == 30
+    cache._discard("b")
+    cache._discard("missing")
+    assert cache.bytes == 10
+    assert len(cache) == 1
+
+
+def test_least_recently_used_entries_are_evicted_past_max_bytes():
+    cache = _cache()
+    cache._put("a", {}, -1, 40)
+    cache._put("b", {}, -1, 40)
+    assert cache._get("a") == (True, {})
+    cache._put("c", {}, -1, 40)
+    assert list(cache._entries) == ["a", "c"]
+    assert cache.bytes == 80
+    assert cache.evictions == 1
+
+
+def test_oversized_entry_is_not_stored():
+    cache = _cache()
+    cache._put("a", {}, -1, 40)
+    cache._put("a", {}, -1, 101)
+    assert "a" not in cache._entries
+    assert cache.bytes == 0
+
+
+def test_expired_entry_is_discarded_on_read():
+    cache = _cache()
+    cache._now = lambda: 100
+    cache._put("a", None, 100, 40)
+    assert cache._get("a") == (False, None)
+    assert cache.bytes == 0
+
+
+def test_evict_and_clear_reset_bytes():
+    cache = _cache()
+    cache._put("a", {}, -1, 40)
+    cache._put("b", {}, -1, 40)
+    cache.evict("a")
+    assert cache.bytes == 40
+    cache.clear()
+    assert cache.bytes == 0
+    assert len(cache) == 0
+
+
+def test_forced_lookup_does_not_join_a_cached_lookup():
+    async def run():
+        cache = _cache(loop=asyncio.get_running_loop())
+        release = asyncio.Event()
+        loads = []
+
+        async def load(query, node, guild_id, force_recache):
+            loads.append(force_recache)
+            await release.wait()
+            return {"forced": force_recache}
+
+        cache._load = load
+        lookups = [asyncio.ensure_future(cache.get_tracks("q", None, force_recache=force))
+                   for force in (False, False, True)]
+        await asyncio.sleep(0)
+        release.set()
+        return cache, loads, await asyncio.gather(*lookups)
+
+    cache, loads, results = asyncio.run(run())
+    assert loads == [False, True]
+    assert results == [{"forced": False}, {"forced": False}, {"forced": True}]
+    assert cache.coalesced == 1
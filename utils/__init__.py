@@ -1,14 +1,21 @@
 from .cards import *
 from .confirmation import *
+from .counters import *
 from .customhandler import *
 from .extractors import *
 from .globalcommands import *
+from .guildcache import *
 from .helpgenerator import *
+from .levels import *
 from .logdispatcher import *
+from .lru import *
 from .lyricextractor import get_lyrics_embed
 from .mbclient import MBClient
 from .mbplayer import MBPlayer
+from .messagejournal import *
 from .musicutils import *
 from .objects import *
 from .paginator import *
+from .scheduler import *
 from .spotifyparser import *
+from .trackcache import *
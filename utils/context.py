@@ -13,14 +13,11 @@ async def redirect(ctx):
     if not ctx.guild:
         return True
     bot = globalcommands._bot
-    db = globalcommands._db
     cmd = ctx.command.root_parent.name if ctx.command.root_parent else ctx.command.name
-    async with db.acquire() as con:
-        result = await con.fetchval(f"SELECT channel_id FROM redirects WHERE guild_id={ctx.guild.id} AND command='{cmd}' AND type='override'")
-        if not result:
-            result = await con.fetchval(f"SELECT channel_id FROM redirects WHERE guild_id={ctx.guild.id} AND command='{cmd}' AND type='all'")
-    if result:
-        ctx.channel = await bot.fetch_channel(int(result))
+    await bot.guild_cache.wait_until_loaded()
+    channel_id = bot.guild_cache.get_redirect(ctx.guild.id, cmd)
+    if channel_id:
+        ctx.channel = bot.get_channel(channel_id) or ctx.channel
     return True
 
 
@@ -0,0 +1,69 @@
+from collections import Counter
+from typing import Dict, Tuple
+
+from discord.ext import tasks
+from discord.ext.commands import AutoShardedBot
+
+
+__all__ = (
+    "CommandCounter",
+)
+
+
+class CommandCounter:
+    def __init__(self, bot: AutoShardedBot) -> None:
+        self.bot = bot
+        self._global: Counter = Counter()
+        self._guild: Counter = Counter()
+
+    def increment(self, command: str, guild_id: int = None) -> None:
+        self._global[command] += 1
+        if guild_id:
+            self._guild[(guild_id, command)] += 1
+
+    def pending_global(self, command: str) -> int:
+        return self._global.get(command, 0)
+
+    def pending_guild(self, guild_id: int, command: str) -> int:
+        return self._guild.get((guild_id, command), 0)
+
+    def pending_for_guild(self, guild_id: int) -> Dict[str, int]:
+        return {command: amount for (_guild_id, command), amount in self._guild.items() if _guild_id == guild_id}
+
+    def pending_all_global(self) -> Dict[str, int]:
+        return dict(self._global)
+
+    async def flush(self) -> Tuple[int, int]:
+        if not (self._global or self._guild):
+            return 0, 0
+        _global, self._global = self._global, Counter()
+        _guild, self._guild = self._guild, Counter()
+        try:
+            async with self.bot.db.acquire() as con:
+                async with con.transaction():
+                    if _global:
+                        await con.execute(
+                            "INSERT INTO global_counters(command, amount) "
+                            "SELECT * FROM unnest($1::text[], $2::numeric[]) "
+                            "ON CONFLICT (command) DO UPDATE SET amount=COALESCE(global_counters.amount, 0)+EXCLUDED.amount",
+                            list(_global.keys()), list(_global.values()),
+                        )
+                    if _guild:
+                        await con.execute(
+                            "INSERT INTO guild_counters(guild_id, command, amount) "
+                            "SELECT * FROM unnest($1::bigint[], $2::text[], $3::numeric[]) "
+                            "ON CONFLICT (guild_id, command) DO UPDATE SET amount=guild_counters.amount+EXCLUDED.amount",
+                            [guild_id for guild_id, _ in _guild], [command for _, command in _guild], list(_guild.values()),
+                        )
+        except Exception:
+            self._global.update(_global)
+            self._guild.update(_guild)
+            raise
+        return len(_global), len(_guild)
+
+    @tasks.loop(seconds=60)
+    async def flush_loop(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            pass
@@ -8,6 +8,7 @@ from discord.ext import commands
 from dotenv import load_dotenv
 
 from utils import customerrors
+from utils.guildcache import GuildConfigCache
 
 
 __all__ = (
@@ -126,11 +127,16 @@ class GlobalCMDS:
 
     async def prefix(self, ctx: commands.Context, guild_id: int = None):
         if ctx and not ctx.guild:
-            return "m!"
+            return GuildConfigCache.DEFAULT_PREFIX
+
+        guild_cache = getattr(self.bot, "guild_cache", None)
+        if guild_cache:
+            await guild_cache.wait_until_loaded()
+            return guild_cache.get_prefix(ctx.guild.id if ctx else guild_id)
 
         async with self.db.acquire() as con:
             prefix = await con.fetchval(f"SELECT custom_prefix FROM guild WHERE guild_id = {ctx.guild.id if ctx else guild_id}")
-            return prefix or "m!"
+            return prefix or GuildConfigCache.DEFAULT_PREFIX
 
     async def blacklist_db(self, execute):
         try:
@@ -0,0 +1,116 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from asyncpg.exceptions import UndefinedTableError
+from discord.ext.commands import AutoShardedBot
+
+
+__all__ = (
+    "GuildConfigCache",
+)
+
+
+_logger = logging.getLogger("discord.guildcache")
+
+
+class GuildConfigCache:
+    DEFAULT_PREFIX = "m!"
+    _REDIRECT_QUERY = ("SELECT guild_id, command, channel_id FROM redirects {} "
+                       "ORDER BY type='override' ASC")
+
+    def __init__(self, bot: AutoShardedBot) -> None:
+        self.bot = bot
+        self._prefixes: Dict[int, Optional[str]] = {}
+        self._locks: Dict[int, str] = {}
+        self._all_except: Dict[int, int] = {}
+        self._gatherers: Set[int] = set()
+        self._redirects: Dict[int, Dict[str, int]] = {}
+        self._loaded = asyncio.Event()
+        self._loader: asyncio.Task = None
+
+    def start(self) -> None:
+        if not self._loader:
+            self._loader = self.bot.loop.create_task(self._load_with_retry())
+
+    async def _load_with_retry(self, max_delay: float = 300) -> None:
+        delay = 1
+        while True:
+            try:
+                return await self.load()
+            except Exception:
+                _logger.exception("Failed to load guild config cache, retrying in %ss", delay)
+                # Serve messages with default config rather than blocking them until the database is back
+                self._loaded.set()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, max_delay)
+
+    async def load(self) -> None:
+        async with self.bot.db.acquire() as con:
+            guilds = await con.fetch("SELECT guild_id, custom_prefix FROM guild")
+            try:
+                locks = await con.fetch("SELECT guild_id, channel_id, type FROM locks")
+            except UndefinedTableError:
+                locks = []
+            try:
+                gatherers = await con.fetch("SELECT channel_id FROM gather")
+            except UndefinedTableError:
+                gatherers = []
+            try:
+                redirects = await con.fetch(self._REDIRECT_QUERY.format(""))
+            except UndefinedTableError:
+                redirects = []
+        self._prefixes = {record["guild_id"]: record["custom_prefix"] for record in guilds}
+        self._locks.clear()
+        self._all_except.clear()
+        for record in locks:
+            self._set_lock(record["guild_id"], record["channel_id"], record["type"])
+        self._gatherers = {record["channel_id"] for record in gatherers}
+        self._redirects.clear()
+        self._compile_redirects(redirects)
+        self._loaded.set()
+
+    async def wait_until_loaded(self) -> None:
+        await self._loaded.wait()
+
+    def get_prefix(self, guild_id: int) -> str:
+        return self._prefixes.get(guild_id) or self.DEFAULT_PREFIX
+
+    def set_prefix(self, guild_id: int, prefix: Optional[str]) -> None:
+        self._prefixes[guild_id] = prefix
+
+    def _set_lock(self, guild_id: int, channel_id: int, lock_type: str) -> None:
+        if lock_type == "all_except":
+            self._all_except[guild_id] = int(channel_id)
+        self._locks[int(channel_id)] = lock_type
+
+    def is_locked(self, guild_id: int, channel_id: int) -> bool:
+        lock_type = self._locks.get(channel_id)
+        all_except = self._all_except.get(guild_id)
+        if not all_except:
+            return bool(lock_type) and lock_type != "unlocked"
+        elif all_except == channel_id:
+            return False
+        return lock_type != "unlocked"
+
+    def add_gatherer(self, channel_id: int) -> None:
+        self._gatherers.add(channel_id)
+
+    def remove_gatherer(self, channel_id: int) -> None:
+        self._gatherers.discard(channel_id)
+
+    def is_gatherer(self, channel_id: int) -> bool:
+        return channel_id in self._gatherers
+
+    def _compile_redirects(self, records) -> None:
+        for record in records:
+            self._redirects.setdefault(record["guild_id"], {})[record["command"]] = record["channel_id"]
+
+    async def reload_redirects(self, guild_id: int) -> None:
+        async with self.bot.db.acquire() as con:
+            redirects = await con.fetch(self._REDIRECT_QUERY.format(f"WHERE guild_id={guild_id}"))
+        self._redirects.pop(guild_id, None)
+        self._compile_redirects(redirects)
+
+    def get_redirect(self, guild_id: int, command: str) -> Optional[int]:
+        return self._redirects.get(guild_id, {}).get(command)
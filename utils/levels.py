@@ -1,23 +1,37 @@
+import asyncio
 import functools
 import math
+import multiprocessing
+import os
+import time
+from bisect import bisect_left, insort
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from contextlib import suppress
 from datetime import datetime
 from io import BytesIO
 from random import randint
-from typing import Any, List, Tuple, Union
+from typing import Any, Dict, FrozenSet, Hashable, List, NamedTuple, Optional, Set, Tuple
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from PIL import Image, ImageDraw, ImageFont
 from PIL.Image import NEAREST
 from discord.ext.commands.bot import AutoShardedBot
 
 from utils import customerrors
+from .lru import LRUCache
 
 
 __all__ = (
+    "GuildLevelConfig",
+    "LevelEngine",
+    "LevelRole",
+    "LevelState",
+    "ProfileRenderer",
+    "RankIndex",
     "calculate_level",
-    "gen_guild_profile",
+    "gen_profile",
 )
 
 
@@ -42,46 +56,311 @@ def _calc_req_xp(level: int) -> int:
     return int(-2000 + (2000.69420 * math.exp(0.069420 * level))) if level != 0 else 100
 
 
-async def _get_guild_config(bot: commands.AutoShardedBot, message: discord.Message) -> Tuple[bool, bool, int, int, int, bool, bool]:
-    async with bot.db.acquire() as con:
-        config = await con.fetch(f"SELECT * FROM level_config WHERE guild_id={message.guild.id}")
-        disabled = await con.fetchval(f"SELECT channel_id FROM level_disabled WHERE "
-                                      f"channel_id={message.channel.id} AND guild_id={message.guild.id}")
-    if not config:
-        return (False, True, None, 1, 20, False, False)
-    config = config[0]
-    return (
-        bool(config['enabled']),
-        bool(disabled),
-        int(config['route_channel_id']) if config['route_channel_id'] else None,
-        int(config['freq']),
-        int(config['per_min']),
-        bool(config['server_notif']),
-        bool(config['global_notif'])
-    )
+class LevelState():
+    __slots__ = ("last_msg", "xp", "level")
+
+    def __init__(self, last_msg: int = 0, xp: int = 0, level: int = 0):
+        self.last_msg = last_msg
+        self.xp = xp
+        self.level = level
+
+    def credit(self, amount: int) -> bool:
+        self.xp += amount
+        req_xp = _calc_req_xp(self.level)
+        if self.xp >= req_xp:
+            self.xp -= req_xp
+            self.level += 1
+            return True
+        return False
+
+
+class LevelRole(NamedTuple):
+    obtain_at: int
+    role_id: int
+    type: str
+
+
+class GuildLevelConfig(NamedTuple):
+    enabled: bool = False
+    route_channel_id: Optional[int] = None
+    freq: int = 1
+    per_min: int = 20
+    server_notif: bool = False
+    global_notif: bool = False
+    disabled: FrozenSet[int] = frozenset()
+    roles: Tuple[LevelRole, ...] = ()
+    thresholds: Tuple[int, ...] = ()
+
+    def roles_at(self, level: int) -> Tuple[Optional[LevelRole], Tuple[LevelRole, ...]]:
+        index = bisect_left(self.thresholds, level)
+        current = self.roles[index] if index < len(self.roles) and self.thresholds[index] == level else None
+        return current, self.roles[:index]
+
+
+class RankIndex:
+    def __init__(self, max_level: int = 1024) -> None:
+        self.max_level = max_level
+        self._tree: List[int] = [0] * (max_level + 2)
+        self._buckets: Dict[int, List[Tuple[int, Hashable]]] = {}
+        self._entries: Dict[Hashable, Tuple[int, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def _add(self, level: int, delta: int) -> None:
+        index = min(level, self.max_level) + 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def _count_upto(self, level: int) -> int:
+        index, total = min(level, self.max_level) + 1, 0
+        while index > 0:
+            total += self._tree[index]
+            index -= index & -index
+        return total
+
+    def remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        level, xp = entry
+        bucket = self._buckets[level]
+        del bucket[bisect_left(bucket, (xp, key))]
+        if not bucket:
+            del self._buckets[level]
+        self._add(level, -1)
+
+    def update(self, key: Hashable, level: int, xp: int) -> None:
+        if self._entries.get(key) == (level, xp):
+            return
+        self.remove(key)
+        self._entries[key] = (level, xp)
+        insort(self._buckets.setdefault(level, []), (xp, key))
+        self._add(level, 1)
+
+    def rank(self, key: Hashable) -> Optional[int]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        level, xp = entry
+        higher_level = len(self._entries) - self._count_upto(level)
+        if level >= self.max_level:
+            higher_level = sum(len(bucket) for _level, bucket in self._buckets.items() if _level > level)
+        bucket = self._buckets[level]
+        # (xp + 1,) sorts after every (xp, key) without ever comparing keys
+        return higher_level + len(bucket) - bisect_left(bucket, (xp + 1,)) + 1
+
+
+class LevelEngine:
+    def __init__(self, bot: AutoShardedBot, idle_ttl: int = 3600, config_ttl: int = None) -> None:
+        self.bot = bot
+        self.idle_ttl = idle_ttl
+        self.config_ttl = config_ttl or int(os.getenv("LEVEL_CONFIG_TTL", 300))
+        self._configs: Dict[int, GuildLevelConfig] = {}
+        self._config_expiry: Dict[int, float] = {}
+        self._members: Dict[Tuple[int, int], LevelState] = {}
+        self._global: Dict[int, LevelState] = {}
+        self._dirty_members: Set[Tuple[int, int]] = set()
+        self._dirty_global: Set[int] = set()
+        self._ranks: Dict[Optional[int], RankIndex] = {}
+
+    async def get_config(self, guild_id: int) -> GuildLevelConfig:
+        config = self._configs.get(guild_id)
+        if config is not None and self._config_expiry.get(guild_id, 0) <= time.monotonic():
+            self.invalidate_config(guild_id)
+            config = None
+        if config is None:
+            async with self.bot.db.acquire() as con:
+                record = await con.fetchrow("SELECT enabled, route_channel_id, freq, per_min, server_notif, global_notif "
+                                            "FROM level_config WHERE guild_id=$1", guild_id)
+                disabled = await con.fetch("SELECT channel_id FROM level_disabled WHERE guild_id=$1", guild_id)
+                roles = await con.fetch("SELECT obtain_at, role_id, type FROM level_roles WHERE guild_id=$1 "
+                                        "ORDER BY obtain_at", guild_id)
+            roles = tuple(LevelRole(int(role["obtain_at"]), int(role["role_id"]), role["type"]) for role in roles)
+            config = self._configs.setdefault(guild_id, GuildLevelConfig(
+                enabled=bool(record["enabled"]),
+                route_channel_id=int(record["route_channel_id"]) if record["route_channel_id"] else None,
+                freq=int(record["freq"]),
+                per_min=int(record["per_min"]),
+                server_notif=bool(record["server_notif"]),
+                global_notif=bool(record["global_notif"]),
+                disabled=frozenset(int(entry["channel_id"]) for entry in disabled),
+                roles=roles,
+                thresholds=tuple(role.obtain_at for role in roles),
+            ) if record else GuildLevelConfig(roles=roles, thresholds=tuple(role.obtain_at for role in roles)))
+            self._config_expiry.setdefault(guild_id, time.monotonic() + self.config_ttl)
+        return config
+
+    def invalidate_config(self, guild_id: int) -> None:
+        self._configs.pop(guild_id, None)
+        self._config_expiry.pop(guild_id, None)
+
+    async def get_global(self, user_id: int) -> LevelState:
+        state = self._global.get(user_id)
+        if state is None:
+            async with self.bot.db.acquire() as con:
+                record = await con.fetchrow("SELECT last_msg, xp, level FROM level_global WHERE user_id=$1", user_id)
+            state = self._global.setdefault(user_id, LevelState(*map(int, record)) if record else LevelState())
+        return state
+
+    async def get_member(self, guild_id: int, user_id: int) -> LevelState:
+        state = self._members.get((guild_id, user_id))
+        if state is None:
+            async with self.bot.db.acquire() as con:
+                record = await con.fetchrow("SELECT last_msg, xp, level FROM level_users WHERE guild_id=$1 AND user_id=$2",
+                                            guild_id, user_id)
+            state = self._members.setdefault((guild_id, user_id), LevelState(*map(int, record)) if record else LevelState())
+        return state
+
+    async def process(self, message: discord.Message) -> None:
+        if not message.guild or message.author.bot:
+            return
+        now = int(datetime.now().timestamp())
+        config = await self.get_config(message.guild.id)
+        state = await self.get_global(message.author.id)
+        if now - state.last_msg >= 60:
+            state.last_msg = now
+            leveled = state.credit(int(20 * (randint(5, 20) / 10)))
+            self._dirty_global.add(message.author.id)
+            if leveled and config.global_notif:
+                await _dispatch_level_up(message, state.level, "global", route=config.route_channel_id)
+        if not config.enabled or message.channel.id in config.disabled:
+            return
+        state = await self.get_member(message.guild.id, message.author.id)
+        if now - state.last_msg >= config.freq * 60:
+            state.last_msg = now
+            leveled = state.credit(int((config.per_min * config.freq) * (randint(5, 20) / 10)))
+            self._dirty_members.add((message.guild.id, message.author.id))
+            if leveled:
+                current_role, other_roles = config.roles_at(state.level)
+                if current_role:
+                    await self._manage_roles(message, state.level, current_role, other_roles)
+                if config.server_notif:
+                    await _dispatch_level_up(message, state.level, "guild", route=config.route_channel_id)
+
+    async def _manage_roles(self, message: discord.Message, level: int, current_role: LevelRole,
+                            other_roles: Tuple[LevelRole, ...]) -> None:
+        role = message.guild.get_role(current_role.role_id)
+        with suppress(Exception):
+            await message.author.add_roles(role, reason=f"level up to level {level}")
+        if not current_role.type == "replace":
+            return
+        to_remove = [message.guild.get_role(entry.role_id) for entry in other_roles]
+        stale = [entry.role_id for entry, role in zip(other_roles, to_remove) if role is None]
+        if stale:
+            async with self.bot.db.acquire() as con:
+                await con.execute("DELETE FROM level_roles WHERE role_id=ANY($1::bigint[])", stale)
+            self.invalidate_config(message.guild.id)
+        to_remove = [role for role in to_remove if role and role in message.author.roles]
+        if to_remove:
+            with suppress(Exception):
+                await message.author.remove_roles(*to_remove)
+
+    async def flush(self) -> Tuple[int, int]:
+        if not (self._dirty_members or self._dirty_global):
+            return 0, 0
+        members, self._dirty_members = self._dirty_members, set()
+        users, self._dirty_global = self._dirty_global, set()
+        member_rows = [(*key, self._members[key]) for key in members if key in self._members]
+        global_rows = [(user_id, self._global[user_id]) for user_id in users if user_id in self._global]
+        try:
+            async with self.bot.db.acquire() as con:
+                async with con.transaction():
+                    if member_rows:
+                        await con.execute(
+                            "INSERT INTO level_users(guild_id, user_id, last_msg, xp, level) "
+                            "SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::bigint[], $5::integer[]) "
+                            "ON CONFLICT (guild_id, user_id) DO UPDATE SET last_msg=EXCLUDED.last_msg, "
+                            "xp=EXCLUDED.xp, level=EXCLUDED.level",
+                            [guild_id for guild_id, _, _ in member_rows],
+                            [user_id for _, user_id, _ in member_rows],
+                            *([getattr(state, attr) for _, _, state in member_rows] for attr in LevelState.__slots__),
+                        )
+                    if global_rows:
+                        await con.execute(
+                            "INSERT INTO level_global(user_id, last_msg, xp, level) "
+                            "SELECT * FROM unnest($1::bigint[], $2::bigint[], $3::bigint[], $4::integer[]) "
+                            "ON CONFLICT (user_id) DO UPDATE SET last_msg=EXCLUDED.last_msg, "
+                            "xp=EXCLUDED.xp, level=EXCLUDED.level",
+                            [user_id for user_id, _ in global_rows],
+                            *([getattr(state, attr) for _, state in global_rows] for attr in LevelState.__slots__),
+                        )
+        except Exception:
+            self._dirty_members |= members
+            self._dirty_global |= users
+            raise
+        for guild_id, user_id, state in member_rows:
+            if guild_id in self._ranks:
+                self._ranks[guild_id].update(user_id, state.level, state.xp)
+        if None in self._ranks:
+            for user_id, state in global_rows:
+                self._ranks[None].update(user_id, state.level, state.xp)
+        return len(member_rows), len(global_rows)
+
+    async def get_rank_index(self, guild_id: int = None) -> RankIndex:
+        index = self._ranks.get(guild_id)
+        if index is None:
+            await self.flush()
+            async with self.bot.db.acquire() as con:
+                if guild_id:
+                    records = await con.fetch("SELECT user_id, level, xp FROM level_users WHERE guild_id=$1", guild_id)
+                else:
+                    records = await con.fetch("SELECT user_id, level, xp FROM level_global")
+            index = self._ranks.get(guild_id)
+            if index is None:
+                index = self._ranks[guild_id] = RankIndex()
+                for record in records:
+                    index.update(record["user_id"], int(record["level"]), int(record["xp"]))
+        return index
+
+    async def get_rank(self, user_id: int, guild_id: int = None) -> Tuple[Optional[int], int]:
+        await self.flush()
+        index = await self.get_rank_index(guild_id)
+        return index.rank(user_id), len(index)
+
+    async def get_leaderboard(self, guild_id: int = None, limit: int = 100,
+                              offset: int = 0) -> List[Tuple[int, int, int]]:
+        await self.flush()
+        async with self.bot.db.acquire() as con:
+            if guild_id:
+                records = await con.fetch("SELECT user_id, level, xp FROM level_users WHERE guild_id=$1 "
+                                          "ORDER BY level DESC, xp DESC LIMIT $2 OFFSET $3", guild_id, limit, offset)
+            else:
+                records = await con.fetch("SELECT user_id, level, xp FROM level_global "
+                                          "ORDER BY level DESC, xp DESC LIMIT $1 OFFSET $2", limit, offset)
+        return [(record["user_id"], int(record["level"]), int(record["xp"])) for record in records]
+
+    def _evict_idle(self) -> None:
+        cutoff = int(datetime.now().timestamp()) - self.idle_ttl
+        for key in [key for key, state in self._members.items() if state.last_msg < cutoff]:
+            if key not in self._dirty_members:
+                del self._members[key]
+        for key in [key for key, state in self._global.items() if state.last_msg < cutoff]:
+            if key not in self._dirty_global:
+                del self._global[key]
+
+    @tasks.loop(seconds=30)
+    async def flush_loop(self) -> None:
+        try:
+            await self.flush()
+        except Exception:
+            pass
+        else:
+            self._evict_idle()
 
 
 async def _get_user_global_level(bot: commands.AutoShardedBot, user: discord.User) -> Tuple[int, int, int]:
-    async with bot.db.acquire() as con:
-        details = await con.fetch(f"SELECT last_msg, xp, level FROM level_global WHERE "
-                                  f"user_id={user.id}")
-        if not details:
-            details = await con.fetch("INSERT INTO level_global(user_id, last_msg, xp) VALUES"
-                                      f"({user.id}, 0, 0) ON CONFLICT DO NOTHING RETURNING last_msg, xp, level")
-    details = details[0]
-    return int(details['last_msg']), int(details['xp']), int(details['level'])
+    state = await bot.levels.get_global(user.id)
+    return state.last_msg, state.xp, state.level
 
 
 async def _get_user_guild_level(bot: commands.AutoShardedBot, member: discord.Member) -> Tuple[int, int, int]:
-    async with bot.db.acquire() as con:
-        details = await con.fetch(f"SELECT last_msg, xp, level FROM level_users WHERE "
-                                  f"user_id={member.id} AND guild_id={member.guild.id}")
-        if not details:
-            details = await con.fetch("INSERT INTO level_users(user_id, guild_id, xp, last_msg) VALUES"
-                                      f"({member.id}, {member.guild.id}, 0, 0) "
-                                      "ON CONFLICT DO NOTHING RETURNING last_msg, xp, level")
-    details = details[0]
-    return int(details['last_msg']), int(details['xp']), int(details['level'])
+    state = await bot.levels.get_member(member.guild.id, member.id)
+    return state.last_msg, state.xp, state.level
 
 
 async def _dispatch_level_up(message: discord.Message, level: int, mode: str, **options) -> discord.Message:
@@ -105,141 +384,139 @@ async def _dispatch_level_up(message: discord.Message, level: int, mode: str, **
         return await channel.send(embed=embed)
 
 
-async def _calculate_global_level(bot: commands.AutoShardedBot, message: discord.Message,
-                                  current_timestamp: int, route_channel_id: int, notify: bool):
-    last_timestamp, xp, current_level = await _get_user_global_level(bot, message.author)
-    if not current_timestamp - last_timestamp >= 60:
-        return
-    xp += int(20 * (randint(5, 20) / 10))
-    req_xp = _calc_req_xp(current_level)
-    async with bot.db.acquire() as con:
-        await con.execute(f"UPDATE level_global SET last_msg={int(datetime.now().timestamp())} "
-                          f"WHERE user_id={message.author.id}")
-        if xp >= req_xp:
-            await con.execute(f"UPDATE level_global SET level=level+1, xp={xp - req_xp} "
-                              f"WHERE user_id={message.author.id}")
-            current_level += 1
-            if notify:
-                await _dispatch_level_up(message, current_level, "global", route=route_channel_id)
-        else:
-            await con.execute(f"UPDATE level_global SET xp={xp} WHERE "
-                              f"user_id={message.author.id}")
-    return
-
+async def calculate_level(bot: commands.AutoShardedBot, message: discord.Message):
+    return await bot.levels.process(message)
 
-async def _manage_roles(bot: commands.AutoShardedBot, message: discord.Message, current_level: int,
-                        current_role, other_roles: Union[List[discord.Role], None]):
-    role = message.guild.get_role(int(current_role['role_id']))
-    await message.author.add_roles(role, reason=f"level up to level {current_level}")
-    if not current_role['type'] == "replace":
-        return
 
-    to_remove = []
-    if other_roles:
-        async with bot.db.acquire() as con:
-            for entry in other_roles:
-                try:
-                    to_remove.append(message.guild.get_role(int(entry['role_id'])))
-                except Exception:
-                    await con.execute(f"DELETE FROM level_roles WHERE role_id={int(entry['role_id'])}")
-    if to_remove:
-        with suppress(Exception):
-            await message.author.remove_roles(*to_remove)
-    return
+_PROGRESS_LENGTH = 1003 - 295
+_PROGRESS_BUCKETS = 100
+_assets: Dict[str, Any] = {}
+_buffer = BytesIO()
 
 
-async def _calculate_guild_level(bot: commands.AutoShardedBot, message: discord.Message,
-                                 current_timestamp: int, route_channel_id: int,
-                                 freq: int, per_min: int, notify: bool):
-    last_timestamp, xp, current_level = await _get_user_guild_level(bot, message.author)
-    if not current_timestamp - last_timestamp >= freq * 60:
+def _load_assets() -> None:
+    if _assets:
         return
-    xp += int((per_min * freq) * (randint(5, 20) / 10))
-    req_xp = _calc_req_xp(current_level)
-    async with bot.db.acquire() as con:
-        await con.execute(f"UPDATE level_users SET last_msg={int(datetime.now().timestamp())} "
-                          f"WHERE user_id={message.author.id} AND guild_id={message.guild.id}")
-        if xp >= req_xp:
-            await con.execute(f"UPDATE level_users SET level=level+1, xp={xp - req_xp} "
-                              f"WHERE user_id={message.author.id} AND guild_id={message.guild.id}")
-            current_level += 1
-            current_role = await con.fetch(f"SELECT * FROM level_roles WHERE guild_id={message.guild.id} AND "
-                                           f"obtain_at = {current_level}")
-            other_roles = await con.fetch(f"SELECT * from level_roles WHERE guild_id={message.guild.id} AND "
-                                          f"obtain_at < {current_level}")
-            if current_role:
-                current_role = current_role[0]
-                await _manage_roles(bot, message, current_level, current_role, other_roles)
-            if notify:
-                await _dispatch_level_up(message, current_level, "guild", route=route_channel_id)
-        else:
-            await con.execute(f"UPDATE level_users SET xp={xp} WHERE "
-                              f"user_id={message.author.id} AND guild_id={message.guild.id}")
-    return
+    _assets["name_font"] = ImageFont.truetype("./utils/src/NotoSans-CondensedBold.ttf", 69)
+    _assets["level_font"] = ImageFont.truetype("./utils/src/NotoSans-CondensedBold.ttf", 42)
+    overlay = Image.open("./utils/src/mbprofile.png")
+    overlay.load()
+    _assets["overlay"] = overlay
+    pfp_mask = Image.new("L", (256, 256), 0)
+    ImageDraw.Draw(pfp_mask).ellipse((0, 0, 256, 256), fill=255)
+    _assets["pfp_mask"] = pfp_mask
 
 
-async def calculate_level(bot: commands.AutoShardedBot, message: discord.Message):
-    current_timestamp = int(datetime.now().timestamp())
-    enabled, channel_disabled, route_channel_id, freq, per_min, snotif, gnotif = await _get_guild_config(bot, message)
-    await _calculate_global_level(bot, message, current_timestamp, route_channel_id, gnotif)
-    if enabled and not channel_disabled:
-        await _calculate_guild_level(bot, message, current_timestamp, route_channel_id, freq, per_min, snotif)
-    return
+def _progress_bucket(xp: int, req_xp: int) -> int:
+    return min(_PROGRESS_BUCKETS * xp // req_xp, _PROGRESS_BUCKETS - 1)
 
 
-async def _get_progress_bar(bot: commands.AutoShardedBot, member: discord.Member, mode: str = None) -> Tuple[Any, int, int, int]:
+def _render_card(name: str, level: int, progress: int, pfp_asset_bytes: bytes) -> bytes:
     # Left progress bar = (295, 247)
     # Right progress bar = (1003, 247)
     # Height = 65 px
     # Center level = (808, 247)
-    max_length = 1003 - 295
-    _, xp, level = await _get_user_guild_level(bot, member) if mode == "guild" else await _get_user_global_level(bot, member)
-    req_xp = _calc_req_xp(level)
-    length = int(max_length * (xp / req_xp))
-    return Image.new("RGBA", (length, 65), (196, 176, 245)), level, xp, req_xp
-
-
-def _executor_gen(bot: AutoShardedBot, member: discord.Member, mode: str,
-                  progress_bar, level, xp, req_xp, pfp_asset_bytes) -> Any:
-    name_font = ImageFont.truetype("./utils/src/NotoSans-CondensedBold.ttf", 69)
-    level_font = ImageFont.truetype("./utils/src/NotoSans-CondensedBold.ttf", 42)
-    pfp_mask = Image.new("L", (256, 256), 0)
-    draw = ImageDraw.Draw(pfp_mask)
-    draw.ellipse((0, 0, 256, 256), fill=255)
-
+    _load_assets()
+    name_font, level_font = _assets["name_font"], _assets["level_font"]
     image = Image.new("RGBA", (1050, 300), (115, 115, 115))
-    if progress_bar:
-        image.paste(progress_bar, (295, 215))
+    length = _PROGRESS_LENGTH * progress // _PROGRESS_BUCKETS
+    if length > 0:
+        image.paste((196, 176, 245, 255), (295, 215, 295 + length, 280))
 
-    overlay = Image.open("./utils/src/mbprofile.png")
+    overlay = _assets["overlay"]
     image.paste(overlay, (0, 0), overlay)
-    name_length = ImageDraw.ImageDraw(image).textlength(str(member), font=name_font)
-    xp_length = ImageDraw.ImageDraw(image).textlength(f"{xp}/{req_xp}", font=level_font) / 2
-    lvl_length = ImageDraw.ImageDraw(image).textlength(f"Level {level}", font=level_font) / 2
     text_draw = ImageDraw.Draw(image)
-    text_draw.text((1030 - name_length, 10), str(member), (0, 0, 0), font=name_font)
-    text_draw.text((649 - xp_length, 216), f"{xp}/{req_xp}", (0, 0, 0), font=level_font)
+    name_length = text_draw.textlength(name, font=name_font)
+    xp_length = text_draw.textlength(f"{progress}%", font=level_font) / 2
+    lvl_length = text_draw.textlength(f"Level {level}", font=level_font) / 2
+    text_draw.text((1030 - name_length, 10), name, (0, 0, 0), font=name_font)
+    text_draw.text((649 - xp_length, 216), f"{progress}%", (0, 0, 0), font=level_font)
     text_draw.text((960 - lvl_length, 100), f"Level {level}", (0, 0, 0), font=level_font)
 
     pfp_overlay = Image.open(BytesIO(pfp_asset_bytes))
     if not pfp_overlay.size[0] == pfp_overlay.size[1] == 256:
         pfp_overlay = pfp_overlay.resize((256, 256), NEAREST, reducing_gap=3.0)
-    image.paste(pfp_overlay, (24, 20), pfp_mask)
+    image.paste(pfp_overlay, (24, 20), _assets["pfp_mask"])
+
+    _buffer.seek(0)
+    _buffer.truncate()
+    image.save(_buffer, format="png")
+    # The only copy: these bytes are what crosses the process boundary and what gets cached
+    return _buffer.getvalue()
+
+
+class ProfileRenderer:
+    def __init__(self, bot: AutoShardedBot, workers: int = None, cache_size: int = None) -> None:
+        self.bot = bot
+        self.workers = workers or int(os.getenv("PROFILE_RENDER_WORKERS", min(2, os.cpu_count() or 1)))
+        self._cache = LRUCache(maxsize=cache_size or int(os.getenv("PROFILE_CACHE_SIZE", 128)))
+        self._executor: ProcessPoolExecutor = None
+        self.renders = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_load_assets,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _reset_executor(self, executor: ProcessPoolExecutor) -> None:
+        if self._executor is executor:
+            self._executor = None
+            executor.shutdown(wait=False)
+
+    async def render(self, name: str, level: int, progress: int, pfp_asset_bytes: bytes) -> bytes:
+        self.renders += 1
+        func = functools.partial(_render_card, name, level, progress, pfp_asset_bytes)
+        executor = self._get_executor()
+        try:
+            return await self.bot.loop.run_in_executor(executor, func)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            return await self.bot.loop.run_in_executor(self._get_executor(), func)
+
+    async def get_card(self, member: discord.Member, mode: str = "guild") -> bytes:
+        if mode == "guild":
+            state = await self.bot.levels.get_member(member.guild.id, member.id)
+        else:
+            state = await self.bot.levels.get_global(member.id)
+        progress = _progress_bucket(state.xp, _calc_req_xp(state.level))
+        key = (member.id, member.avatar, str(member), state.level, progress)
+        card = self._cache.get(key)
+        if card is None:
+            pfp_asset_bytes = await member.avatar_url_as(format="png", static_format="png", size=256).read()
+            card = await self.render(str(member), state.level, progress, pfp_asset_bytes)
+            self._cache.put(key, card)
+        return card
+
+    async def benchmark(self, count: int = 50) -> float:
+        pfp = BytesIO()
+        Image.new("RGBA", (256, 256), (114, 137, 218)).save(pfp, format="png")
+        await self.render("Benchmark#0000", 0, 0, pfp.getvalue())
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            self.render(f"Benchmark#{index:04d}", index % 50, index % _PROGRESS_BUCKETS, pfp.getvalue())
+            for index in range(count)
+        ))
+        return count / (time.perf_counter() - start)
+
+    def stats(self) -> str:
+        return "\n".join([
+            f"**Workers:** {self.workers}",
+            f"**Renders:** {self.renders}",
+            f"**Cache:** {len(self._cache)}/{self._cache.maxsize} cards, {self._cache.hits} hits, "
+            f"{self._cache.misses} misses, {self._cache.evictions} evictions",
+        ])
+
+    def close(self) -> None:
+        if self._executor:
+            self._executor.shutdown(wait=False)
 
-    b_io = BytesIO()
-    image.save(b_io, format="png")
-    export = discord.File(fp=BytesIO(b_io.getvalue()), filename="profile.jpg")
+
+async def gen_profile(bot: commands.AutoShardedBot, member: discord.Member, mode: str = "guild") -> Tuple[discord.File, discord.Embed]:
+    card = await bot.profiles.get_card(member, mode=mode)
+    # BytesIO over immutable bytes shares the buffer instead of copying it
+    export = discord.File(fp=BytesIO(card), filename="profile.jpg")
     embed = discord.Embed(title=f"{member.display_name}'s Profile",
                           color=discord.Color.blue())
     embed.set_image(url="attachment://profile.jpg")
     return export, embed
-
-
-async def gen_profile(bot: commands.AutoShardedBot, member: discord.Member, mode: str = "guild") -> Tuple[discord.File, discord.Embed]:
-    progress_bar, level, xp, req_xp = await _get_progress_bar(bot, member, mode=mode)
-    pfp_asset_bytes = await member.avatar_url_as(format="png", static_format="png", size=256).read()
-
-    return await bot.loop.run_in_executor(
-        None,
-        functools.partial(_executor_gen, bot, member, mode, progress_bar, level, xp, req_xp, pfp_asset_bytes)
-    )
@@ -1,7 +1,8 @@
 import asyncio
+import functools
 from asyncio.exceptions import CancelledError
 from datetime import datetime
-from typing import Any, List, NamedTuple, Tuple, Union
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import discord
 from discord.errors import Forbidden
@@ -9,8 +10,12 @@ from discord.ext import commands
 
 from utils import GlobalCMDS, customerrors
 from utils.enums import LogLevel
+from utils.lru import LRUCache
+from utils.messagejournal import JournalEntry
 
 __all__ = (
+    "LogProfileCache",
+    "LogBatcher",
     "LogDispatcher",
     "GuildDispatcher",
     "MemberDispatcher",
@@ -20,7 +25,11 @@ __all__ = (
 YES = "✅"
 NO = "❌"
 NONE = "⬜"
-_TOO_LONG = lambda e, n, v: len(e) + len(n) + len(v) > 6000 or len(e.fields) == 25
+_EMBED_LIMIT = 6000
+_BATCH_SIZE = 10
+_TOO_LONG = lambda e, n, v: len(e) + len(n) + len(v) > _EMBED_LIMIT or len(e.fields) == 25
+_JUMP_URL = "https://discord.com/channels/{}/{}/{}"
+_BATCH_FULL = lambda b, s, e: len(b) == _BATCH_SIZE or s + len(e) > _EMBED_LIMIT
 
 
 class GuildDiff(NamedTuple):
@@ -102,18 +111,194 @@ def _handle_task_result(task: asyncio.Task):
         pass
 
 
-class LogDispatcher():
+class LogProfile():
+    __slots__ = ("log_channel", "log_level", "commands", "webhook_id", "webhook", "journal")
+
+    def __init__(self, log_channel: Optional[int], log_level: Optional[int], commands: Dict[str, bool], webhook_id: Optional[int],
+                 journal: bool = False):
+        self.log_channel = log_channel
+        self.log_level = log_level
+        self.commands = commands
+        self.webhook_id = webhook_id
+        self.webhook: Optional[discord.Webhook] = None
+        self.journal = journal
+
+    @property
+    def journaling(self) -> bool:
+        return bool(self.journal and self.log_channel and (self.log_level or 0) >= LogLevel.GUILD.value)
+
+
+class LogProfileCache():
+    _NON_COMMAND_COLUMNS = frozenset(["guild_id", "webhook_id", "log_channel", "log_level", "log_journal"])
+
     def __init__(self, bot: commands.AutoShardedBot):
+        self.bot = bot
+        self._profiles: Dict[int, LogProfile] = {}
+        self._pending: Dict[int, asyncio.Task] = {}
+
+    async def _load(self, guild_id: int) -> LogProfile:
+        async with self.bot.db.acquire() as con:
+            record = await con.fetchrow(
+                "SELECT guild.log_channel, guild.log_level, guild.log_journal, logging.* FROM guild "
+                f"LEFT JOIN logging ON logging.guild_id=guild.guild_id WHERE guild.guild_id={guild_id}"
+            )
+        if not record:
+            return LogProfile(None, None, {}, None)
+        return LogProfile(
+            record["log_channel"],
+            record["log_level"],
+            {key: value for key, value in record.items() if not key in self._NON_COMMAND_COLUMNS},
+            record["webhook_id"],
+            record["log_journal"],
+        )
+
+    async def get(self, guild_id: int) -> LogProfile:
+        profile = self._profiles.get(guild_id)
+        if profile:
+            return profile
+        if not guild_id in self._pending:
+            task = self.bot.loop.create_task(self._load(guild_id))
+            task.add_done_callback(functools.partial(self._store, guild_id))
+            self._pending[guild_id] = task
+        return await asyncio.shield(self._pending[guild_id])
+
+    def _store(self, guild_id: int, task: asyncio.Task) -> None:
+        if self._pending.get(guild_id) is task:
+            del self._pending[guild_id]
+            if not task.cancelled() and not task.exception():
+                self._profiles[guild_id] = task.result()
+
+    async def get_webhook(self, channel: discord.TextChannel) -> discord.Webhook:
+        profile = await self.get(channel.guild.id)
+        if profile.webhook and profile.webhook.channel_id == channel.id:
+            return profile.webhook
+        webhooks = await channel.webhooks()
+        webhook = discord.utils.get(webhooks, id=profile.webhook_id)
+        if not webhook:
+            webhook = await channel.create_webhook(
+                name="UconnSmashBot Logging",
+                avatar=await self.bot.user.avatar_url_as().read()
+            )
+            async with self.bot.db.acquire() as con:
+                await con.execute(f"UPDATE logging SET webhook_id={webhook.id} WHERE guild_id={channel.guild.id}")
+            profile.webhook_id = webhook.id
+        profile.webhook = webhook
+        return webhook
+
+    def invalidate(self, guild_id: int) -> None:
+        self._profiles.pop(guild_id, None)
+        self._pending.pop(guild_id, None)
+
+    def invalidate_webhook(self, channel: discord.abc.GuildChannel) -> None:
+        profile = self._profiles.get(channel.guild.id)
+        if profile and profile.log_channel == channel.id:
+            profile.webhook = None
+
+
+class LogBatcher():
+    def __init__(self, bot: commands.AutoShardedBot, cache: LogProfileCache, window: float = 1.5,
+                 max_queued: int = 250, put_timeout: float = 5, idle_timeout: float = 300):
+        self.bot = bot
+        self.cache = cache
+        self.window = window
+        self.max_queued = max_queued
+        self.put_timeout = put_timeout
+        self.idle_timeout = idle_timeout
+        self._queues: Dict[int, asyncio.Queue] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self.queued = 0
+        self.dropped = 0
+        self.sent = 0
+        self.batches = 0
+
+    @property
+    def backlog(self) -> int:
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    @property
+    def active_queues(self) -> int:
+        return len(self._queues)
+
+    def _get_queue(self, guild_id: int) -> asyncio.Queue:
+        queue = self._queues.get(guild_id)
+        if queue is None:
+            queue = self._queues[guild_id] = asyncio.Queue(maxsize=self.max_queued)
+            task = self.bot.loop.create_task(self._worker(guild_id, queue))
+            task.add_done_callback(_handle_task_result)
+            self._workers[guild_id] = task
+        return queue
+
+    async def put(self, channel: discord.TextChannel, embeds: List[discord.Embed]) -> None:
+        queue = self._get_queue(channel.guild.id)
+        for embed in embeds:
+            try:
+                queue.put_nowait((channel, embed))
+            except asyncio.QueueFull:
+                try:
+                    await asyncio.wait_for(queue.put((channel, embed)), timeout=self.put_timeout)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    continue
+            self.queued += 1
+
+    async def _worker(self, guild_id: int, queue: asyncio.Queue) -> None:
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    return
+                await asyncio.sleep(self.window)
+                channel, embed = item
+                batch, size = [embed], len(embed)
+                while not queue.empty():
+                    next_channel, embed = queue.get_nowait()
+                    if next_channel.id != channel.id or _BATCH_FULL(batch, size, embed):
+                        await self._send(channel, batch)
+                        channel, batch, size = next_channel, [], 0
+                    batch.append(embed)
+                    size += len(embed)
+                await self._send(channel, batch)
+        finally:
+            if self._queues.get(guild_id) is queue:
+                del self._queues[guild_id]
+                del self._workers[guild_id]
+
+    async def _send(self, channel: discord.TextChannel, embeds: List[discord.Embed]) -> None:
+        try:
+            try:
+                webhook = await self.cache.get_webhook(channel)
+                await webhook.send(embeds=embeds)
+            except (Forbidden, AttributeError):
+                for embed in embeds:
+                    await channel.send(embed=embed)
+            except discord.NotFound:
+                self.cache.invalidate_webhook(channel)
+                raise
+        except Exception:
+            self.dropped += len(embeds)
+        else:
+            self.sent += len(embeds)
+            self.batches += 1
+
+    def close(self) -> None:
+        for task in list(self._workers.values()):
+            task.cancel()
+
+
+class LogDispatcher():
+    def __init__(self, bot: commands.AutoShardedBot, cache: LogProfileCache = None, batcher: LogBatcher = None):
         self.bot = bot
         self.min_level = LogLevel.BASIC
         self.gcmds = GlobalCMDS(self.bot)
+        self.cache = cache or LogProfileCache(self.bot)
+        self.batcher = batcher or LogBatcher(self.bot, self.cache)
 
     async def check_logging_enabled(self, guild, min_level: LogLevel):
         if not guild:
             raise customerrors.LoggingNotEnabled()
-        async with self.bot.db.acquire() as con:
-            log_channel = await con.fetchval(f"SELECT log_channel FROM guild WHERE guild_id={guild.id}")
-            log_level = await con.fetchval(f"SELECT log_level FROM guild WHERE guild_id={guild.id}")
+        profile = await self.cache.get(guild.id)
+        log_channel, log_level = profile.log_channel, profile.log_level
 
         if not log_channel or log_channel == "DISABLED":
             raise customerrors.LoggingNotEnabled()
@@ -123,54 +308,29 @@ class LogDispatcher():
             return self.bot.get_channel(log_channel)
 
     async def dispatch_embed(self, channel: discord.TextChannel, embed: discord.Embed = None, embeds: List[discord.Embed] = None):
-        try:
-            webhooks = await channel.webhooks()
-            async with self.bot.db.acquire() as con:
-                webhook_id = await con.fetchval(f"SELECT webhook_id FROM logging WHERE guild_id={channel.guild.id}")
-                webhook = discord.utils.get(webhooks, id=webhook_id)
-                if not webhook:
-                    webhook = await channel.create_webhook(
-                        name="UconnSmashBot Logging",
-                        avatar=await self.bot.user.avatar_url_as().read()
-                    )
-                    await con.execute(f"UPDATE logging SET webhook_id={webhook.id} WHERE guild_id={channel.guild.id}")
-            current_timestamp = "{:%m/%d/%Y %H:%M:%S}".format(datetime.now())
-            if embeds:
-                for embed in embeds:
-                    embed.set_footer(
-                        text=current_timestamp,
-                        icon_url=self.bot.user.avatar_url,
-                    )
-                embed = None
-            if embed:
-                embed.set_footer(
-                    text=current_timestamp,
-                    icon_url=self.bot.user.avatar_url,
-                )
-                embeds = None
-            coro = webhook.send(
-                embed=embed,
-                embeds=embeds,
+        if not channel:
+            return
+        current_timestamp = "{:%m/%d/%Y %H:%M:%S}".format(datetime.now())
+        embeds = embeds or [embed]
+        for embed in embeds:
+            embed.set_footer(
+                text=current_timestamp,
+                icon_url=self.bot.user.avatar_url,
             )
-        except (Forbidden, AttributeError) as e:
-            coro = channel.send(
-                embed=embed,
-                embeds=embeds,
-            )
-        task = self.bot.loop.create_task(coro)
-        task.add_done_callback(_handle_task_result)
+        await self.batcher.put(channel, embeds)
 
 
 class GuildDispatcher(LogDispatcher):
-    def __init__(self, bot: commands.AutoShardedBot):
-        super().__init__(bot)
+    def __init__(self, bot: commands.AutoShardedBot, cache: LogProfileCache = None, batcher: LogBatcher = None):
+        super().__init__(bot, cache=cache, batcher=batcher)
         self.min_level = LogLevel.GUILD
+        self._messages = LRUCache(maxsize=256)
+        self._users = LRUCache(maxsize=256)
 
     async def check_command_logging_enabled(self, guild: discord.Guild, min_level: LogLevel, name: str):
         log_channel = await super().check_logging_enabled(guild, min_level)
-        async with self.bot.db.acquire() as con:
-            command_enabled = await con.fetchval(f"SELECT {name} FROM logging WHERE guild_id={guild.id}")
-        if command_enabled:
+        profile = await self.cache.get(guild.id)
+        if profile.commands.get(name):
             return log_channel
         else:
             raise customerrors.LoggingNotEnabled()
@@ -609,27 +769,63 @@ class GuildDispatcher(LogDispatcher):
                 )
             return await self.dispatch_embed(log_channel, embed=embed)
 
+    def _get_guild_channel(self, channel_id: int) -> Optional[discord.TextChannel]:
+        channel = self.bot.get_channel(channel_id)
+        return channel if hasattr(channel, "guild") else None
+
+    async def _get_user(self, guild: discord.Guild, user_id: int) -> Union[discord.Member, discord.User]:
+        user = guild.get_member(user_id) or self.bot.get_user(user_id) or self._users.get(user_id)
+        if not user:
+            user = await self.bot.fetch_user(user_id)
+            self._users.put(user_id, user)
+        return user
+
+    async def _get_message(self, channel: discord.TextChannel, message_id: int) -> discord.Message:
+        message = self._messages.get(message_id)
+        if not message:
+            message = await channel.fetch_message(message_id)
+            self._messages.put(message_id, message)
+        return message
+
     @enabled
-    async def message_raw_edit(self, message_id: int, channel_id: int, data: dict):
-        channel = await self.bot.fetch_channel(channel_id)
-        if hasattr(channel, "guild"):
-            try:
-                message: discord.Message = await channel.fetch_message(message_id)
-                if message.author.bot:
-                    raise TypeError
-            except Exception:
+    async def message_raw_edit(self, message_id: int, channel_id: int, data: dict, cached_message: discord.Message = None,
+                               before: str = None):
+        channel = self._get_guild_channel(channel_id)
+        if channel and "content" in data:
+            log_channel = await self.check_logging_enabled(channel.guild, self.min_level)
+            author_data = data.get("author")
+            if author_data:
+                if author_data.get("bot"):
+                    return
+                author = await self._get_user(channel.guild, int(author_data["id"]))
+            elif cached_message:
+                author = cached_message.author
+            else:
+                author = (await self._get_message(channel, message_id)).author
+            if author.bot:
                 return
-            log_channel = await self.check_logging_enabled(message.guild, self.min_level)
+            content = data["content"]
+            if before is None and cached_message:
+                before = cached_message.content
             embed = discord.Embed(
-                title=f"Message Edited: {message.author.display_name}",
-                color=message.author.color,
+                title=f"Message Edited: {author.display_name}",
+                color=author.color,
             ).add_field(
                 name="Editor",
-                value=message.author.mention,
+                value=author.mention,
                 inline=False,
-            ).add_field(
+            )
+            if before is not None:
+                if before == content:
+                    return
+                embed.add_field(
+                    name="Previous Content",
+                    value=(before if len(before) < 1024 else "Message is too long to display") or "`no content`",
+                    inline=False,
+                )
+            embed.add_field(
                 name="Edited Content",
-                value=message.content if len(message.content) < 1024 else "Message is too long to display",
+                value=content if len(content) < 1024 else "Message is too long to display",
                 inline=False,
             )
             embed.add_field(
@@ -638,15 +834,16 @@ class GuildDispatcher(LogDispatcher):
                 inline=False,
             ).add_field(
                 name="Jump To Message",
-                value=f"[Click Here]({message.jump_url})",
+                value=f"[Click Here]({_JUMP_URL.format(channel.guild.id, channel_id, message_id)})",
                 inline=False,
             )
             return await self.dispatch_embed(log_channel, embed=embed)
 
     @enabled
-    async def message_raw_delete(self, message_id: int, channel_id: int, cached_message: discord.Message):
-        channel = await self.bot.fetch_channel(channel_id)
-        if hasattr(channel, "guild"):
+    async def message_raw_delete(self, message_id: int, channel_id: int, cached_message: discord.Message,
+                                 journaled: JournalEntry = None):
+        channel = self._get_guild_channel(channel_id)
+        if channel:
             log_channel = await self.check_logging_enabled(channel.guild, self.min_level)
             embed = discord.Embed(
                 title="Message Deleted",
@@ -669,12 +866,21 @@ class GuildDispatcher(LogDispatcher):
                     name="Message Content",
                     value=f"```{cached_message.content}```"
                 )
+            elif journaled:
+                embed.add_field(
+                    name="Message Author",
+                    value=f"<@{journaled.author_id}>",
+                    inline=False
+                ).add_field(
+                    name="Message Content",
+                    value=f"```{journaled.content}```"
+                )
             return await self.dispatch_embed(log_channel, embed=embed)
 
     @enabled
     async def message_raw_bulk_delete(self, message_ids: set, channel_id: int):
-        channel = await self.bot.fetch_channel(channel_id)
-        if hasattr(channel, "guild"):
+        channel = self._get_guild_channel(channel_id)
+        if channel:
             log_channel = await self.check_logging_enabled(channel.guild, self.min_level)
             embed = discord.Embed(
                 title="Bulk Message Delete",
@@ -691,12 +897,12 @@ class GuildDispatcher(LogDispatcher):
             return await self.dispatch_embed(log_channel, embed=embed)
 
     @enabled
-    async def reaction_raw_update(self, message_id: int, emoji: discord.PartialEmoji, user_id: int, channel_id: int, event_type: str):
-        channel = await self.bot.fetch_channel(channel_id)
-        if hasattr(channel, "guild"):
+    async def reaction_raw_update(self, message_id: int, emoji: discord.PartialEmoji, user_id: int, channel_id: int, event_type: str,
+                                  member: discord.Member = None):
+        channel = self._get_guild_channel(channel_id)
+        if channel and not (member and member.bot):
             log_channel = await self.check_logging_enabled(channel.guild, self.min_level)
-            message = await channel.fetch_message(message_id)
-            user = await self.bot.fetch_user(user_id)
+            user = member or await self._get_user(channel.guild, user_id)
             if not user.bot:
                 embed = discord.Embed(
                     title=event_type.title(),
@@ -707,7 +913,7 @@ class GuildDispatcher(LogDispatcher):
                     inline=False,
                 ).add_field(
                     name="Message",
-                    value=f"[Click Here]({message.jump_url})",
+                    value=f"[Click Here]({_JUMP_URL.format(channel.guild.id, channel_id, message_id)})",
                     inline=False,
                 ).add_field(
                     name="Channel",
@@ -724,10 +930,9 @@ class GuildDispatcher(LogDispatcher):
 
     @enabled
     async def reaction_raw_clear(self, message_id: int, channel_id: int):
-        channel = await self.bot.fetch_channel(channel_id)
-        if hasattr(channel, "guild"):
+        channel = self._get_guild_channel(channel_id)
+        if channel:
             log_channel = await self.check_logging_enabled(channel.guild, self.min_level)
-            message = await channel.fetch_message(message_id)
             embed = discord.Embed(
                 title="Reactions Cleared",
                 color=discord.Color.dark_red()
@@ -736,19 +941,19 @@ class GuildDispatcher(LogDispatcher):
                 value=channel.mention,
             ).add_field(
                 name="Message",
-                value=f"[Click Here]({message.jump_url})",
+                value=f"[Click Here]({_JUMP_URL.format(channel.guild.id, channel_id, message_id)})",
             )
             return await self.dispatch_embed(log_channel, embed=embed)
 
     @enabled
     async def reaction_raw_clear_emoji(self, message_id: int, channel_id: int, emoji: discord.PartialEmoji):
-        channel = await self.bot.fetch_channel(channel_id)
-        if hasattr(channel, "guild"):
+        channel = self._get_guild_channel(channel_id)
+        if channel:
             log_channel = await self.check_logging_enabled(channel.guild, self.min_level)
-            message = await channel.fetch_message(message_id)
+            jump_url = _JUMP_URL.format(channel.guild.id, channel_id, message_id)
             embed = discord.Embed(
                 title="Reaction Emoji Cleared",
-                description=f"[This message]({message.jump_url}) had all of its reactions with the emoji {emoji} removed",
+                description=f"[This message]({jump_url}) had all of its reactions with the emoji {emoji} removed",
                 color=discord.Color.dark_red()
             ).add_field(
                 name="Emoji",
@@ -758,14 +963,14 @@ class GuildDispatcher(LogDispatcher):
                 value=channel.mention,
             ).add_field(
                 name="Message",
-                value=f"[Click Here]({message.jump_url})",
+                value=f"[Click Here]({jump_url})",
             )
             return await self.dispatch_embed(log_channel, embed=embed)
 
 
 class MemberDispatcher(LogDispatcher):
-    def __init__(self, bot: commands.AutoShardedBot):
-        super().__init__(bot)
+    def __init__(self, bot: commands.AutoShardedBot, cache: LogProfileCache = None, batcher: LogBatcher = None):
+        super().__init__(bot, cache=cache, batcher=batcher)
         self.min_level = LogLevel.GUILD
         self._statuses = {
             "online": "🟢 Online",
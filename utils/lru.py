@@ -0,0 +1,32 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+__all__ = (
+    "LRUCache",
+)
+
+
+class LRUCache(OrderedDict):
+    def __init__(self, maxsize: int = 128) -> None:
+        super().__init__()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if key in self:
+            self.move_to_end(key)
+            self.hits += 1
+            return super().__getitem__(key)
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if key in self:
+            self.move_to_end(key)
+        super().__setitem__(key, value)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+            self.evictions += 1
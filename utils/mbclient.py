@@ -1,14 +1,141 @@
 import asyncio
-import json
 import logging
-from datetime import datetime
-from typing import Dict
+import os
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional
 
 import aiohttp
+from discord.ext import tasks
 from discord.ext.commands.bot import AutoShardedBot
-from lavalink import Client, NodeManager, PlayerManager
+from lavalink import Client, Node, NodeManager, PlayerManager
 
 from .mbplayer import MBPlayer
+from .trackcache import TrackCache
+
+
+_MAX_SYSTEM_LOAD = float(os.getenv("LAVALINK_MAX_SYSTEM_LOAD", 0.9))
+_MAX_FRAME_PENALTY = float(os.getenv("LAVALINK_MAX_FRAME_PENALTY", 300))
+_MIGRATIONS_PER_TICK = 5
+
+
+class CacheRebuild:
+    def __init__(self, client: "MBClient", guild_id: int, missing_only: bool = False, started_at: int = None,
+                 cursor_created_at: int = -1, cursor_query: str = "", processed: int = 0, failed: int = 0,
+                 total: int = None) -> None:
+        self.client = client
+        self.bot = client.bot
+        self.guild_id = guild_id
+        self.missing_only = missing_only
+        self.started_at = started_at or int(datetime.now().timestamp())
+        self.cursor = (cursor_created_at, cursor_query)
+        self.processed = processed
+        self.failed = failed
+        self.total = total
+        self.batch_size = int(os.getenv("MUSIC_REBUILD_BATCH", 100))
+        self.concurrency = int(os.getenv("MUSIC_REBUILD_CONCURRENCY", 4))
+        self.rate = float(os.getenv("MUSIC_REBUILD_RATE", 5))
+        self.task: asyncio.Task = None
+        self._session_processed = 0
+        self._session_start = time.monotonic()
+        self._next_slot = 0.0
+
+    @property
+    def _filter(self) -> str:
+        return "created_at < $1" + (" AND tracks IS NULL" if self.missing_only else "")
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self._session_start
+        return self._session_processed / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[timedelta]:
+        if not self.total or not self.throughput:
+            return None
+        return timedelta(seconds=int(max(self.total - self.processed, 0) / self.throughput))
+
+    def status(self) -> str:
+        total = self.total or 0
+        eta = self.eta
+        return "\n".join([
+            f"**Mode:** {'Entries Without Data' if self.missing_only else 'All Entries'}",
+            f"**Progress:** {self.processed}/{total} ≈ {(100 * self.processed / total) if total else 0:.2f}%",
+            f"**Failed:** {self.failed}",
+            f"**Throughput:** {self.throughput:.2f} queries/s",
+            f"**ETA:** {eta if eta is not None else 'Calculating...'}",
+        ])
+
+    def start(self) -> asyncio.Task:
+        self.task = self.bot.loop.create_task(self.run())
+        return self.task
+
+    async def _pace(self) -> None:
+        now = time.monotonic()
+        slot = max(self._next_slot, now)
+        self._next_slot = slot + 1 / self.rate
+        await asyncio.sleep(slot - now)
+
+    async def _refresh(self, query: str) -> None:
+        node = self.client.node_manager.find_ideal_node()
+        while node is None:
+            await asyncio.sleep(5)
+            node = self.client.node_manager.find_ideal_node()
+        await self._pace()
+        try:
+            if not await self.client.track_cache.refresh(query, node, guild_id=self.guild_id):
+                self.failed += 1
+        except Exception:
+            self.failed += 1
+        self.processed += 1
+        self._session_processed += 1
+
+    async def _process(self, queries: List[str]) -> None:
+        pending = iter(queries)
+
+        async def worker() -> None:
+            for query in pending:
+                await self._refresh(query)
+
+        await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(queries)))))
+
+    async def _checkpoint(self) -> None:
+        async with self.bot.mbdb.acquire() as con:
+            await con.execute(
+                "INSERT INTO music_cache_rebuild(id, guild_id, missing_only, started_at, cursor_created_at, "
+                "cursor_query, processed, failed, total) VALUES (1, $1, $2, $3, $4, $5, $6, $7, $8) "
+                "ON CONFLICT (id) DO UPDATE SET cursor_created_at=EXCLUDED.cursor_created_at, "
+                "cursor_query=EXCLUDED.cursor_query, processed=EXCLUDED.processed, failed=EXCLUDED.failed, "
+                "total=EXCLUDED.total",
+                self.guild_id, self.missing_only, self.started_at, *self.cursor, self.processed, self.failed, self.total,
+            )
+
+    async def run(self) -> None:
+        if self.total is None:
+            async with self.bot.mbdb.acquire() as con:
+                self.total = await con.fetchval(f"SELECT COUNT(*) FROM music_cache WHERE {self._filter}",
+                                                self.started_at)
+            await self._checkpoint()
+        while True:
+            async with self.bot.mbdb.acquire() as con:
+                batch = await con.fetch(
+                    f"SELECT query, created_at FROM music_cache WHERE {self._filter} "
+                    "AND (created_at, query) > ($2, $3) ORDER BY created_at, query LIMIT $4",
+                    self.started_at, *self.cursor, self.batch_size,
+                )
+            if not batch:
+                break
+            await self._process([entry["query"] for entry in batch])
+            await self.client.track_cache.flush()
+            self.cursor = (batch[-1]["created_at"], batch[-1]["query"])
+            await self._checkpoint()
+        async with self.bot.mbdb.acquire() as con:
+            await con.execute("DELETE FROM music_cache_rebuild WHERE id=1")
+
+
+class MBNodeManager(NodeManager):
+    def find_ideal_node(self, region: str = None) -> Optional[Node]:
+        return self._lavalink.select_node()
 
 
 class MBClient(Client):
@@ -21,31 +148,69 @@ class MBClient(Client):
 
         self._user_id = str(user_id)
         self.bot = bot
-        self.node_manager = NodeManager(self, regions)
+        self.node_manager = MBNodeManager(self, regions)
         self.player_manager = PlayerManager(self, player)
+        self.track_cache = TrackCache(bot)
+        self.rebuild: Optional[CacheRebuild] = None
         self._connect_back = connect_back
         self._logger = logging.getLogger('lavalink')
 
         self._session = aiohttp.ClientSession(
             timeout=aiohttp.ClientTimeout(total=None)
         )
+        self.migrations = 0
+        self.rebalance_loop.start()
 
-    async def __get_tracks(self, query: str, guild_id: int) -> Dict:
-        current_timestamp = int(datetime.now().timestamp())
-        res = await self.get_tracks(query, node=None)
-        res_present = res and res.get("tracks")
-        if res_present and res.get("loadType") != "PLAYLIST_LOADED":
-            res["tracks"] = [res["tracks"][0]]
-        data = json.dumps({
-            "data": res if res_present else None,
-            "timestamp": current_timestamp,
-            "cached_in": guild_id,
-            "expire_at": -1 if res_present else current_timestamp + 86400
-        })
-        async with self.bot.mbdb.acquire() as con:
-            await con.execute(
-                f"INSERT INTO music_cache(query, data) VALUES($query${query}$query$, $dt${data}$dt$)"
-            )
+    @staticmethod
+    def _frame_penalty(node: Node) -> float:
+        if not node.stats:
+            return 0
+        return node.stats.penalty.null_frame_penalty + node.stats.penalty.deficit_frame_penalty
+
+    def is_healthy(self, node: Node) -> bool:
+        if not node.available:
+            return False
+        if not node.stats:
+            return True
+        return node.stats.system_load < _MAX_SYSTEM_LOAD and self._frame_penalty(node) < _MAX_FRAME_PENALTY
+
+    def node_score(self, node: Node) -> float:
+        # Stats only arrive once a minute, so the live player count stands in for the reported one
+        players = len([player for player in node.players if player.is_playing]) + 0.25 * len(node.players)
+        if not node.stats:
+            return players
+        return players + node.stats.penalty.cpu_penalty + self._frame_penalty(node)
+
+    def select_node(self, exclude: Node = None) -> Optional[Node]:
+        nodes = [node for node in self.node_manager.available_nodes if node is not exclude]
+        healthy = [node for node in nodes if self.is_healthy(node)]
+        return min(healthy or nodes, key=self.node_score, default=None)
+
+    @tasks.loop(seconds=30)
+    async def rebalance_loop(self) -> None:
+        moved = 0
+        for node in self.node_manager.nodes:
+            if not node.available or self.is_healthy(node):
+                continue
+            for player in node.players:
+                if moved >= _MIGRATIONS_PER_TICK:
+                    return
+                target = self.select_node(exclude=node)
+                if not target or not self.is_healthy(target) or self.node_score(target) >= self.node_score(node):
+                    break
+                try:
+                    await player.change_node(target)
+                except Exception:
+                    continue
+                moved += 1
+                self.migrations += 1
+
+    def node_status(self) -> str:
+        return "\n".join(
+            f"**{node.name}:** {'Healthy' if self.is_healthy(node) else 'Degraded' if node.available else 'Disconnected'}"
+            f" - {len(node.players)} player{'s' if len(node.players) != 1 else ''}, score {self.node_score(node):.2f}"
+            for node in self.node_manager.nodes
+        ) or "No nodes registered"
 
     @staticmethod
     def _handle_task_result(task: asyncio.Task):
@@ -54,11 +219,28 @@ class MBClient(Client):
         except Exception:
             pass
 
-    async def efficient_cache_rebuild(self, guild_id: int, future: asyncio.Future):
-        loop = self.bot.loop
+    def _rebuild_done(self, task: asyncio.Task) -> None:
+        self._handle_task_result(task)
+        if self.rebuild and self.rebuild.task is task:
+            self.rebuild = None
+
+    def _start_rebuild(self, rebuild: CacheRebuild) -> CacheRebuild:
+        self.rebuild = rebuild
+        rebuild.start().add_done_callback(self._rebuild_done)
+        return rebuild
+
+    async def resume_cache_rebuild(self) -> Optional[CacheRebuild]:
         async with self.bot.mbdb.acquire() as con:
-            entries = await con.fetch("SELECT * FROM music_cache")
-        for entry in entries:
-            task = loop.create_task(self.__get_tracks(entry["query"], guild_id))
-            task.add_done_callback(self._handle_task_result)
-        future.set_result(True)
+            await con.execute("CREATE TABLE IF NOT EXISTS music_cache_rebuild(id smallint PRIMARY KEY, guild_id bigint, "
+                              "missing_only boolean, started_at bigint, cursor_created_at bigint, cursor_query text, "
+                              "processed integer, failed integer, total integer)")
+            checkpoint = await con.fetchrow("SELECT guild_id, missing_only, started_at, cursor_created_at, cursor_query, "
+                                            "processed, failed, total FROM music_cache_rebuild WHERE id=1")
+        if checkpoint and not self.rebuild:
+            return self._start_rebuild(CacheRebuild(self, **dict(checkpoint)))
+        return self.rebuild
+
+    async def efficient_cache_rebuild(self, guild_id: int, missing_only: bool = False) -> CacheRebuild:
+        if self.rebuild:
+            return self.rebuild
+        return self._start_rebuild(CacheRebuild(self, guild_id, missing_only=missing_only))
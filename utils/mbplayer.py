@@ -1,11 +1,14 @@
 import asyncio
+import codecs
 import json
 import os
-import pickle
 import re
+import struct
+import time
+import zlib
 from collections import deque
 from datetime import datetime
-from typing import Deque, Dict, List, Union
+from typing import AsyncIterator, Deque, Dict, List, Union
 
 import discord
 from aiofile import async_open
@@ -13,12 +16,171 @@ from discord.ext.commands.bot import AutoShardedBot
 from lavalink.events import QueueEndEvent, TrackStartEvent
 from lavalink.models import AudioTrack, DefaultPlayer
 
+from .trackcache import CacheRow, pack_result, unpack_row
+
 url_rx = re.compile(r'https?://(?:www\.)?.+')
 
 BLUE = discord.Color.blue()
 RED = discord.Color.dark_red()
 
 
+_MBC_MAGIC = b"MBCACHE"
+_MBC_VERSION = 1
+_FRAME = struct.Struct(">I")
+_CHUNK_SIZE = 500
+_EXPORT_FORMATS = ["mbc", "json"]
+_READ_SIZE = 1 << 16
+
+
+class MBCFormatError(Exception):
+    pass
+
+
+class _MBCWriter:
+    def __init__(self, file) -> None:
+        self.file = file
+        self.rows: List[CacheRow] = []
+
+    async def start(self) -> None:
+        await self.file.write(_MBC_MAGIC + bytes([_MBC_VERSION]))
+
+    async def _write_frame(self) -> None:
+        payload = zlib.compress(json.dumps(self.rows, separators=(",", ":")).encode())
+        await self.file.write(_FRAME.pack(len(payload)) + payload)
+        self.rows.clear()
+
+    async def write(self, row: CacheRow) -> None:
+        self.rows.append(row)
+        if len(self.rows) >= _CHUNK_SIZE:
+            await self._write_frame()
+
+    async def finish(self) -> None:
+        if self.rows:
+            await self._write_frame()
+        await self.file.write(_FRAME.pack(0))
+
+
+class _JSONWriter:
+    def __init__(self, file) -> None:
+        self.file = file
+        self.separator = b""
+
+    async def start(self) -> None:
+        await self.file.write(b"{")
+
+    async def write(self, row: CacheRow) -> None:
+        entry = json.dumps({row.query: dict(zip(CacheRow._fields[1:], row[1:]))})[1:-1]
+        await self.file.write(self.separator + entry.encode())
+        self.separator = b","
+
+    async def finish(self) -> None:
+        await self.file.write(b"}")
+
+
+async def _read_mbc(file) -> AsyncIterator[List[CacheRow]]:
+    header = await file.read(len(_MBC_MAGIC) + 1)
+    if header[:-1] != _MBC_MAGIC:
+        raise MBCFormatError("is not a music cache export")
+    if header[-1] != _MBC_VERSION:
+        raise MBCFormatError(f"uses unsupported format version {header[-1]}")
+    while True:
+        size = await file.read(_FRAME.size)
+        if len(size) != _FRAME.size:
+            raise MBCFormatError("is truncated")
+        size, = _FRAME.unpack(size)
+        if not size:
+            return
+        payload = await file.read(size)
+        if len(payload) != size:
+            raise MBCFormatError("is truncated")
+        yield [CacheRow(*row) for row in json.loads(zlib.decompress(payload))]
+
+
+class _JSONReader:
+    _decoder = json.JSONDecoder()
+
+    def __init__(self, file) -> None:
+        self.file = file
+        self.utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    async def _fill(self) -> None:
+        if self.eof:
+            raise MBCFormatError("is truncated")
+        chunk = await self.file.read(_READ_SIZE)
+        self.eof = not chunk
+        try:
+            self.buffer = self.buffer[self.pos:] + self.utf8.decode(chunk, final=self.eof)
+        except UnicodeDecodeError:
+            raise MBCFormatError("is not valid UTF-8")
+        self.pos = 0
+
+    def _skip(self) -> bool:
+        while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+            self.pos += 1
+        return self.pos < len(self.buffer)
+
+    async def char(self) -> str:
+        while not self._skip():
+            await self._fill()
+        char = self.buffer[self.pos]
+        self.pos += 1
+        return char
+
+    async def value(self):
+        while True:
+            self._skip()
+            try:
+                value, end = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise MBCFormatError("is not valid JSON")
+                await self._fill()
+                continue
+            # A value that ends exactly at the buffer edge may be cut short (e.g. a number)
+            if end < len(self.buffer) or self.eof:
+                self.pos = end
+                return value
+            await self._fill()
+
+
+async def _read_json(file) -> AsyncIterator[List[CacheRow]]:
+    reader = _JSONReader(file)
+    if await reader.char() != "{":
+        raise MBCFormatError("is not a JSON object")
+    rows: List[CacheRow] = []
+    separator = await reader.char()
+    if separator != "}":
+        reader.pos -= 1
+    while separator != "}":
+        query = await reader.value()
+        if not isinstance(query, str) or await reader.char() != ":":
+            raise MBCFormatError("is not valid JSON")
+        try:
+            rows.append(_row_from_export(query, await reader.value()))
+        except (AttributeError, TypeError, ValueError):
+            raise MBCFormatError(f"has an invalid entry for {query}")
+        if len(rows) >= _CHUNK_SIZE:
+            yield rows
+            rows = []
+        separator = await reader.char()
+        if separator not in ",}":
+            raise MBCFormatError("is not valid JSON")
+    if rows:
+        yield rows
+
+
+def _row_from_export(query: str, data: Union[Dict, str]) -> CacheRow:
+    if isinstance(data, str):
+        data = json.loads(data)
+    if "load_type" in data:
+        return CacheRow(query, *(data.get(column) for column in CacheRow._fields[1:]))
+    row = pack_result(query, data.get("data"), data.get("cached_in"), data.get("timestamp"))
+    return row._replace(expire_at=data.get("expire_at", row.expire_at))
+
+
 class MBPlayer(DefaultPlayer):
     def __init__(self, guild_id, node):
         super(MBPlayer, self).__init__(guild_id, node)
@@ -143,23 +305,9 @@ class MBPlayer(DefaultPlayer):
 
     async def get_tracks(self, query: str, force_recache: bool = False) -> Dict:
         await self._bot_future
-        current_timestamp = int(datetime.now().timestamp())
-        async with self.bot.mbdb.acquire() as con:
-            data = await con.fetchval(f"SELECT data FROM music_cache WHERE query=$query${query}$query$")
-            if force_recache or data is None:
-                res = await self.node.get_tracks(query)
-                res_present = res and res.get("tracks")
-                if res_present and res.get("loadType") != "PLAYLIST_LOADED":
-                    res["tracks"] = [res["tracks"][0]]
-                data = json.dumps({
-                    "data": res if res_present else None,
-                    "timestamp": current_timestamp,
-                    "cached_in": self.guild_id,
-                    "expire_at": -1 if res_present else current_timestamp + 86400
-                })
-                if not "https://www.twitch.tv/" in query:
-                    await con.execute(f"INSERT INTO music_cache(query, data) VALUES ($query${query}$query$, $dt${data}$dt$) ON CONFLICT (query) DO NOTHING")
-        return json.loads(data)["data"]
+        return await self.bot.lavalink.track_cache.get_tracks(
+            query, self.node, guild_id=self.guild_id, force_recache=force_recache
+        )
 
     async def get_all_tracks(self, query: str) -> Union[Dict, None]:
         await self._bot_future
@@ -167,81 +315,94 @@ class MBPlayer(DefaultPlayer):
         return res if res and res.get("tracks") else None
 
     @staticmethod
-    async def export_cache(bot: AutoShardedBot, query: str = None, format: str = "json") -> discord.Embed:
+    async def export_cache(bot: AutoShardedBot, query: str = None, format: str = "mbc") -> discord.Embed:
         embed = discord.Embed(title=f"Cache Export - {format.upper()}", color=BLUE)
-        async with bot.mbdb.acquire() as con:
-            if query is None:
-                entries = await con.fetch("SELECT * FROM music_cache")
-            else:
-                entries = await con.fetchrow(f"SELECT * FROM music_cache WHERE query=$query${query if url_rx.match(query) else f'ytsearch:{query}'}$query$")
-        base = os.getenv("MBC_LOCATION")
-        filename = f"MBC_{f'query:{query}_' if query else ''}{int(datetime.now().timestamp())}"
-        if not entries:
-            embed.description = f"The query `{query}` is not in cache" if query is not None else "The cache has not been built"
+        if format not in _EXPORT_FORMATS:
+            embed.description = f"`{format}` is an unsupported format"
             embed.color = RED
             return embed
-        elif not isinstance(entries, List):
-            entries = [entries]
-
-        export_cache = {_query: data for _query, data in [(entry["query"], entry["data"]) for entry in entries]}
 
+        base = os.getenv("MBC_LOCATION")
+        filename = f"MBC_{f'query:{query}_' if query else ''}{int(datetime.now().timestamp())}.{format}"
         if not os.path.exists(os.path.abspath(base)):
             os.mkdir(os.path.abspath(base))
-
-        files = os.listdir(os.path.abspath(f"{base}"))
+        files = sorted(os.listdir(os.path.abspath(base)))
         while len(files) >= 20:
-            file = [name for name in sorted([name.replace(".json", "").replace(".mbcache", "") for name in files])][0]
-            if os.path.exists(f"{base}{file}.json"):
-                os.remove(f"{base}{file}.json")
-            else:
-                os.remove(f"{base}{file}.mbcache")
-            files = os.listdir(os.path.abspath(f"{base}"))
-
-        if format == "json":
-            async with async_open(os.path.abspath(f"{base}{filename}.json"), "wb") as jsonfile:
-                await jsonfile.write(json.dumps(export_cache).encode())
-            embed.description = f"The cache for `{query}` has been exported" if query is not None else "The cache has been exported"
-            embed.description += f" as ```{filename}.json```"
-        elif format == "pickle":
-            async with async_open(os.path.abspath(f"{base}{filename}.mbcache"), "wb") as picklefile:
-                await picklefile.write(pickle.dumps(export_cache, protocol=pickle.HIGHEST_PROTOCOL))
-            embed.description = f"The cache for `{query}` has been exported" if query is not None else "The cache has been exported"
-            embed.description += f" as ```{filename}.mbcache```"
-        else:
-            embed.description = f"`{format}` is an unsupported format"
+            os.remove(os.path.abspath(f"{base}/{files.pop(0)}"))
+
+        await bot.lavalink.track_cache.flush()
+        sql = f"SELECT {', '.join(CacheRow._fields)} FROM music_cache"
+        args = []
+        if query is not None:
+            sql += " WHERE query=$1"
+            args.append(query if url_rx.match(query) else f"ytsearch:{query}")
+        path = os.path.abspath(f"{base}/{filename}")
+        start = time.perf_counter()
+        count = 0
+        async with bot.mbdb.acquire() as con:
+            async with con.transaction():
+                async with async_open(path, "wb") as export:
+                    writer = _MBCWriter(export) if format == "mbc" else _JSONWriter(export)
+                    await writer.start()
+                    async for record in con.cursor(sql, *args, prefetch=_CHUNK_SIZE):
+                        await writer.write(CacheRow(*record))
+                        count += 1
+                    await writer.finish()
+        elapsed = time.perf_counter() - start
+
+        if not count:
+            os.remove(path)
+            embed.description = f"The query `{query}` is not in cache" if query is not None else "The cache has not been built"
             embed.color = RED
+            return embed
+        embed.description = f"The cache for `{query}` has been exported" if query is not None else "The cache has been exported"
+        embed.description += f" as ```{filename}```"
+        embed.set_footer(text=f"{count} row{'s' if count != 1 else ''} in {elapsed:.2f}s ≈ {count / max(elapsed, 1e-6):.0f} rows/s")
         return embed
 
     @staticmethod
     async def restore_cache(bot: AutoShardedBot, filename: str, type: str = "restore") -> discord.Embed:
         embed = discord.Embed(title=f"Cache {type.title()} ", color=BLUE)
         cache_path = os.getenv("MBC_LOCATION")
+        start = time.perf_counter()
+        count = 0
         try:
+            if type.lower() not in ["restore", "merge"]:
+                raise ValueError(f"{type} is an invalid type")
+            if filename.lower().endswith(".mbc"):
+                reader = _read_mbc
+            elif filename.lower().endswith(".json"):
+                reader = _read_json
+            else:
+                raise FileNotFoundError
             async with async_open(os.path.abspath(f"{cache_path}/{filename}"), "rb") as backup:
-                if filename.lower().endswith(".json"):
-                    bak: dict = json.loads(await backup.read())
-                elif filename.lower().endswith(".mbcache"):
-                    bak: dict = pickle.loads(await backup.read())
-                else:
-                    raise FileNotFoundError
-
                 async with bot.mbdb.acquire() as con:
-                    if type.lower() == "restore":
-                        await con.execute("TRUNCATE music_cache")
-                    elif type.lower() == "merge":
-                        pass
-                    else:
-                        raise ValueError(f"{type} is an invalid type")
-
-                    values = ", ".join([f"($query${query}$query$, $dt${data}$dt$)" for query, data in bak.items()])
-                    await con.execute(f"INSERT INTO music_cache(query, data) VALUES {values} ON CONFLICT (query) DO NOTHING")
+                    async with con.transaction():
+                        await con.execute("CREATE TEMPORARY TABLE music_cache_import "
+                                          "(LIKE music_cache INCLUDING DEFAULTS) ON COMMIT DROP")
+                        if type.lower() == "restore":
+                            await con.execute("TRUNCATE music_cache")
+                        async for chunk in reader(backup):
+                            await con.copy_records_to_table("music_cache_import", records=chunk,
+                                                            columns=CacheRow._fields)
+                            await con.execute(f"INSERT INTO music_cache SELECT * FROM music_cache_import "
+                                              "ON CONFLICT (query) DO NOTHING")
+                            await con.execute("TRUNCATE music_cache_import")
+                            count += len(chunk)
+            if type.lower() == "restore":
+                bot.lavalink.track_cache.clear()
+            elapsed = time.perf_counter() - start
             embed.description = f"The cache's state was successfully {type}d from the file ```{filename}```"
+            embed.set_footer(text=f"{count} row{'s' if count != 1 else ''} in {elapsed:.2f}s ≈ {count / max(elapsed, 1e-6):.0f} rows/s")
         except FileNotFoundError:
             embed.description = f"The cache's state was not {type}d. No cache export exists in the musiccache folder with the filename ```{filename}```"
             embed.color = RED
         except ValueError:
             embed.description = f"{type} is an invalid type"
             embed.color = RED
+        except MBCFormatError as e:
+            embed.description = f"The cache's state was not {type}d. ```{filename}``` {e}"
+            embed.color = RED
         return embed
 
     @staticmethod
@@ -251,14 +412,16 @@ class MBPlayer(DefaultPlayer):
         async with bot.mbdb.acquire() as con:
             if clear_all:
                 await con.execute("TRUNCATE music_cache")
+                bot.lavalink.track_cache.clear()
                 embed.title = "Cache Cleared"
-                embed.description = "The cache has been cleared. A backup has been made in PICKLE format"
+                embed.description = "The cache has been cleared. A backup has been made in MBC format"
             else:
                 entry = await con.fetchval(f"SELECT query FROM music_cache WHERE query=$query${new_query}$query$")
                 if entry:
                     embed.title += "Evicted"
                     embed.description = f"The query `{query}` has been evicted from UconnSmashBot's global cache"
                     await con.execute(f"DELETE FROM music_cache WHERE query=$query${new_query}$query$")
+                    bot.lavalink.track_cache.evict(new_query)
                 else:
                     embed.title += "Not Found"
                     embed.description = f"The query `{query}` could not be found in the cache"
@@ -268,65 +431,61 @@ class MBPlayer(DefaultPlayer):
     @staticmethod
     async def get_cache_info(bot: AutoShardedBot, query: str = None) -> discord.Embed:
         embed = discord.Embed(title="Lavalink Cache Info", color=BLUE)
-        current_timestamp = int(datetime.now().timestamp())
-        async with bot.mbdb.acquire() as con:
-            if query is None:
-                entries = await con.fetch("SELECT * FROM music_cache")
-                if len(entries) == 0:
-                    embed.description = "The cache has not been built"
-                    embed.color = RED
-                else:
-                    cache_size = len(entries)
-                    data = {
-                        key: json.loads(value) for key, value in [(entry["query"], entry["data"]) for entry in entries]
-                    }
-                    none_queries = [entry for _, entry in data.items() if entry.get("data", None) is None]
-                    valid_size = cache_size - len(none_queries)
-                    expired_size = len([entry for entry in none_queries if entry["expire_at"] <= current_timestamp])
-                    embed.description = "\n".join([
-                        f"**Size:** {cache_size} quer{'ies' if cache_size != 1 else 'y'}",
-                        f"**Valid Queries:** {valid_size} quer{'ies' if valid_size != 1 else 'y'} ≈ {(100 * valid_size / cache_size):.2f}%",
-                        f"**Expired:** {expired_size} quer{'ies' if expired_size != 1 else 'y'} ≈ {(100 * expired_size / cache_size):.2f}%",
-                    ])
+        if query is None:
+            cache_size, valid_size, expired_size = await bot.lavalink.track_cache.get_info()
+            if cache_size == 0:
+                embed.description = "The cache has not been built"
+                embed.color = RED
             else:
-                new_query = "ytsearch:" + query if not url_rx.match(query) else query
-                entry = await con.fetchrow(f"SELECT * FROM music_cache WHERE query=$query${new_query}$query$")
-                if entry is None:
-                    embed.title = "Invalid Query"
-                    embed.description = f"The query `{query}` could not be found in the cache"
-                    embed.color = RED
-                else:
-                    data = json.loads(entry["data"])
-                    load_type = data.get("loadType") if data else "NO_MATCHES"
-                    query_type = {
-                        "TRACK_LOADED": "Direct Track URL",
-                        "PLAYLIST_LOADED": "Direct Playlist URL",
-                        "SEARCH_RESULT": "Successful YouTube / SoundCloud Query",
-                        "NO_MATCHES": "Failed YouTube / SoundCloud Query",
-                        "LOAD_FAILED": "Error Occurred During Loading",
-                    }.get(load_type, "No Info")
-                    timestamp = datetime.fromtimestamp(entry["timestamp"]).strftime('%m/%d/%Y %H:%M:%S')
-                    expire_at = "Never" if entry["expire_at"] == - \
-                        1 else datetime.fromtimestamp(entry["expire_at"]).strftime('%m/%d/%Y %H:%M:%S')
-                    embed.title += f" - {query}"
-                    embed.description = "\n".join([
-                        f"**Result:** {query_type}",
-                        f"**Cached On:** {timestamp}",
-                        f"**Expires:** {expire_at}",
+                embed.description = "\n".join([
+                    f"**Size:** {cache_size} quer{'ies' if cache_size != 1 else 'y'}",
+                    f"**Valid Queries:** {valid_size} quer{'ies' if valid_size != 1 else 'y'} ≈ {(100 * valid_size / cache_size):.2f}%",
+                    f"**Expired:** {expired_size} quer{'ies' if expired_size != 1 else 'y'} ≈ {(100 * expired_size / cache_size):.2f}%",
+                ])
+            embed.add_field(name="In-Memory Cache", value=bot.lavalink.track_cache.stats(), inline=False)
+            embed.add_field(name="Lavalink Nodes", value=bot.lavalink.node_status(), inline=False)
+            if bot.lavalink.rebuild:
+                embed.add_field(name="Cache Rebuild", value=bot.lavalink.rebuild.status(), inline=False)
+        else:
+            new_query = "ytsearch:" + query if not url_rx.match(query) else query
+            async with bot.mbdb.acquire() as con:
+                entry = await con.fetchrow(f"SELECT {', '.join(CacheRow._fields)} FROM music_cache WHERE query=$1", new_query)
+            if entry is None:
+                embed.title = "Invalid Query"
+                embed.description = f"The query `{query}` could not be found in the cache"
+                embed.color = RED
+            else:
+                row = CacheRow(*entry)
+                data = unpack_row(row)
+                load_type = row.load_type
+                query_type = {
+                    "TRACK_LOADED": "Direct Track URL",
+                    "PLAYLIST_LOADED": "Direct Playlist URL",
+                    "SEARCH_RESULT": "Successful YouTube / SoundCloud Query",
+                    "NO_MATCHES": "Failed YouTube / SoundCloud Query",
+                    "LOAD_FAILED": "Error Occurred During Loading",
+                }.get(load_type, "No Info")
+                timestamp = datetime.fromtimestamp(row.created_at).strftime('%m/%d/%Y %H:%M:%S')
+                expire_at = "Never" if row.expire_at == -1 else datetime.fromtimestamp(row.expire_at).strftime('%m/%d/%Y %H:%M:%S')
+                embed.title += f" - {query}"
+                embed.description = "\n".join([
+                    f"**Result:** {query_type}",
+                    f"**Cached On:** {timestamp}",
+                    f"**Expires:** {expire_at}",
+                ])
+                if data is not None and load_type in ["TRACK_LOADED", "SEARCH_RESULT"]:
+                    from .musicutils import (_get_track_thumbnail,
+                                             track_duration)
+                    track = AudioTrack(data["tracks"][0], 0)
+                    embed.description += "\n\n" + "\n".join([
+                        f"**Video:** [{track.title}]({track.uri})",
+                        f"**Author:** {track.author}",
+                        f"**Duration:** {track_duration(track.duration)}",
+                        f"**Seek Compatible:** {'Yes' if track.is_seekable else 'No'}"
                     ])
-                    if data is not None and load_type in ["TRACK_LOADED", "SEARCH_RESULT"]:
-                        from .musicutils import (_get_track_thumbnail,
-                                                 track_duration)
-                        track = AudioTrack(data["tracks"][0], 0)
-                        embed.description += "\n\n" + "\n".join([
-                            f"**Video:** [{track.title}]({track.uri})",
-                            f"**Author:** {track.author}",
-                            f"**Duration:** {track_duration(track.duration)}",
-                            f"**Seek Compatible:** {'Yes' if track.is_seekable else 'No'}"
-                        ])
-                        embed.set_image(
-                            url=_get_track_thumbnail(track)
-                        )
+                    embed.set_image(
+                        url=_get_track_thumbnail(track)
+                    )
         return embed
 
     async def seek(self, millisecond_amount: int, sign: str = None) -> Union[int, str]:
@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+import discord
+from discord.ext import tasks
+from discord.ext.commands import AutoShardedBot
+
+
+__all__ = (
+    "JournalEntry",
+    "MessageJournal",
+)
+
+
+class JournalEntry(NamedTuple):
+    message_id: int
+    guild_id: int
+    channel_id: int
+    author_id: int
+    content: str
+    created_at: int
+
+
+class MessageJournal:
+    def __init__(self, bot: AutoShardedBot, path: str = None, ttl: int = None, max_rows: int = None,
+                 flush_size: int = 100) -> None:
+        self.bot = bot
+        self.path = path or os.getenv("LOG_JOURNAL_PATH", "message_journal.sqlite3")
+        self.ttl = ttl or int(os.getenv("LOG_JOURNAL_TTL", 604800))
+        self.max_rows = max_rows or int(os.getenv("LOG_JOURNAL_MAX_ROWS", 10000))
+        self.flush_size = flush_size
+        self._pending: Dict[int, JournalEntry] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="message_journal")
+        self._con: sqlite3.Connection = None
+        self._ready = self._run(self._open)
+
+    def _run(self, func, *args) -> asyncio.Future:
+        return self.bot.loop.run_in_executor(self._executor, func, *args)
+
+    def _open(self) -> None:
+        self._con = sqlite3.connect(self.path, check_same_thread=False)
+        self._con.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        self._con.execute("PRAGMA journal_mode=WAL")
+        self._con.execute("PRAGMA cache_size=-8192")
+        self._con.execute("CREATE TABLE IF NOT EXISTS messages(message_id INTEGER PRIMARY KEY, guild_id INTEGER, "
+                          "channel_id INTEGER, author_id INTEGER, content TEXT, created_at INTEGER)")
+        self._con.execute("CREATE INDEX IF NOT EXISTS messages_created_at_idx ON messages(created_at)")
+        self._con.execute("CREATE INDEX IF NOT EXISTS messages_guild_idx ON messages(guild_id, message_id)")
+        self._con.commit()
+
+    def _write(self, entries: List[JournalEntry]) -> None:
+        self._con.executemany("INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?, ?)", entries)
+        self._con.commit()
+
+    def _get(self, message_id: int) -> Optional[JournalEntry]:
+        row = self._con.execute("SELECT * FROM messages WHERE message_id=?", (message_id,)).fetchone()
+        return JournalEntry(*row) if row else None
+
+    def _delete(self, message_id: int) -> None:
+        self._con.execute("DELETE FROM messages WHERE message_id=?", (message_id,))
+        self._con.commit()
+
+    def _compact(self, expire_before: int) -> int:
+        removed = self._con.execute("DELETE FROM messages WHERE created_at < ?", (expire_before,)).rowcount
+        guilds = self._con.execute("SELECT guild_id FROM messages GROUP BY guild_id HAVING COUNT(*) > ?",
+                                   (self.max_rows,)).fetchall()
+        for guild_id, in guilds:
+            removed += self._con.execute(
+                "DELETE FROM messages WHERE guild_id=? AND message_id < (SELECT message_id FROM messages "
+                "WHERE guild_id=? ORDER BY message_id DESC LIMIT 1 OFFSET ?)",
+                (guild_id, guild_id, self.max_rows - 1),
+            ).rowcount
+        self._con.commit()
+        self._con.execute("PRAGMA incremental_vacuum")
+        return removed
+
+    async def flush(self) -> None:
+        if self._pending:
+            entries, self._pending = list(self._pending.values()), {}
+            await self._ready
+            await self._run(self._write, entries)
+
+    def record(self, message: discord.Message, content: str = None) -> None:
+        self._pending[message.id] = JournalEntry(
+            message.id,
+            message.guild.id,
+            message.channel.id,
+            message.author.id,
+            message.content if content is None else content,
+            int(message.created_at.timestamp()),
+        )
+        if len(self._pending) >= self.flush_size:
+            self.bot.loop.create_task(self.flush())
+
+    async def update(self, message_id: int, content: str) -> Optional[JournalEntry]:
+        before = await self.get(message_id)
+        if before:
+            self._pending[message_id] = before._replace(content=content)
+        return before
+
+    async def get(self, message_id: int) -> Optional[JournalEntry]:
+        entry = self._pending.get(message_id)
+        if entry:
+            return entry
+        await self._ready
+        return await self._run(self._get, message_id)
+
+    async def pop(self, message_id: int) -> Optional[JournalEntry]:
+        entry = self._pending.pop(message_id, None)
+        await self._ready
+        stored = await self._run(self._get, message_id)
+        if stored:
+            await self._run(self._delete, message_id)
+        return entry or stored
+
+    async def compact(self) -> int:
+        await self.flush()
+        return await self._run(self._compact, int(datetime.now().timestamp()) - self.ttl)
+
+    @tasks.loop(seconds=5)
+    async def flush_loop(self) -> None:
+        try:
+            await self.flush()
+        except sqlite3.Error:
+            pass
+
+    @tasks.loop(hours=1)
+    async def compact_loop(self) -> None:
+        try:
+            await self.compact()
+        except sqlite3.Error:
+            pass
+
+    def start(self) -> None:
+        self.flush_loop.start()
+        self.compact_loop.start()
+
+    async def close(self) -> None:
+        self.flush_loop.cancel()
+        self.compact_loop.cancel()
+        await self.flush()
+        await self._run(self._con.close)
+        self._executor.shutdown(wait=False)
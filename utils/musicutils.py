@@ -1,8 +1,10 @@
 import asyncio
 import functools
+import os
 import re
+from contextlib import suppress
 from math import ceil
-from typing import List, NamedTuple, Tuple, Union
+from typing import Awaitable, Callable, List, NamedTuple, Optional, Tuple, Union
 
 import discord
 import lavalink
@@ -55,6 +57,8 @@ opp_source = {
     "yt": "sc",
     "sc": "yt",
 }
+HYDRATE_WORKERS = int(os.getenv("PLAYLIST_HYDRATE_WORKERS", 8))
+PROGRESS_INTERVAL = 2
 
 
 class Playlist(NamedTuple):
@@ -244,10 +248,7 @@ async def track_hook(self, event: lavalink.events.Event):
 
 
 def get_player(bot: AutoShardedBot, ctx: Context, guild: discord.Guild = None) -> MBPlayer:
-    player: MBPlayer = bot.lavalink.player_manager.create(
-        ctx.guild.id if ctx else guild.id,
-        endpoint=str(ctx.guild.region if ctx else guild.region)
-    )
+    player: MBPlayer = bot.lavalink.player_manager.create(ctx.guild.id if ctx else guild.id)
     player.set_bot(bot)
     return player
 
@@ -386,6 +387,40 @@ def _handle_task_result(task: asyncio.Task) -> None:
         pass
 
 
+async def _hydrate(urls: List[str],
+                   resolve: Callable[[str], Awaitable[Optional[dict]]],
+                   on_ready: Callable[[int, Optional[dict]], None] = None,
+                   workers: int = HYDRATE_WORKERS) -> List[Optional[dict]]:
+    results: List[Optional[dict]] = [None] * len(urls)
+    finished = [False] * len(urls)
+    pending = iter(enumerate(urls))
+    cursor = 0
+
+    async def worker() -> None:
+        nonlocal cursor
+        for index, url in pending:
+            try:
+                results[index] = await resolve(url)
+            except Exception:
+                results[index] = None
+            finished[index] = True
+            while cursor < len(urls) and finished[cursor]:
+                if on_ready:
+                    on_ready(cursor, results[cursor])
+                cursor += 1
+
+    await asyncio.gather(*(worker() for _ in range(min(workers, len(urls)))))
+    return results
+
+
+async def _report_progress(message: discord.Message, embed: discord.Embed, progress: List[int], total: int) -> None:
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        embed.description = f"Resolved {progress[0]}/{total} track{'s' if total != 1 else ''}. Please be patient..."
+        with suppress(NotFound, Forbidden, HTTPException):
+            await message.edit(embed=embed)
+
+
 def _get_estimated_time_till_play(player: MBPlayer, track: AudioTrack) -> str:
     if len(player.queue) <= 1:
         if player.current:
@@ -621,12 +656,13 @@ async def _check_urls(bot: AutoShardedBot, ctx: Context, urls: List[str]) -> Lis
         for url in urls:
             if not url_rx.match(url):
                 raise InvalidURL(url=url)
+
+        async def resolve(url: str) -> Optional[dict]:
             if "open.spotify.com" in url:
-                results = await _parse_spotify(bot, player, url)
-            else:
-                task = bot.loop.create_task(player.get_tracks(url))
-                task.add_done_callback(_handle_task_result)
-                results = await task
+                return await _parse_spotify(bot, player, url)
+            return await player.get_tracks(url)
+
+        for results in await _hydrate(urls, resolve):
             if not results:
                 continue
             elif results["loadType"] == "TRACK_LOADED":
@@ -655,8 +691,7 @@ async def _check_ownership(bot: AutoShardedBot, ctx: Context, id: int) -> None:
 async def _extract_playlist_urls(bot: AutoShardedBot, ctx: Context, urls: List[str]) -> List[AudioTrack]:
     player = get_player(bot, ctx)
     ret = []
-    for url in urls:
-        results = await player.get_tracks(url)
+    for results in await _hydrate(urls, player.get_tracks):
         if not results or not results["tracks"]:
             continue
         elif not results["loadType"] == "PLAYLIST_LOADED":
@@ -768,14 +803,30 @@ async def play_or_queue_playlist(bot: AutoShardedBot,
     successful = []
     failed = []
     queue = player.queue
-    for url in playlist.urls:
-        results = await player.get_tracks(url)
+    progress = [0]
+    started = []
+
+    def on_ready(index: int, results: Optional[dict]) -> None:
+        progress[0] += 1
         if not results:
-            failed.append(url)
-        else:
-            track = AudioTrack(results['tracks'][0], ctx.author.id)
-            queue.append(track)
-            successful.append(track)
+            failed.append(playlist.urls[index])
+            return
+        track = AudioTrack(results['tracks'][0], ctx.author.id)
+        queue.append(track)
+        successful.append(track)
+        if play and not started and not player.is_playing:
+            task = bot.loop.create_task(player.play())
+            task.add_done_callback(_handle_task_result)
+            started.append(task)
+
+    reporter = bot.loop.create_task(
+        _report_progress(queue_message, queue_embed, progress, len(playlist.urls))
+    ) if queue_message else None
+    try:
+        await _hydrate(playlist.urls, player.get_tracks, on_ready=on_ready)
+    finally:
+        if reporter:
+            reporter.cancel()
 
     embed = discord.Embed(color=BLUE)
     if len(failed) == len(playlist.urls):
@@ -814,22 +865,21 @@ async def play_or_queue_playlist(bot: AutoShardedBot,
         else:
             await queue_message.edit(embed=embed)
 
-    if play and not player.is_playing:
+    if play and not started and not player.is_playing:
         await player.play()
     return
 
 
 async def _get_playlist_tracks_data(bot: AutoShardedBot, player: MBPlayer, entries: List) -> List[List[AudioTrack]]:
-    ret = []
-    for record in entries:
-        intermediate = []
-        for url in record["urls"]:
-            task = bot.loop.create_task(player.get_tracks(url))
-            task.add_done_callback(_handle_task_result)
-            results = await task
-            intermediate.append(AudioTrack(results["tracks"][0], record["user_id"]) if results else None)
-        ret.append(intermediate)
-    return ret
+    urls = [url for record in entries for url in record["urls"]]
+    results = iter(await _hydrate(urls, player.get_tracks))
+    return [
+        [
+            AudioTrack(result["tracks"][0], record["user_id"]) if result else None
+            for result in (next(results) for _ in record["urls"])
+        ]
+        for record in entries
+    ]
 
 
 async def get_playlist(self,
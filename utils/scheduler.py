@@ -0,0 +1,210 @@
+import asyncio
+import heapq
+import json
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from discord.ext.commands import AutoShardedBot
+
+
+__all__ = (
+    "ScheduledJob",
+    "Scheduler",
+)
+
+
+class ScheduledJob(NamedTuple):
+    id: int
+    type: str
+    key: Optional[str]
+    fire_at: float
+    payload: Dict[str, Any]
+
+
+JobHandler = Callable[[ScheduledJob], Awaitable[Any]]
+
+
+class Scheduler:
+    _MAX_SLEEP = 3600
+
+    def __init__(self, bot: AutoShardedBot) -> None:
+        self.bot = bot
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: Dict[int, ScheduledJob] = {}
+        self._keys: Dict[Tuple[str, str], int] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._parked: Dict[str, List[ScheduledJob]] = {}
+        self._running: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._loaded = asyncio.Event()
+        self._runner: asyncio.Task = None
+        self.fired = 0
+        self.failed = 0
+
+    @staticmethod
+    def _now() -> float:
+        return datetime.now().timestamp()
+
+    @staticmethod
+    def _from_record(record) -> ScheduledJob:
+        return ScheduledJob(
+            record["id"],
+            record["type"],
+            record["key"],
+            record["fire_at"],
+            json.loads(record["payload"]) if record["payload"] else {},
+        )
+
+    @property
+    def pending(self) -> int:
+        return len(self._jobs)
+
+    def start(self) -> None:
+        if not self._runner:
+            self._runner = self.bot.loop.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._runner:
+            self._runner.cancel()
+        for task in list(self._running):
+            task.cancel()
+
+    def register(self, type: str, handler: JobHandler) -> None:
+        self._handlers[type] = handler
+        for job in self._parked.pop(type, []):
+            self._dispatch(job, handler)
+
+    def unregister(self, type: str) -> None:
+        self._handlers.pop(type, None)
+
+    def _track(self, job: ScheduledJob) -> None:
+        self._jobs[job.id] = job
+        if job.key is not None:
+            self._keys[(job.type, job.key)] = job.id
+        heapq.heappush(self._heap, (job.fire_at, job.id))
+        if len(self._heap) > 2 * len(self._jobs) + 64:
+            self._heap = [(job.fire_at, job.id) for job in self._jobs.values()]
+            heapq.heapify(self._heap)
+
+    def _untrack(self, job: ScheduledJob) -> None:
+        if self._jobs.get(job.id) is job:
+            del self._jobs[job.id]
+        if job.key is not None and self._keys.get((job.type, job.key)) == job.id and job.id not in self._jobs:
+            del self._keys[(job.type, job.key)]
+
+    async def load(self) -> None:
+        async with self.bot.db.acquire() as con:
+            records = await con.fetch("SELECT id, type, key, fire_at, payload FROM scheduled_jobs")
+        for record in records:
+            self._track(self._from_record(record))
+        self._loaded.set()
+        self._wakeup.set()
+
+    def get(self, type: str, key: str) -> Optional[ScheduledJob]:
+        job_id = self._keys.get((type, key))
+        return self._jobs.get(job_id) if job_id else None
+
+    async def schedule(self, type: str, fire_at: float, payload: Dict[str, Any] = None,
+                       key: str = None) -> ScheduledJob:
+        await self._loaded.wait()
+        async with self.bot.db.acquire() as con:
+            job_id = await con.fetchval(
+                "INSERT INTO scheduled_jobs(type, key, fire_at, payload) VALUES ($1, $2, $3, $4) "
+                "ON CONFLICT (type, key) DO UPDATE SET fire_at=EXCLUDED.fire_at, payload=EXCLUDED.payload "
+                "RETURNING id",
+                type, key, float(fire_at), json.dumps(payload or {}),
+            )
+        job = ScheduledJob(job_id, type, key, float(fire_at), payload or {})
+        self._track(job)
+        self._wakeup.set()
+        return job
+
+    async def schedule_many(self, type: str, jobs: Iterable[Tuple[str, float, Dict[str, Any]]]) -> int:
+        jobs = list(jobs)
+        if not jobs:
+            return 0
+        await self._loaded.wait()
+        async with self.bot.db.acquire() as con:
+            records = await con.fetch(
+                "INSERT INTO scheduled_jobs(type, key, fire_at, payload) "
+                "SELECT $1, * FROM unnest($2::text[], $3::double precision[], $4::text[]) "
+                "ON CONFLICT (type, key) DO NOTHING RETURNING id, type, key, fire_at, payload",
+                type,
+                [key for key, _, _ in jobs],
+                [float(fire_at) for _, fire_at, _ in jobs],
+                [json.dumps(payload or {}) for _, _, payload in jobs],
+            )
+        for record in records:
+            self._track(self._from_record(record))
+        self._wakeup.set()
+        return len(records)
+
+    async def cancel(self, job_id: int) -> bool:
+        await self._loaded.wait()
+        job = self._jobs.get(job_id)
+        if job:
+            self._untrack(job)
+        async with self.bot.db.acquire() as con:
+            deleted = await con.fetchval("DELETE FROM scheduled_jobs WHERE id=$1 RETURNING id", job_id)
+        return bool(job or deleted)
+
+    async def cancel_key(self, type: str, key: str) -> bool:
+        await self._loaded.wait()
+        job = self.get(type, key)
+        if job:
+            self._untrack(job)
+        async with self.bot.db.acquire() as con:
+            deleted = await con.fetchval("DELETE FROM scheduled_jobs WHERE type=$1 AND key=$2 RETURNING id",
+                                         type, key)
+        return bool(job or deleted)
+
+    def _next_delay(self) -> Optional[float]:
+        while self._heap:
+            fire_at, job_id = self._heap[0]
+            job = self._jobs.get(job_id)
+            if job and job.fire_at == fire_at:
+                return min(max(fire_at - self._now(), 0), self._MAX_SLEEP)
+            heapq.heappop(self._heap)
+        return None
+
+    def _fire_due(self) -> None:
+        now = self._now()
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, job_id = heapq.heappop(self._heap)
+            job = self._jobs.get(job_id)
+            if not job or job.fire_at != fire_at:
+                continue
+            self._untrack(job)
+            handler = self._handlers.get(job.type)
+            if handler:
+                self._dispatch(job, handler)
+            else:
+                self._parked.setdefault(job.type, []).append(job)
+
+    def _dispatch(self, job: ScheduledJob, handler: JobHandler) -> None:
+        task = self.bot.loop.create_task(self._fire(job, handler))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+
+    async def _fire(self, job: ScheduledJob, handler: JobHandler) -> None:
+        try:
+            await handler(job)
+            self.fired += 1
+        except Exception:
+            self.failed += 1
+        finally:
+            async with self.bot.db.acquire() as con:
+                await con.execute("DELETE FROM scheduled_jobs WHERE id=$1 AND fire_at=$2", job.id, job.fire_at)
+
+    async def _run(self) -> None:
+        await self.bot.wait_until_ready()
+        await self.load()
+        while True:
+            self._wakeup.clear()
+            delay = self._next_delay()
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._fire_due()
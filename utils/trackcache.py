@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from discord.ext.commands import AutoShardedBot
+from lavalink import Node
+
+
+__all__ = (
+    "CacheRow",
+    "TrackCache",
+    "pack_result",
+    "unpack_row",
+)
+
+
+_NEGATIVE_TTL = 86400
+_UNCACHEABLE = ("https://www.twitch.tv/",)
+_ROW_OVERHEAD = 64
+_INFO_FIELDS = ("identifier", "isSeekable", "author", "length", "isStream", "title", "uri")
+_COLUMNS = "query, load_type, playlist_name, tracks, cached_in, created_at, expire_at"
+
+
+class CacheRow(NamedTuple):
+    query: str
+    load_type: str
+    playlist_name: Optional[str]
+    tracks: Optional[str]
+    cached_in: Optional[int]
+    created_at: int
+    expire_at: int
+
+    @property
+    def size(self) -> int:
+        return len(self.query) + len(self.tracks or "") + _ROW_OVERHEAD
+
+
+def pack_result(query: str, res: Optional[Dict], guild_id: int = None, timestamp: int = None) -> CacheRow:
+    timestamp = timestamp or int(datetime.now().timestamp())
+    if not res or not res.get("tracks"):
+        return CacheRow(query, (res or {}).get("loadType") or "NO_MATCHES", None, None,
+                        guild_id, timestamp, timestamp + _NEGATIVE_TTL)
+    tracks = res["tracks"] if res.get("loadType") == "PLAYLIST_LOADED" else res["tracks"][:1]
+    return CacheRow(
+        query,
+        res.get("loadType"),
+        (res.get("playlistInfo") or {}).get("name"),
+        json.dumps([[track["track"], *(track["info"].get(field) for field in _INFO_FIELDS)] for track in tracks],
+                   separators=(",", ":")),
+        guild_id,
+        timestamp,
+        -1,
+    )
+
+
+def unpack_row(row: CacheRow) -> Optional[Dict]:
+    if row.tracks is None:
+        return None
+    return {
+        "loadType": row.load_type,
+        "playlistInfo": {"name": row.playlist_name} if row.playlist_name else {},
+        "tracks": [
+            {"track": track, "info": dict(zip(_INFO_FIELDS, info), position=0)}
+            for track, *info in json.loads(row.tracks)
+        ],
+    }
+
+
+class TrackCache:
+    def __init__(self, bot: AutoShardedBot, max_bytes: int = None, node_concurrency: int = None,
+                 write_batch: int = 100, write_delay: float = 1.0) -> None:
+        self.bot = bot
+        self.max_bytes = max_bytes or int(os.getenv("MUSIC_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+        self.node_concurrency = node_concurrency or int(os.getenv("MUSIC_NODE_CONCURRENCY", 8))
+        self.write_batch = write_batch
+        self.write_delay = write_delay
+        self._entries: "OrderedDict[str, Tuple[Optional[Dict], int, int]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, bool], asyncio.Task] = {}
+        self._semaphores: Dict[Node, asyncio.Semaphore] = {}
+        self._writes: Dict[str, CacheRow] = {}
+        self._flush_task: asyncio.Task = None
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.db_hits = 0
+        self.fetches = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.writes = 0
+        self.write_batches = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _now() -> int:
+        return int(datetime.now().timestamp())
+
+    def _get(self, query: str) -> Tuple[bool, Optional[Dict]]:
+        entry = self._entries.get(query)
+        if entry is None:
+            return False, None
+        data, expire_at, _ = entry
+        if expire_at != -1 and expire_at <= self._now():
+            self._discard(query)
+            return False, None
+        self._entries.move_to_end(query)
+        return True, data
+
+    def _put(self, query: str, data: Optional[Dict], expire_at: int, size: int) -> None:
+        self._discard(query)
+        if size > self.max_bytes:
+            return
+        self._entries[query] = (data, expire_at, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, _, _size) = self._entries.popitem(last=False)
+            self.bytes -= _size
+            self.evictions += 1
+
+    def _discard(self, query: str) -> None:
+        entry = self._entries.pop(query, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    def evict(self, query: str) -> None:
+        self._discard(query)
+        self._writes.pop(query, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._writes.clear()
+        self.bytes = 0
+
+    async def get_tracks(self, query: str, node: Node, guild_id: int = None,
+                         force_recache: bool = False) -> Optional[Dict]:
+        if not force_recache:
+            found, data = self._get(query)
+            if found:
+                self.hits += 1
+                return data
+        self.misses += 1
+        # Forced lookups must not join a lookup that may be answered from the cache or database
+        key = (query, force_recache)
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = self.bot.loop.create_task(
+                self._load(query, node, guild_id, force_recache)
+            )
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, query: str, node: Node, guild_id: int, force_recache: bool) -> Optional[Dict]:
+        cacheable = not any(prefix in query for prefix in _UNCACHEABLE)
+        if not force_recache and cacheable:
+            row = self._writes.get(query)
+            if row is None:
+                async with self.bot.mbdb.acquire() as con:
+                    record = await con.fetchrow(f"SELECT {_COLUMNS} FROM music_cache WHERE query=$1", query)
+                row = CacheRow(*record) if record else None
+            if row is not None and (row.expire_at == -1 or row.expire_at > self._now()):
+                self.db_hits += 1
+                data = unpack_row(row)
+                self._put(query, data, row.expire_at, row.size)
+                return data
+
+        res = await self._fetch(query, node)
+        row = pack_result(query, res, guild_id)
+        data = unpack_row(row)
+        if cacheable:
+            self._queue_write(row)
+            self._put(query, data, row.expire_at, row.size)
+        return data
+
+    async def _fetch(self, query: str, node: Node) -> Optional[Dict]:
+        semaphore = self._semaphores.get(node)
+        if semaphore is None:
+            semaphore = self._semaphores[node] = asyncio.Semaphore(self.node_concurrency)
+        async with semaphore:
+            self.fetches += 1
+            return await node.get_tracks(query)
+
+    async def refresh(self, query: str, node: Node, guild_id: int = None) -> bool:
+        res = await self._fetch(query, node)
+        row = pack_result(query, res, guild_id)
+        if row.tracks is None:
+            return False
+        self._queue_write(row)
+        self._put(query, unpack_row(row), row.expire_at, row.size)
+        return True
+
+    def _queue_write(self, row: CacheRow) -> None:
+        self._writes[row.query] = row
+        if len(self._writes) >= self.write_batch:
+            self.bot.loop.create_task(self.flush())
+        elif self._flush_task is None:
+            self._flush_task = self.bot.loop.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        try:
+            await asyncio.sleep(self.write_delay)
+        finally:
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        if not self._writes:
+            return 0
+        writes, self._writes = self._writes, {}
+        try:
+            await self.upsert(writes.values())
+        except Exception:
+            for query, row in writes.items():
+                self._writes.setdefault(query, row)
+            raise
+        self.writes += len(writes)
+        self.write_batches += 1
+        return len(writes)
+
+    async def upsert(self, rows: Iterable[CacheRow], overwrite: bool = True) -> None:
+        rows = list(rows)
+        async with self.bot.mbdb.acquire() as con:
+            await con.execute(
+                f"INSERT INTO music_cache({_COLUMNS}) "
+                "SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::jsonb[], $5::bigint[], $6::bigint[], $7::bigint[]) "
+                "ON CONFLICT (query) DO " + (
+                    "UPDATE SET load_type=EXCLUDED.load_type, playlist_name=EXCLUDED.playlist_name, "
+                    "tracks=EXCLUDED.tracks, cached_in=EXCLUDED.cached_in, created_at=EXCLUDED.created_at, "
+                    "expire_at=EXCLUDED.expire_at WHERE EXCLUDED.tracks IS NOT NULL OR music_cache.tracks IS NULL"
+                    if overwrite else "NOTHING"
+                ),
+                *([row[index] for row in rows] for index in range(len(CacheRow._fields))),
+            )
+
+    async def init_table(self) -> None:
+        async with self.bot.mbdb.acquire() as con:
+            legacy = await con.fetchval("SELECT 1 FROM information_schema.columns "
+                                        "WHERE table_name='music_cache' AND column_name='data'")
+            async with con.transaction():
+                if legacy:
+                    await con.execute("ALTER TABLE music_cache RENAME TO music_cache_legacy")
+                    await con.execute("ALTER INDEX IF EXISTS music_cache_pkey RENAME TO music_cache_legacy_pkey")
+                await con.execute("CREATE TABLE IF NOT EXISTS music_cache(query text PRIMARY KEY, load_type text NOT NULL, "
+                                  "playlist_name text, tracks jsonb, cached_in bigint, created_at bigint NOT NULL, "
+                                  "expire_at bigint NOT NULL DEFAULT -1)")
+                await con.execute("CREATE INDEX IF NOT EXISTS music_cache_created_at_idx ON music_cache(created_at)")
+                await con.execute("CREATE INDEX IF NOT EXISTS music_cache_expire_at_idx ON music_cache(expire_at) "
+                                  "WHERE expire_at != -1")
+                if legacy:
+                    await con.execute(
+                        f"INSERT INTO music_cache({_COLUMNS}) SELECT query, "
+                        "COALESCE(data->'data'->>'loadType', 'NO_MATCHES'), "
+                        "data->'data'->'playlistInfo'->>'name', "
+                        "CASE WHEN jsonb_typeof(data->'data'->'tracks') = 'array' "
+                        "AND jsonb_array_length(data->'data'->'tracks') > 0 THEN "
+                        "(SELECT jsonb_agg(jsonb_build_array(track->'track', track->'info'->'identifier', "
+                        "track->'info'->'isSeekable', track->'info'->'author', track->'info'->'length', "
+                        "track->'info'->'isStream', track->'info'->'title', track->'info'->'uri')) "
+                        "FROM jsonb_array_elements(CASE WHEN data->'data'->>'loadType' = 'PLAYLIST_LOADED' "
+                        "THEN data->'data'->'tracks' ELSE jsonb_build_array(data->'data'->'tracks'->0) END) track) "
+                        "END, "
+                        "(data->>'cached_in')::bigint, "
+                        "COALESCE((data->>'timestamp')::bigint, extract(epoch FROM now())::bigint), "
+                        "COALESCE((data->>'expire_at')::bigint, -1) "
+                        "FROM music_cache_legacy ON CONFLICT (query) DO NOTHING"
+                    )
+                    await con.execute("DROP TABLE music_cache_legacy")
+
+    async def get_info(self) -> Tuple[int, int, int]:
+        async with self.bot.mbdb.acquire() as con:
+            record = await con.fetchrow(
+                "SELECT COUNT(*), COUNT(tracks), COUNT(*) FILTER (WHERE expire_at != -1 AND expire_at <= $1) "
+                "FROM music_cache",
+                self._now(),
+            )
+        return tuple(record)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return 100 * self.hits / total if total else 0.0
+
+    def stats(self) -> str:
+        return "\n".join([
+            f"**Memory Entries:** {len(self)} ({self.bytes / 1048576:.2f} / {self.max_bytes / 1048576:.2f} MiB)",
+            f"**Memory Hits:** {self.hits} ≈ {self.hit_rate:.2f}%",
+            f"**Misses:** {self.misses} ({self.db_hits} from database, {self.fetches} from Lavalink, "
+            f"{self.coalesced} coalesced)",
+            f"**Evictions:** {self.evictions}",
+            f"**Writes:** {self.writes} in {self.write_batches} batch{'es' if self.write_batches != 1 else ''}, "
+            f"{len(self._writes)} pending",
+            f"**In-Flight:** {len(self._pending)} quer{'ies' if len(self._pending) != 1 else 'y'}",
+        ])